@@ -3,5 +3,5 @@
 # Install dependencies
 pip install -r requirements.txt
 
-# Collect static files
-python manage.py collectstatic --noinput
+# Collect static files into a hashed manifest (production startup profile)
+DEBUG=False STATIC_BUILD=1 python manage.py collectstatic --noinput --clear
@@ -1,6 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario, Paciente, Triaje, Atencion, RegistroAuditoria
+from .decorators import get_client_ip
+from .fusion import agrupar_pares, elegir_supervivientes, fusionar_pacientes
+from .models import (
+    Usuario, Paciente, Triaje, Atencion, NotaClinica, PosibleDuplicado, RegistroAuditoria, TriajeArchivado,
+    Trabajo,
+)
 
 
 @admin.register(Usuario)
@@ -11,7 +16,7 @@ class UsuarioAdmin(UserAdmin):
     
     fieldsets = UserAdmin.fieldsets + (
         ('Información Adicional', {
-            'fields': ('nombre_completo', 'rol', 'activo', 'intentos_fallidos', 'bloqueado_hasta')
+            'fields': ('nombre_completo', 'rol', 'activo')
         }),
     )
     
@@ -30,13 +35,19 @@ class PacienteAdmin(admin.ModelAdmin):
     date_hierarchy = 'fecha_registro'
 
 
+class NotaClinicaInline(admin.StackedInline):
+    model = NotaClinica
+    can_delete = False
+
+
 @admin.register(Triaje)
 class TriajeAdmin(admin.ModelAdmin):
     list_display = ('paciente', 'fecha_hora_consulta', 'especialidad', 'nivel_prioridad', 'estado')
     list_filter = ('nivel_prioridad', 'estado', 'especialidad')
-    search_fields = ('paciente__nombre_completo', 'paciente__ci')
+    search_fields = ('paciente_nombre', 'paciente_ci')
     date_hierarchy = 'fecha_hora_consulta'
     raw_id_fields = ('paciente',)
+    inlines = [NotaClinicaInline]
 
 
 @admin.register(Atencion)
@@ -48,6 +59,43 @@ class AtencionAdmin(admin.ModelAdmin):
     raw_id_fields = ('triaje', 'usuario')
 
 
+@admin.register(TriajeArchivado)
+class TriajeArchivadoAdmin(admin.ModelAdmin):
+    """Read-only: rows only enter or leave the archive through core/archivo.py"""
+    list_display = ('paciente_nombre', 'paciente_ci', 'fecha_hora_consulta', 'especialidad', 'nivel_prioridad')
+    list_filter = ('nivel_prioridad', 'especialidad')
+    search_fields = ('paciente_nombre', 'paciente_ci')
+    date_hierarchy = 'fecha_hora_consulta'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PosibleDuplicado)
+class PosibleDuplicadoAdmin(admin.ModelAdmin):
+    list_display = ('paciente', 'duplicado', 'puntaje', 'estado', 'fecha_deteccion')
+    list_filter = ('estado',)
+    search_fields = ('paciente__nombre_completo', 'paciente__ci', 'duplicado__nombre_completo', 'duplicado__ci')
+    raw_id_fields = ('paciente', 'duplicado')
+    actions = ['fusionar', 'descartar']
+    
+    @admin.action(description='Fusionar los pacientes seleccionados')
+    def fusionar(self, request, queryset):
+        fusiones = elegir_supervivientes(agrupar_pares(queryset.values_list('paciente_id', 'duplicado_id')))
+        movidos = fusionar_pacientes(fusiones, usuario=request.user, ip_address=get_client_ip(request))
+        self.message_user(request, f'{len(fusiones)} fusiones realizadas, {movidos} triajes reasignados.')
+    
+    @admin.action(description='Descartar (no son duplicados)')
+    def descartar(self, request, queryset):
+        queryset.update(estado='descartado')
+
+
 @admin.register(RegistroAuditoria)
 class RegistroAuditoriaAdmin(admin.ModelAdmin):
     list_display = ('usuario', 'accion', 'fecha_hora', 'ip_address')
@@ -55,3 +103,11 @@ class RegistroAuditoriaAdmin(admin.ModelAdmin):
     search_fields = ('usuario__username', 'descripcion')
     date_hierarchy = 'fecha_hora'
     readonly_fields = ('usuario', 'accion', 'descripcion', 'ip_address', 'fecha_hora')
+
+
+@admin.register(Trabajo)
+class TrabajoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tarea', 'estado', 'intentos', 'usuario', 'fecha_creacion', 'fecha_fin')
+    list_filter = ('estado', 'tarea')
+    readonly_fields = ('trabajador', 'vence', 'fecha_inicio', 'fecha_fin', 'resultado', 'error')
+    date_hierarchy = 'fecha_creacion'
@@ -0,0 +1,78 @@
+"""
+Early-warning score for triage vital signs
+Puntaje de alerta temprana (basado en NEWS2) calculado a partir de los signos vitales
+"""
+
+from bisect import bisect_left
+
+
+# NEWS2 bands for the vitals recorded at triage: (upper bound, points) in
+# ascending order; a value scores the points of the first bound >= value.
+# Changing this table requires `python manage.py recalcular_alertas`
+REGLAS_ALERTA = {
+    'temperatura': [(35.0, 3), (36.0, 1), (38.0, 0), (39.0, 1), (float('inf'), 2)],
+    'pulsacion': [(40, 3), (50, 1), (90, 0), (110, 1), (130, 2), (float('inf'), 3)],
+    'presion_sistolica': [(90, 3), (100, 2), (110, 1), (219, 0), (float('inf'), 3)],
+}
+
+LOTE_ALERTA = 5000
+
+
+def puntaje_alerta(**signos):
+    """Score for one triage; missing vitals add no points"""
+    total = 0
+    for signo, bandas in REGLAS_ALERTA.items():
+        valor = signos.get(signo)
+        if valor is not None:
+            total += bandas[bisect_left([limite for limite, _ in bandas], float(valor))][1]
+    return total
+
+
+def puntajes_alerta(np, columnas):
+    """Vectorized puntaje_alerta over float arrays (NaN = missing vital)"""
+    total = np.zeros(len(next(iter(columnas.values()))), dtype=np.int16)
+    for signo, bandas in REGLAS_ALERTA.items():
+        limites = np.array([limite for limite, _ in bandas])
+        puntos = np.array([p for _, p in bandas] + [0], dtype=np.int16)
+        valores = columnas[signo]
+        # Same rule as bisect_left; NaN sorts last and maps to the 0 slot
+        indices = np.where(np.isnan(valores), len(bandas), np.searchsorted(limites, valores, side='left'))
+        total += puntos[indices]
+    return total
+
+
+def recalcular_puntajes(modelo, lote=LOTE_ALERTA, progreso=None):
+    """
+    Re-score every triage of `modelo` in id-keyed batches: values_list
+    columns -> NumPy -> set-based UPDATE of the rows whose score changed
+    Returns (processed, updated)
+    """
+    import numpy as np
+
+    signos = list(REGLAS_ALERTA)
+    procesados = actualizados = 0
+    ultimo = 0
+    while filas := list(
+        modelo.objects.filter(id__gt=ultimo).order_by('id').values_list(
+            'id', 'puntaje_alerta', *signos
+        )[:lote]
+    ):
+        ultimo = filas[-1][0]
+        ids, actuales, *valores = zip(*filas)
+        columnas = {}
+        for signo, columna in zip(signos, valores):
+            columna = np.array(columna, dtype=object)
+            columna[np.equal(columna, None)] = np.nan
+            columnas[signo] = columna.astype(np.float64)
+        nuevos = puntajes_alerta(np, columnas)
+        cambiados = nuevos != np.array(actuales)
+        # One UPDATE per distinct score instead of a per-row CASE (bulk_update)
+        ids = np.array(ids)
+        for puntaje in np.unique(nuevos[cambiados]):
+            seleccion = ids[cambiados & (nuevos == puntaje)]
+            modelo.objects.filter(id__in=seleccion.tolist()).update(puntaje_alerta=int(puntaje))
+        procesados += len(filas)
+        actualizados += int(cambiados.sum())
+        if progreso:
+            progreso(procesados, actualizados)
+    return procesados, actualizados
@@ -0,0 +1,174 @@
+"""
+Wait-time analytics for Clinical Triage System
+Distribución del tiempo puerta-atención (triaje -> inicio de atención)
+"""
+
+from collections import Counter
+
+from django.db import connection
+from django.db.models import Avg, Count, F
+from django.db.models.functions import ExtractHour, TruncDate
+
+from .expressions import Percentil
+
+
+PERCENTILES_ESPERA = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+
+# Grouping name -> expression over Triaje
+AGRUPACIONES_ESPERA = {
+    'prioridad': lambda: F('nivel_prioridad'),
+    'especialidad': lambda: F('especialidad'),
+    'dia': lambda: TruncDate('fecha_hora_consulta'),
+    'hora': lambda: ExtractHour('fecha_hora_consulta'),
+}
+
+
+def espera_atencion():
+    """Door-to-clinician time: triage registration to start of attention"""
+    return F('atencion__fecha_inicio') - F('fecha_hora_consulta')
+
+
+def resumen_espera(triajes):
+    """
+    Wait-time count, mean and percentiles (minutes), overall and per
+    AGRUPACIONES_ESPERA, for triages that reached a clinician
+    PostgreSQL computes the percentiles in SQL; other backends fetch the
+    compact (group, wait) columns once and use NumPy
+    """
+    atendidos = triajes.filter(atencion__fecha_inicio__isnull=False)
+    if connection.vendor == 'postgresql':
+        return _resumen_sql(atendidos)
+    return _resumen_numpy(atendidos)
+
+
+def _medidas_sql():
+    return {
+        'total': Count('id'),
+        'media': Avg(espera_atencion()),
+        **{nombre: Percentil(espera_atencion(), p) for nombre, p in PERCENTILES_ESPERA.items()},
+    }
+
+
+def _minutos(fila):
+    return {
+        clave: round(valor.total_seconds() / 60, 1) if hasattr(valor, 'total_seconds') else valor
+        for clave, valor in fila.items()
+    }
+
+
+def _resumen_sql(atendidos):
+    resumen = {'global': _minutos(atendidos.aggregate(**_medidas_sql()))}
+    for nombre, expresion in AGRUPACIONES_ESPERA.items():
+        filas = atendidos.annotate(grupo=expresion()).values('grupo').annotate(
+            **_medidas_sql()
+        ).order_by('grupo')
+        resumen[nombre] = [_minutos(fila) for fila in filas]
+    return resumen
+
+
+def _medidas_numpy(np, minutos):
+    if not len(minutos):
+        return {'total': 0, 'media': None, **{nombre: None for nombre in PERCENTILES_ESPERA}}
+    # Linear interpolation, same as PERCENTILE_CONT
+    valores = np.percentile(minutos, [p * 100 for p in PERCENTILES_ESPERA.values()])
+    return {
+        'total': int(len(minutos)),
+        'media': round(float(minutos.mean()), 1),
+        **{nombre: round(float(v), 1) for nombre, v in zip(PERCENTILES_ESPERA, valores)},
+    }
+
+
+def _esperas(np, atendidos):
+    """(group columns, waits in minutes) of the attended triages, in one query"""
+    columnas = list(AGRUPACIONES_ESPERA)
+    filas = atendidos.annotate(
+        **{f'g_{nombre}': expresion() for nombre, expresion in AGRUPACIONES_ESPERA.items()},
+        espera=espera_atencion(),
+    ).values_list(*[f'g_{nombre}' for nombre in columnas], 'espera')
+
+    valores = list(zip(*filas)) or [()] * (len(columnas) + 1)
+    minutos = np.array(valores[-1], dtype='timedelta64[us]').astype(np.float64) / 60e6
+    return dict(zip(columnas, valores)), minutos
+
+
+def _partir(np, grupos_fila, minutos):
+    """Split the waits by group value: [(grupo, waits)] in group order"""
+    grupos, inversa = np.unique(np.array(grupos_fila, dtype=object), return_inverse=True)
+    # Sort once by group and split into contiguous slices
+    orden = np.argsort(inversa, kind='stable')
+    cortes = np.cumsum(np.bincount(inversa, minlength=len(grupos)))[:-1]
+    return zip(grupos.tolist(), np.split(minutos[orden], cortes))
+
+
+def _resumen_numpy(atendidos):
+    import numpy as np
+
+    columnas, minutos = _esperas(np, atendidos)
+    resumen = {'global': _medidas_numpy(np, minutos)}
+    for nombre, grupos_fila in columnas.items():
+        resumen[nombre] = [
+            {'grupo': grupo, **_medidas_numpy(np, parte)}
+            for grupo, parte in _partir(np, grupos_fila, minutos)
+        ]
+    return resumen
+
+
+# ---------------------------------------------------------------
+# Histograms (merging the wait times of two date ranges)
+# ---------------------------------------------------------------
+
+# Waits are binned to this many minutes; merged percentiles are exact to it
+RESOLUCION_HISTOGRAMA = 0.1
+
+
+def histogramas_espera(triajes, por_dia=False):
+    """
+    Wait-time histograms overall and per grouping except 'dia' (days never
+    overlap between ranges), as {nombre: [[grupo, bins, conteos]]}
+    JSON-friendly, for report snapshots; `por_dia` adds the 'dia' ones, to
+    merge the live and archived rows of the same days
+    """
+    import numpy as np
+
+    def histograma(grupo, minutos):
+        bins, conteos = np.unique(np.round(minutos / RESOLUCION_HISTOGRAMA).astype(np.int64), return_counts=True)
+        return [grupo, bins.tolist(), conteos.tolist()]
+
+    columnas, minutos = _esperas(np, triajes.filter(atencion__fecha_inicio__isnull=False))
+    histogramas = {'global': [histograma(None, minutos)]}
+    for nombre, grupos_fila in columnas.items():
+        if nombre != 'dia' or por_dia:
+            histogramas[nombre] = [histograma(g, parte) for g, parte in _partir(np, grupos_fila, minutos)]
+    return histogramas
+
+
+def combinar_histogramas(a, b):
+    """Add two histogramas_espera() results"""
+    combinado = {}
+    for nombre in a.keys() | b.keys():
+        grupos = {}
+        for grupo, bins, conteos in a.get(nombre, []) + b.get(nombre, []):
+            contador = grupos.setdefault(grupo, Counter())
+            contador.update(dict(zip(bins, conteos)))
+        combinado[nombre] = [
+            [grupo, list(contador), list(contador.values())] for grupo, contador in grupos.items()
+        ]
+    return combinado
+
+
+def resumen_histogramas(histogramas):
+    """resumen_espera() figures from histogramas_espera() ('dia' only if present)"""
+    import numpy as np
+
+    def medidas(bins, conteos):
+        minutos = np.repeat(np.array(bins, dtype=np.float64) * RESOLUCION_HISTOGRAMA, conteos)
+        return _medidas_numpy(np, minutos)
+
+    resumen = {'global': medidas(*histogramas['global'][0][1:])}
+    for nombre, filas in histogramas.items():
+        if nombre != 'global':
+            resumen[nombre] = [
+                {'grupo': grupo, **medidas(bins, conteos)}
+                for grupo, bins, conteos in sorted(filas, key=lambda fila: fila[0])
+            ]
+    return resumen
@@ -0,0 +1,119 @@
+"""
+Hot/cold archival of closed triages
+Traslado por lotes de triajes atendidos antiguos a las tablas de archivo,
+y consultas de historial que combinan ambas
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Value
+from django.utils import timezone
+
+from .models import (
+    Atencion, AtencionArchivada, NotaClinica, NotaClinicaArchivada, Triaje, TriajeArchivado,
+)
+from .reports import bump_report_version, requiere_archivo
+
+
+# (live model, archive model, column holding the triage id), copied in
+# this order and deleted in reverse
+TABLAS_ARCHIVO = [
+    (Triaje, TriajeArchivado, 'id'),
+    (Atencion, AtencionArchivada, 'triaje_id'),
+    (NotaClinica, NotaClinicaArchivada, 'triaje_id'),
+]
+
+
+def limite_archivo(dias=None):
+    """Closed triages seen before this moment belong in the archive"""
+    return timezone.now() - timedelta(days=settings.ARCHIVO_DIAS if dias is None else dias)
+
+
+def _copiar(origen, destino, filtro):
+    """Insert the matching rows of `origen` into `destino`, ids included"""
+    campos = [campo.attname for campo in destino._meta.concrete_fields]
+    filas = origen.objects.filter(**filtro).order_by().values(*campos)
+    destino.objects.bulk_create([destino(**fila) for fila in filas])
+
+
+def archivar_lote(limite, lote):
+    """
+    Move up to `lote` 'atendido' triages seen before `limite`, with their
+    attention and notes, in one short transaction
+    Rows locked by a live request are skipped, not waited for
+    Returns the number of triages moved
+    """
+    with transaction.atomic():
+        ids = list(
+            Triaje.objects.filter(estado='atendido', fecha_hora_consulta__lt=limite)
+            .order_by('fecha_hora_consulta')
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:lote]
+        )
+        if not ids:
+            return 0
+        for vivo, archivo, columna in TABLAS_ARCHIVO:
+            _copiar(vivo, archivo, {f'{columna}__in': ids})
+        # Plain DELETEs: no CASCADE collection and no post_delete signals,
+        # which would count an archived triage as a deleted visit
+        for vivo, _, columna in reversed(TABLAS_ARCHIVO):
+            vivo.objects.filter(**{f'{columna}__in': ids})._raw_delete(vivo.objects.db)
+        # Reports add up both tables; cached ones were computed before the move
+        transaction.on_commit(bump_report_version)
+    return len(ids)
+
+
+def archivar(dias=None, lote=None, pausa=None, progreso=None):
+    """
+    Batch job: archive every closed triage older than `dias`, one
+    transaction per `lote` triages with `pausa` seconds between them
+    Safe to interrupt and re-run; returns the number of triages moved
+    """
+    lote = lote or settings.ARCHIVO_LOTE
+    pausa = settings.ARCHIVO_PAUSA if pausa is None else pausa
+    limite = limite_archivo(dias)
+    total = 0
+    while True:
+        movidos = archivar_lote(limite, lote)
+        total += movidos
+        if progreso:
+            progreso(total)
+        if movidos < lote:
+            return total
+        time.sleep(pausa)
+
+
+# ---------------------------------------------------------------
+# Reading both tables
+# ---------------------------------------------------------------
+
+def con_archivo(vivos, archivados):
+    """
+    UNION ALL of a live and an archived triage queryset with the same
+    filters and columns; rows carry `archivado`
+    """
+    return vivos.annotate(archivado=Value(False)).order_by().union(
+        archivados.annotate(archivado=Value(True)).order_by(), all=True,
+    )
+
+
+def historial_combinado(vivos, archivados, fecha_desde=None):
+    """
+    History rows from the live table, plus the archive only when the
+    range asks for dates it holds
+    """
+    if requiere_archivo(fecha_desde):
+        return con_archivo(vivos, archivados)
+    return vivos.annotate(archivado=Value(False))
+
+
+def buscar_triaje(triaje_id, *relacionados):
+    """Live or archived triage by id (archiving keeps the id), or None"""
+    for modelo in (Triaje, TriajeArchivado):
+        triaje = modelo.objects.select_related(*relacionados).filter(id=triaje_id).order_by().first()
+        if triaje is not None:
+            return triaje
+    return None
@@ -0,0 +1,197 @@
+"""
+Ad-hoc report cube for Clinical Triage System
+Agrupación libre por dimensiones con medidas, en una sola consulta SQL
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+
+from .analytics import espera_atencion
+from .expressions import Percentil, banda_edad
+from .models import categoria_presion
+from .reports import (
+    MotorReportes, REPORT_CACHE_TIMEOUT, get_report_version, requiere_archivo, ultimo_dia_archivado,
+)
+
+
+CUBO_LIMITE_FILAS = 1000
+
+
+def _duracion_atencion():
+    return F('atencion__fecha_fin') - F('atencion__fecha_inicio')
+
+
+def _duracion_espera():
+    return espera_atencion()
+
+
+# name -> (expression factory, Python type used to parse filter values)
+DIMENSIONES = {
+    'especialidad': (lambda: F('especialidad'), str),
+    'tipo_servicio': (lambda: F('tipo_servicio'), str),
+    'nivel_prioridad': (lambda: F('nivel_prioridad'), str),
+    'estado': (lambda: F('estado'), str),
+    'sexo': (lambda: F('paciente_sexo'), str),
+    'banda_edad': (lambda: banda_edad(F('edad_consulta')), str),
+    'hora': (lambda: ExtractHour('fecha_hora_consulta'), int),
+    'dia_semana': (lambda: ExtractIsoWeekDay('fecha_hora_consulta'), int),  # 1 = lunes
+    'categoria_presion': (categoria_presion, str),
+    'usuario': (lambda: F('atencion__usuario__nombre_completo'), str),
+}
+
+# Durations are returned in minutes; percentiles need PostgreSQL
+MEDIDAS = {
+    'total': lambda: Count('id'),
+    'atencion_media': lambda: Avg(_duracion_atencion()),
+    'atencion_p50': lambda: Percentil(_duracion_atencion(), 0.5),
+    'atencion_p90': lambda: Percentil(_duracion_atencion(), 0.9),
+    'atencion_p99': lambda: Percentil(_duracion_atencion(), 0.99),
+    'espera_media': lambda: Avg(_duracion_espera()),
+    'espera_p50': lambda: Percentil(_duracion_espera(), 0.5),
+    'espera_p90': lambda: Percentil(_duracion_espera(), 0.9),
+    'espera_p99': lambda: Percentil(_duracion_espera(), 0.99),
+}
+
+
+def _media(partes):
+    return partes['suma'] / partes['n'] if partes.get('n') else None
+
+
+# Measures a range reaching the archive can use: name -> (parts computed on
+# each table, the value from the added parts); percentiles do not add up
+MEDIDAS_ADITIVAS = {
+    'total': (lambda: {'n': Count('id')}, lambda partes: partes.get('n', 0)),
+    'atencion_media': (
+        lambda: {'suma': Sum(_duracion_atencion()), 'n': Count(_duracion_atencion())}, _media,
+    ),
+    'espera_media': (
+        lambda: {'suma': Sum(_duracion_espera()), 'n': Count(_duracion_espera())}, _media,
+    ),
+}
+
+
+class Cubo:
+    """
+    Groups triages in a date range by any combination of DIMENSIONES and
+    computes the requested MEDIDAS in one grouped query per table
+    Ranges reaching the archive group both tables and add the groups up
+    (MEDIDAS_ADITIVAS); percentiles cannot be added, so they are rejected there
+    Raises ValueError for unknown dimensions, measures or filter values, or
+    a percentile over an archived range
+    """
+
+    def __init__(self, fecha_desde, fecha_hasta, dimensiones, medidas,
+                 filtros=None, limite=CUBO_LIMITE_FILAS):
+        desconocidas = set(dimensiones) - DIMENSIONES.keys()
+        if desconocidas:
+            raise ValueError(f'Dimensiones no válidas: {", ".join(sorted(desconocidas))}')
+        desconocidas = set(medidas) - MEDIDAS.keys()
+        if desconocidas:
+            raise ValueError(f'Medidas no válidas: {", ".join(sorted(desconocidas))}')
+        if not medidas:
+            raise ValueError('Debe indicar al menos una medida')
+        self.archivo = requiere_archivo(fecha_desde)
+        percentiles = set(medidas) - MEDIDAS_ADITIVAS.keys()
+        if self.archivo and percentiles:
+            raise ValueError(
+                f'El rango incluye triajes archivados; los percentiles ({", ".join(sorted(percentiles))}) '
+                f'admiten fechas desde {ultimo_dia_archivado() + timedelta(days=1):%Y-%m-%d}'
+            )
+
+        self.motor = MotorReportes(fecha_desde, fecha_hasta)
+        self.dimensiones = list(dict.fromkeys(dimensiones))
+        self.medidas = list(dict.fromkeys(medidas))
+        self.filtros = {}
+        for nombre, valor in (filtros or {}).items():
+            try:
+                self.filtros[nombre] = DIMENSIONES[nombre][1](valor)
+            except ValueError:
+                raise ValueError(f'Valor no válido para {nombre}: {valor}')
+        self.limite = max(1, min(limite, CUBO_LIMITE_FILAS))
+
+    @property
+    def cache_key(self):
+        firma = repr((
+            self.motor.fecha_desde, self.motor.fecha_hasta, self.dimensiones,
+            self.medidas, sorted(self.filtros.items()), self.limite,
+        ))
+        digest = hashlib.sha256(firma.encode()).hexdigest()[:32]
+        return f'cubo:{digest}:v{get_report_version()}'
+
+    def queryset(self, archivo=False):
+        """
+        Grouped query over the live table, or the archive one with
+        `archivo`, where the measures are their MEDIDAS_ADITIVAS parts
+        """
+        motor = MotorReportes(self.motor.fecha_desde, self.motor.fecha_hasta, archivo=True) if archivo else self.motor
+        # Annotations use a prefix so they never clash with model fields
+        usadas = set(self.dimensiones) | self.filtros.keys()
+        qs = motor.triajes().annotate(**{
+            f'dim_{nombre}': DIMENSIONES[nombre][0]() for nombre in usadas
+        }).filter(**{
+            f'dim_{nombre}': valor for nombre, valor in self.filtros.items()
+        })
+        columnas = [f'dim_{nombre}' for nombre in self.dimensiones]
+        if self.archivo:
+            medidas = {
+                f'med_{nombre}_{parte}': expresion
+                for nombre in self.medidas
+                for parte, expresion in MEDIDAS_ADITIVAS[nombre][0]().items()
+            }
+        else:
+            medidas = {f'med_{nombre}': MEDIDAS[nombre]() for nombre in self.medidas}
+        return qs.values(*columnas).annotate(**medidas).order_by(*columnas)
+
+    def ejecutar(self):
+        """Rows as dicts keyed by dimension/measure name, cached per data version"""
+        return cache.get_or_set(self.cache_key, self._ejecutar, REPORT_CACHE_TIMEOUT)
+
+    def _ejecutar(self):
+        if self.archivo:
+            filas = self._filas_combinadas()
+        else:
+            # One extra row tells whether the result was truncated
+            filas = [
+                {nombre[4:]: valor for nombre, valor in fila.items()}
+                for fila in self.queryset()[:self.limite + 1]
+            ]
+        return {
+            'dimensiones': self.dimensiones,
+            'medidas': self.medidas,
+            'filas': [
+                {nombre: self._valor(valor) for nombre, valor in fila.items()}
+                for fila in filas[:self.limite]
+            ],
+            'truncado': len(filas) > self.limite,
+        }
+
+    def _filas_combinadas(self):
+        """Every group of both tables, with the measure parts added up"""
+        grupos = {}
+        for archivo in (False, True):
+            for fila in self.queryset(archivo):
+                clave = tuple(fila[f'dim_{nombre}'] for nombre in self.dimensiones)
+                partes = grupos.setdefault(clave, {nombre: {} for nombre in self.medidas})
+                for columna, valor in fila.items():
+                    if columna.startswith('med_') and valor is not None:
+                        nombre, parte = columna[4:].rsplit('_', 1)
+                        partes[nombre][parte] = partes[nombre][parte] + valor if parte in partes[nombre] else valor
+
+        filas = []
+        # Ordered by dimension, NULLs last as PostgreSQL does
+        for clave in sorted(grupos, key=lambda clave: [(valor is None, valor) for valor in clave]):
+            fila = dict(zip(self.dimensiones, clave))
+            for nombre, partes in grupos[clave].items():
+                fila[nombre] = MEDIDAS_ADITIVAS[nombre][1](partes)
+            filas.append(fila)
+        return filas
+
+    @staticmethod
+    def _valor(valor):
+        if hasattr(valor, 'total_seconds'):
+            return round(valor.total_seconds() / 60, 1)
+        return valor
@@ -3,6 +3,7 @@ Custom decorators for role-based access control and audit logging
 """
 
 from functools import wraps
+from django.conf import settings
 from django.shortcuts import redirect
 from django.contrib import messages
 from .models import RegistroAuditoria
@@ -45,10 +46,16 @@ def registrar_auditoria(request, usuario, accion, descripcion=''):
 
 
 def get_client_ip(request):
-    """Extract client IP from request"""
+    """
+    Extract client IP from request
+    Behind settings.PROXIES_CONFIABLES proxies, the address the outermost
+    trusted proxy appended to X-Forwarded-For; entries to its left come
+    from the client and can be forged
+    """
+    proxies = settings.PROXIES_CONFIABLES
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip = x_forwarded_for.split(',')[0]
-    else:
-        ip = request.META.get('REMOTE_ADDR')
-    return ip
+    if proxies and x_forwarded_for:
+        direcciones = [ip.strip() for ip in x_forwarded_for.split(',') if ip.strip()]
+        if len(direcciones) >= proxies:
+            return direcciones[-proxies]
+    return request.META.get('REMOTE_ADDR')
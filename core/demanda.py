@@ -0,0 +1,216 @@
+"""
+Arrival demand analytics and staffing forecast
+Mapa de llegadas (hora x día), pronóstico semanal y médicos recomendados
+"""
+
+from collections import Counter
+from datetime import datetime, time, timedelta
+from itertools import chain, islice
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, F
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .models import Atencion, AtencionArchivada, PronosticoDemanda, Triaje, TriajeArchivado
+from .reports import requiere_archivo
+
+
+PRONOSTICO_KEY = 'reportes:pronostico'
+
+# The forecast is stored in PronosticoDemanda (refreshed nightly by
+# calcular_pronostico / cron); each instance caches it briefly in front of
+# the table and sees a new run within this many seconds
+PRONOSTICO_TIMEOUT = 300
+
+DEMANDA_SEMANAS = 8
+# Recent weeks weigh more in the forecast: weight halves every N weeks
+DEMANDA_VIDA_MEDIA_SEMANAS = 4
+# Clinicians are recommended so that each one stays below this utilization
+UTILIZACION_OBJETIVO = 0.8
+DURACION_POR_DEFECTO_MINUTOS = 15
+LOTE_FILAS = 2000
+
+DIAS_SEMANA = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom']
+ESPECIALIDADES = [codigo for codigo, _ in Triaje.ESPECIALIDADES]
+PRIORIDADES = [codigo for codigo, _ in Triaje.PRIORIDAD_CHOICES]
+
+
+def get_pronostico():
+    """Last computed forecast, or None; never computed in the request path"""
+    pronostico = cache.get(PRONOSTICO_KEY)
+    if pronostico is None:
+        ultimo = PronosticoDemanda.objects.first()
+        if ultimo is None:
+            return None
+        pronostico = ultimo.datos
+        cache.set(PRONOSTICO_KEY, pronostico, PRONOSTICO_TIMEOUT)
+    return pronostico
+
+
+def actualizar_pronostico(**kwargs):
+    """Compute the forecast and store it for the reports page and API"""
+    resultado = calcular_pronostico(**kwargs)
+    with transaction.atomic():
+        nuevo = PronosticoDemanda.objects.create(datos=resultado)
+        PronosticoDemanda.objects.exclude(id=nuevo.id).delete()
+    cache.set(PRONOSTICO_KEY, resultado, PRONOSTICO_TIMEOUT)
+    return resultado
+
+
+def indices_de(np, codigos, valores):
+    """Vectorized code -> position lookup; -1 for unknown codes"""
+    orden = np.argsort(codigos)
+    ordenados = np.asarray(codigos)[orden]
+    posiciones = np.clip(np.searchsorted(ordenados, valores), 0, len(ordenados) - 1)
+    return np.where(ordenados[posiciones] == valores, orden[posiciones], -1)
+
+
+def tensor_llegadas(np, hoy, semanas):
+    """
+    Arrivals as a (week, especialidad, priority, weekday, hour) array over the
+    full weeks before `hoy`; week 0 is the most recent one
+    Rows are pre-aggregated per (date, hour, especialidad, priority) in SQL
+    and streamed into the array in batches; archived triages are read too
+    when the weeks reach the archive
+    """
+    inicio = timezone.make_aware(datetime.combine(hoy - timedelta(weeks=semanas), time.min))
+    fin = timezone.make_aware(datetime.combine(hoy, time.min))
+    modelos = [Triaje, TriajeArchivado] if requiere_archivo(hoy - timedelta(weeks=semanas)) else [Triaje]
+    # A (date, hour...) group may come from both tables: np.add.at adds them up
+    filas = chain.from_iterable(
+        modelo.objects.filter(
+            fecha_hora_consulta__gte=inicio,
+            fecha_hora_consulta__lt=fin,
+        ).annotate(
+            fecha=TruncDate('fecha_hora_consulta'),
+            hora=ExtractHour('fecha_hora_consulta'),
+        ).values_list(
+            'fecha', 'hora', 'especialidad', 'nivel_prioridad'
+        ).annotate(total=Count('id')).order_by().iterator(chunk_size=LOTE_FILAS)
+        for modelo in modelos
+    )
+
+    tensor = np.zeros((semanas, len(ESPECIALIDADES), len(PRIORIDADES), 7, 24))
+    hoy_dia = np.datetime64(hoy, 'D')
+    while lote := list(islice(filas, LOTE_FILAS)):
+        fechas, horas, especialidades, prioridades, totales = zip(*lote)
+        dias = np.array(fechas, dtype='datetime64[D]')
+        semana = (hoy_dia - dias - 1).astype(np.int64) // 7
+        # 1970-01-01 was a Thursday; Monday = 0
+        dia_semana = (dias.astype(np.int64) + 3) % 7
+        esp = indices_de(np, ESPECIALIDADES, np.array(especialidades))
+        prio = indices_de(np, PRIORIDADES, np.array(prioridades))
+        validos = (esp >= 0) & (prio >= 0)
+        np.add.at(
+            tensor,
+            (semana[validos], esp[validos], prio[validos], dia_semana[validos],
+             np.array(horas)[validos]),
+            np.array(totales)[validos],
+        )
+    return tensor
+
+
+def duraciones_por_especialidad(np, desde):
+    """
+    Mean attention minutes per especialidad, with global/default fallback;
+    archived attentions count too when `desde` reaches the archive
+    """
+    modelos = [Atencion, AtencionArchivada] if requiere_archivo(timezone.localdate(desde)) else [Atencion]
+    filas = chain.from_iterable(
+        modelo.objects.filter(
+            fecha_fin__isnull=False,
+            fecha_inicio__gte=desde,
+        ).values('triaje__especialidad').annotate(
+            duracion=Avg(F('fecha_fin') - F('fecha_inicio')),
+            total=Count('id'),
+        ).order_by()
+        for modelo in modelos
+    )
+
+    # Minutes x attentions per especialidad: means of both tables combine by weight
+    ponderados, totales = Counter(), Counter()
+    for fila in filas:
+        ponderados[fila['triaje__especialidad']] += fila['duracion'].total_seconds() / 60 * fila['total']
+        totales[fila['triaje__especialidad']] += fila['total']
+    medias = {esp: ponderados[esp] / totales[esp] for esp in totales}
+    total = sum(totales.values())
+    por_defecto = sum(ponderados.values()) / total if total else DURACION_POR_DEFECTO_MINUTOS
+    return np.array([medias.get(esp, por_defecto) for esp in ESPECIALIDADES])
+
+
+def calcular_pronostico(hoy=None, semanas=DEMANDA_SEMANAS):
+    """
+    Average weekly arrival heatmaps (total, per especialidad and priority),
+    a 7-day forecast from recency-weighted same weekday/hour averages and the
+    clinicians needed per hour to keep utilization below UTILIZACION_OBJETIVO
+    (clinicians are treated as one shared pool)
+    """
+    import numpy as np
+
+    hoy = hoy or timezone.localdate()
+    tensor = tensor_llegadas(np, hoy, semanas)
+
+    # Heatmaps: mean arrivals per week at each weekday/hour
+    media = tensor.mean(axis=0)
+    por_especialidad = media.sum(axis=1)
+    por_prioridad = media.sum(axis=0)
+
+    # Seasonal forecast per especialidad, weekday and hour
+    pesos = 0.5 ** (np.arange(semanas) / DEMANDA_VIDA_MEDIA_SEMANAS)
+    pesos /= pesos.sum()
+    pronostico = np.tensordot(pesos, tensor.sum(axis=2), axes=1)
+
+    desde = timezone.make_aware(datetime.combine(hoy - timedelta(weeks=semanas), time.min))
+    duraciones = duraciones_por_especialidad(np, desde)
+    # Offered load in clinician-hours per hour (arrivals x mean duration)
+    carga = (pronostico * (duraciones / 60)[:, None, None]).sum(axis=0)
+    medicos = np.ceil(np.round(carga / UTILIZACION_OBJETIVO, 6)).astype(int)
+    llegadas = pronostico.sum(axis=0)
+
+    def redondear(matriz):
+        return np.round(matriz, 2).tolist()
+
+    dias = []
+    for offset in range(7):
+        fecha = hoy + timedelta(days=offset)
+        dia = fecha.weekday()
+        dias.append({
+            'fecha': fecha.isoformat(),
+            'dia_semana': DIAS_SEMANA[dia],
+            'llegadas': redondear(llegadas[dia]),
+            'total': round(float(llegadas[dia].sum()), 1),
+            'hora_pico': int(llegadas[dia].argmax()),
+            'medicos': medicos[dia].tolist(),
+            'medicos_max': int(medicos[dia].max()),
+        })
+
+    return {
+        'generado': timezone.now().isoformat(),
+        'semanas': semanas,
+        'dias_semana': DIAS_SEMANA,
+        'mapa_calor': {
+            'total': redondear(media.sum(axis=(0, 1))),
+            'especialidad': {
+                esp: redondear(por_especialidad[i])
+                for i, esp in enumerate(ESPECIALIDADES) if por_especialidad[i].any()
+            },
+            'prioridad': {
+                prio: redondear(por_prioridad[i]) for i, prio in enumerate(PRIORIDADES)
+            },
+        },
+        'duracion_minutos': {
+            esp: round(float(duraciones[i]), 1) for i, esp in enumerate(ESPECIALIDADES)
+        },
+        'pronostico': dias,
+    }
+
+
+def filas_mapa_calor(matriz):
+    """Weekday rows of {valor, nivel} cells (nivel 0-1 relative to the peak)"""
+    maximo = max((max(fila) for fila in matriz), default=0) or 1
+    return [
+        {'dia': dia, 'celdas': [{'valor': v, 'nivel': round(v / maximo, 2)} for v in fila]}
+        for dia, fila in zip(DIAS_SEMANA, matriz)
+    ]
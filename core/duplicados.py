@@ -0,0 +1,274 @@
+"""
+Duplicate patient detection
+Índice de bloqueo (clave fonética, fecha de nacimiento, CI) y puntaje de similitud
+"""
+
+import os
+import re
+from difflib import SequenceMatcher
+from itertools import combinations
+from multiprocessing import Pool
+
+from django.db.models import Q
+
+from .fonetica import fonetica_nombre, palabras_nombre
+from .models import Paciente, PosibleDuplicado
+
+
+# Pairs scoring at least this are recorded for review
+UMBRAL_DUPLICADO = 0.75
+# Weights of the name, birth date and CI similarities (they add up to 1)
+PESO_NOMBRE = 0.55
+PESO_FECHA = 0.30
+PESO_CI = 0.15
+PENALIZACION_SEXO = 0.10
+
+# Blocks larger than this (a placeholder birth date, a very common name)
+# are skipped; their pairs are still compared through any smaller block
+MAX_BLOQUE = 500
+# CIs shorter than this get no near-miss keys
+CI_MINIMO = 5
+LIMITE_CANDIDATOS = 200
+LOTE_PACIENTES = 5000
+BLOQUES_POR_TAREA = 2000
+
+DIGITOS = '0123456789'
+NO_ALFANUMERICO = re.compile(r'[^0-9A-Z]+')
+
+
+def registro(paciente_id, nombre, fecha, ci, sexo, fonetica=None):
+    """Compact, picklable form of a patient used for blocking and scoring"""
+    return (
+        paciente_id,
+        ' '.join(sorted(palabras_nombre(nombre))),
+        fecha,
+        NO_ALFANUMERICO.sub('', (ci or '').upper()),
+        sexo,
+        fonetica if fonetica is not None else fonetica_nombre(nombre),
+    )
+
+
+def _borrados(ci):
+    """The CI and every string with one character removed"""
+    return {ci, *(ci[:i] + ci[i + 1:] for i in range(len(ci)))}
+
+
+def claves_bloqueo(reg):
+    """
+    Blocking keys of a registro: phonetic name, birth date and the CI's
+    one-deletion n-grams, which two CIs share when they are one digit apart
+    (substitution, insertion, deletion or swapped neighbours)
+    """
+    _, _, fecha, ci, _, fonetica = reg
+    claves = {'n' + fecha.isoformat()}
+    if fonetica:
+        claves.add('f' + fonetica)
+    if len(ci) >= CI_MINIMO:
+        claves.update('c' + variante for variante in _borrados(ci))
+    return claves
+
+
+def vecinos_ci(ci):
+    """Every CI one digit edit away, for an indexed `ci__in` lookup"""
+    vecinos = set()
+    for i in range(len(ci) + 1):
+        vecinos.update(ci[:i] + d + ci[i:] for d in DIGITOS)
+        if i < len(ci):
+            vecinos.add(ci[:i] + ci[i + 1:])
+            vecinos.update(ci[:i] + d + ci[i + 1:] for d in DIGITOS)
+        if i + 1 < len(ci):
+            vecinos.add(ci[:i] + ci[i + 1] + ci[i] + ci[i + 2:])
+    vecinos.discard(ci)
+    return vecinos
+
+
+def _similitud_fecha(a, b):
+    if a == b:
+        return 1.0
+    iguales = (a.year == b.year) + (a.month == b.month) + (a.day == b.day)
+    # One field mistyped, day and month swapped, or off by one day
+    if iguales == 2 or (a.year == b.year and a.month == b.day and a.day == b.month) \
+            or abs((a - b).days) == 1:
+        return 0.5
+    return 0.0
+
+
+def _similitud_ci(a, b):
+    if a == b:
+        return 1.0
+    if a and b and abs(len(a) - len(b)) <= 1 and _borrados(a) & _borrados(b):
+        return 0.6
+    return 0.0
+
+
+def puntuar(a, b, umbral=UMBRAL_DUPLICADO):
+    """
+    Weighted 0-1 similarity of two registros, or None when it cannot reach
+    `umbral`; the name ratio, the expensive part, is computed last and only
+    when the cheap upper bounds still allow it
+    """
+    resto = PESO_FECHA * _similitud_fecha(a[2], b[2]) + PESO_CI * _similitud_ci(a[3], b[3])
+    if a[4] != b[4]:
+        resto -= PENALIZACION_SEXO
+    necesario = (umbral - resto) / PESO_NOMBRE
+    if necesario > 1:
+        return None
+    comparador = SequenceMatcher(None, a[1], b[1], autojunk=False)
+    if comparador.real_quick_ratio() < necesario or comparador.quick_ratio() < necesario:
+        return None
+    nombre = comparador.ratio()
+    if nombre < necesario:
+        return None
+    return round(resto + PESO_NOMBRE * nombre, 3)
+
+
+# ---------------------------------------------------------------
+# Incremental check (registration)
+# ---------------------------------------------------------------
+
+def candidatos_duplicado(nombre, fecha, ci, sexo, excluir=None, umbral=UMBRAL_DUPLICADO):
+    """
+    Existing patients that look like the given data, best first, as
+    [(paciente, puntaje)]; one query over the indexed blocking columns
+    The exact same CI is the same patient, not a duplicate
+    """
+    ci = (ci or '').strip()
+    fecha = Paciente._meta.get_field('fecha_nacimiento').to_python(fecha)
+    fonetica = fonetica_nombre(nombre)
+    condicion = Q(fecha_nacimiento=fecha) | Q(ci__in=vecinos_ci(ci))
+    if fonetica:
+        condicion |= Q(clave_fonetica=fonetica)
+    consulta = Paciente.objects.filter(condicion, anonimizado=False).exclude(ci=ci).order_by()
+    if excluir:
+        consulta = consulta.exclude(id=excluir)
+
+    nuevo = registro(None, nombre, fecha, ci, sexo, fonetica)
+    encontrados = []
+    for paciente in consulta[:LIMITE_CANDIDATOS]:
+        puntaje = puntuar(nuevo, registro(
+            paciente.id, paciente.nombre_completo, paciente.fecha_nacimiento,
+            paciente.ci, paciente.sexo, paciente.clave_fonetica,
+        ), umbral)
+        if puntaje is not None:
+            encontrados.append((paciente, puntaje))
+    return sorted(encontrados, key=lambda par: -par[1])
+
+
+def _guardar_pares(pares):
+    """Store {(id, id): puntaje}; pairs already recorded are left alone"""
+    PosibleDuplicado.objects.bulk_create(
+        [PosibleDuplicado(paciente_id=a, duplicado_id=b, puntaje=p) for (a, b), p in pares.items()],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def registrar_duplicados(paciente):
+    """Record the candidates of a newly registered patient"""
+    encontrados = candidatos_duplicado(
+        paciente.nombre_completo, paciente.fecha_nacimiento, paciente.ci,
+        paciente.sexo, excluir=paciente.id,
+    )
+    _guardar_pares({
+        (min(paciente.id, otro.id), max(paciente.id, otro.id)): puntaje
+        for otro, puntaje in encontrados
+    })
+    return encontrados
+
+
+# ---------------------------------------------------------------
+# Batch scan (detectar_duplicados command)
+# ---------------------------------------------------------------
+
+_REGISTROS = None
+
+
+def _iniciar_proceso(registros):
+    global _REGISTROS
+    _REGISTROS = registros
+
+
+def _puntuar_bloques(tarea):
+    """Worker: score every pair inside each block of registro indices"""
+    bloques, umbral = tarea
+    encontrados = []
+    for bloque in bloques:
+        for i, j in combinations(bloque, 2):
+            a, b = _REGISTROS[i], _REGISTROS[j]
+            puntaje = puntuar(a, b, umbral)
+            if puntaje is not None:
+                encontrados.append((min(a[0], b[0]), max(a[0], b[0]), puntaje))
+    return encontrados
+
+
+def bloques_candidatos(np, registros, max_bloque=MAX_BLOQUE):
+    """
+    Group registro indices by shared blocking key with one sort over
+    (key hash, index) arrays instead of a dict of lists
+    Returns (sorted indices, (start, end) of each block with 2..max_bloque
+    members, number of oversized blocks skipped)
+    """
+    hashes = []
+    indices = []
+    for indice, reg in enumerate(registros):
+        for clave in claves_bloqueo(reg):
+            hashes.append(hash(clave))
+            indices.append(indice)
+    hashes = np.array(hashes, dtype=np.int64)
+    indices = np.array(indices, dtype=np.int32)
+    orden = np.argsort(hashes, kind='stable')
+    hashes, indices = hashes[orden], indices[orden]
+
+    inicios = np.flatnonzero(np.concatenate(([True], hashes[1:] != hashes[:-1])))
+    fines = np.append(inicios[1:], len(hashes))
+    tamanos = fines - inicios
+    validos = (tamanos >= 2) & (tamanos <= max_bloque)
+    return indices, np.column_stack((inicios[validos], fines[validos])), int((tamanos > max_bloque).sum())
+
+
+def detectar_duplicados(procesos=None, umbral=UMBRAL_DUPLICADO, max_bloque=MAX_BLOQUE, progreso=None):
+    """
+    Scan the whole patient master: block, score the pairs inside each block
+    in `procesos` worker processes and record the candidates
+    Only pairs sharing a block are compared, never all n² pairs
+    """
+    import numpy as np
+
+    registros = [
+        registro(*fila[:5], fonetica=fila[5] or None)
+        for fila in Paciente.objects.filter(anonimizado=False).order_by().values_list(
+            'id', 'nombre_completo', 'fecha_nacimiento', 'ci', 'sexo', 'clave_fonetica'
+        ).iterator(chunk_size=LOTE_PACIENTES)
+    ]
+    if not registros:
+        return {'pacientes': 0, 'bloques': 0, 'bloques_omitidos': 0, 'comparaciones': 0, 'pares': 0}
+    indices, limites, omitidos = bloques_candidatos(np, registros, max_bloque)
+    tamanos = limites[:, 1] - limites[:, 0]
+    comparaciones = int((tamanos * (tamanos - 1) // 2).sum())
+    if progreso:
+        progreso(f'{len(registros)} pacientes, {len(limites)} bloques, '
+                 f'{comparaciones} comparaciones, {omitidos} bloques omitidos')
+
+    def tareas():
+        for desde in range(0, len(limites), BLOQUES_POR_TAREA):
+            yield [indices[a:b].tolist() for a, b in limites[desde:desde + BLOQUES_POR_TAREA]], umbral
+
+    pares = {}
+    procesos = procesos or os.cpu_count() or 1
+    if procesos > 1:
+        with Pool(procesos, initializer=_iniciar_proceso, initargs=(registros,)) as pool:
+            for encontrados in pool.imap_unordered(_puntuar_bloques, tareas()):
+                pares.update(((a, b), puntaje) for a, b, puntaje in encontrados)
+    else:
+        _iniciar_proceso(registros)
+        for tarea in tareas():
+            pares.update(((a, b), puntaje) for a, b, puntaje in _puntuar_bloques(tarea))
+
+    _guardar_pares(pares)
+    return {
+        'pacientes': len(registros),
+        'bloques': len(limites),
+        'bloques_omitidos': omitidos,
+        'comparaciones': comparaciones,
+        'pares': len(pares),
+    }
@@ -0,0 +1,159 @@
+"""
+Estimated wait for queued patients
+Ritmo de atención por especialidad, actualizado al finalizar cada atención
+"""
+
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db.models import Avg, F
+from django.utils import timezone
+
+from .models import Atencion
+
+
+RITMO_KEY = 'cola:ritmo'
+
+# Completions made on other instances only show up when the state is
+# rebuilt from the database, so it expires periodically
+RITMO_TIMEOUT = 600
+
+# Throughput and mean duration are measured over this window, in buckets
+# of RITMO_CUBETA seconds; the mean over RITMO_HISTORIAL stands in when the
+# window has no completions
+RITMO_VENTANA = timedelta(hours=2)
+RITMO_CUBETA = 600
+RITMO_HISTORIAL = timedelta(days=7)
+
+
+def _cubeta(fecha):
+    return int(fecha.timestamp() // RITMO_CUBETA)
+
+
+def _cubetas_ventana(ahora):
+    return range(_cubeta(ahora - RITMO_VENTANA) + 1, _cubeta(ahora) + 1)
+
+
+def _clave_contador(generacion, especialidad, cubeta, campo):
+    return f'{RITMO_KEY}:{generacion}:{especialidad}:{cubeta}:{campo}'
+
+
+def _ritmo_desde_bd():
+    """
+    Per-especialidad counts and duration sums of the window's buckets, and
+    the longer-run mean duration, from finished attentions
+    Completions after it go to counters of its `generacion`
+    """
+    ahora = timezone.now()
+    inicio = datetime.fromtimestamp(_cubetas_ventana(ahora)[0] * RITMO_CUBETA, tz=dt_timezone.utc)
+    cubetas = {}
+    filas = Atencion.objects.filter(fecha_fin__gte=inicio).values_list(
+        'triaje__especialidad', 'fecha_inicio', 'fecha_fin'
+    )
+    for especialidad, fecha_inicio, fecha_fin in filas:
+        for clave in (especialidad, None):
+            suma = cubetas.setdefault(clave, {}).setdefault(_cubeta(fecha_fin), [0, 0])
+            suma[0] += 1
+            suma[1] += (fecha_fin - fecha_inicio).total_seconds()
+
+    recientes = Atencion.objects.filter(fecha_fin__gte=ahora - RITMO_HISTORIAL)
+    duracion = F('fecha_fin') - F('fecha_inicio')
+    medias = {
+        fila['triaje__especialidad']: fila['media']
+        for fila in recientes.values('triaje__especialidad').annotate(media=Avg(duracion))
+    }
+    medias[None] = recientes.aggregate(media=Avg(duracion))['media']
+    return {
+        'generacion': time.time_ns(),
+        'cubetas': cubetas,
+        'medias': {clave: media.total_seconds() / 60 for clave, media in medias.items() if media},
+    }
+
+
+def get_ritmo():
+    """Database state of the counts (None holds every especialidad)"""
+    return cache.get_or_set(RITMO_KEY, _ritmo_desde_bd, RITMO_TIMEOUT)
+
+
+def registrar_atencion_finalizada(atencion):
+    """
+    Count a finished attention with atomic cache increments, so concurrent
+    completions are never lost; a repeated save is counted once
+    """
+    if not cache.add(f'{RITMO_KEY}:atencion:{atencion.id}', True, RITMO_VENTANA.total_seconds()):
+        return
+    generacion = get_ritmo()['generacion']
+    cubeta = _cubeta(atencion.fecha_fin)
+    segundos = round((atencion.fecha_fin - atencion.fecha_inicio).total_seconds())
+    for clave in (atencion.triaje.especialidad, None):
+        for campo, valor in (('n', 1), ('segundos', segundos)):
+            contador = _clave_contador(generacion, clave, cubeta, campo)
+            cache.add(contador, 0, RITMO_TIMEOUT)
+            try:
+                cache.incr(contador, valor)
+            except ValueError:
+                # Expired in between: the next rebuild reads it from the database
+                pass
+
+
+def _sumas_ventana(estado, claves, ahora):
+    """especialidad -> (completions, duration seconds) in the window"""
+    cubetas = _cubetas_ventana(ahora)
+    contadores = cache.get_many([
+        _clave_contador(estado['generacion'], clave, cubeta, campo)
+        for clave in claves for cubeta in cubetas for campo in ('n', 'segundos')
+    ])
+    sumas = {}
+    for clave in claves:
+        base = estado['cubetas'].get(clave, {})
+        n = segundos = 0
+        for cubeta in cubetas:
+            desde_bd = base.get(cubeta, (0, 0))
+            n += desde_bd[0] + contadores.get(_clave_contador(estado['generacion'], clave, cubeta, 'n'), 0)
+            segundos += desde_bd[1] + contadores.get(
+                _clave_contador(estado['generacion'], clave, cubeta, 'segundos'), 0,
+            )
+        sumas[clave] = (n, segundos)
+    return sumas
+
+
+def minutos_por_paciente(completadas, segundos, media=None):
+    """
+    Minutes between patients seen: recent throughput when several clinicians
+    work in parallel, never slower than one clinician's mean duration (over
+    the window, else the longer-run `media`)
+    None without either
+    """
+    if completadas:
+        duracion = max(segundos / completadas / 60, 1)
+        return min(duracion, RITMO_VENTANA.total_seconds() / 60 / completadas)
+    return max(media, 1) if media else None
+
+
+def estimar_esperas(cola):
+    """
+    Estimated minutes until each waiting triage is seen, keyed by id
+    `cola` must be in queue order (priority, then arrival); each patient waits
+    for the ones ahead in the same especialidad plus, on average, half of the
+    current consultation
+    """
+    estado = get_ritmo()
+    sumas = _sumas_ventana(estado, {triaje.especialidad for triaje in cola} | {None}, timezone.now())
+    ritmos = {}
+    posiciones = {}
+    esperas = {}
+    for triaje in cola:
+        especialidad = triaje.especialidad
+        if especialidad not in ritmos:
+            # Especialidades without data of their own use the overall pace
+            if sumas[especialidad][0] or especialidad in estado['medias']:
+                datos = (*sumas[especialidad], estado['medias'].get(especialidad))
+            else:
+                datos = (*sumas[None], estado['medias'].get(None))
+            ritmos[especialidad] = minutos_por_paciente(*datos)
+        posicion = posiciones.get(especialidad, 0)
+        posiciones[especialidad] = posicion + 1
+        ritmo = ritmos[especialidad]
+        esperas[triaje.id] = round((posicion + 0.5) * ritmo) if ritmo else None
+    return esperas
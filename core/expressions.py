@@ -0,0 +1,77 @@
+"""
+Custom database expressions for Clinical Triage System
+Expresiones SQL reutilizables para reportes y analítica
+"""
+
+from django.db import NotSupportedError
+from django.db.models import (
+    Aggregate, Case, CharField, ExpressionWrapper, F, IntegerField, Value, When,
+)
+from django.db.models.functions import ExtractDay, ExtractMonth, ExtractYear
+from django.db.models.lookups import GreaterThan, GreaterThanOrEqual, IsNull
+
+
+class Percentil(Aggregate):
+    """
+    Continuous percentile of an expression within each group
+    PERCENTILE_CONT(p) WITHIN GROUP (ORDER BY expr) - PostgreSQL only
+    Durations come back as timedelta; pass output_field=FloatField() for
+    interpolated numeric values
+    """
+    function = 'PERCENTILE_CONT'
+    name = 'Percentil'
+    template = '%(function)s(%(percentil)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+
+    def __init__(self, expression, percentil, **extra):
+        if not 0 <= percentil <= 1:
+            raise ValueError('El percentil debe estar entre 0 y 1')
+        super().__init__(expression, percentil=float(percentil), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        if connection.vendor != 'postgresql':
+            raise NotSupportedError('Los percentiles requieren PostgreSQL')
+        return super().as_sql(compiler, connection, **extra_context)
+
+
+def _mes_dia(campo):
+    # MMDD as an integer, to compare anniversaries across years
+    return ExtractMonth(campo) * 100 + ExtractDay(campo)
+
+
+def edad_en(nacimiento, referencia):
+    """
+    Age in whole years of `nacimiento` at the `referencia` date/datetime,
+    computed in SQL (datetimes are converted to the current time zone)
+    Usage: Triaje.objects.annotate(edad=edad_en('paciente__fecha_nacimiento', 'fecha_hora_consulta'))
+    Field names or expressions (e.g. a Subquery) are accepted
+    """
+    nacimiento, referencia = (F(x) if isinstance(x, str) else x for x in (nacimiento, referencia))
+    return ExpressionWrapper(
+        ExtractYear(referencia) - ExtractYear(nacimiento) - Case(
+            When(GreaterThan(_mes_dia(nacimiento), _mes_dia(referencia)), then=Value(1)),
+            default=Value(0),
+        ),
+        output_field=IntegerField(),
+    )
+
+
+# (band, lower bound in years); each band ends where the next one starts
+BANDAS_EDAD = [
+    ('pediatrico', 0),
+    ('adulto', 18),
+    ('geriatrico', 65),
+]
+
+
+def banda_edad(edad):
+    """
+    Age band label (pediatrico/adulto/geriatrico) for an age expression;
+    'sin_dato' when the age is unknown (no fecha_nacimiento)
+    """
+    bandas = list(reversed(BANDAS_EDAD))
+    return Case(
+        When(IsNull(edad, True), then=Value('sin_dato')),
+        *[When(GreaterThanOrEqual(edad, Value(desde)), then=Value(banda)) for banda, desde in bandas[:-1]],
+        default=Value(bandas[-1][0]),
+        output_field=CharField(),
+    )
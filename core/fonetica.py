@@ -0,0 +1,60 @@
+"""
+Spanish phonetic key for patient names
+Clave fonética de nombres en español para detectar pacientes duplicados
+"""
+
+import re
+import unicodedata
+
+
+# Particles left out of the key: "María de la Cruz" ~ "María Cruz"
+PARTICULAS = {'de', 'del', 'la', 'las', 'los', 'y', 'e'}
+
+# Applied in order to each word once accents are stripped
+REGLAS_FONETICAS = [
+    (re.compile(r'^x'), 'j'),            # Ximena ~ Jimena
+    (re.compile(r'x'), 'ks'),
+    (re.compile(r'ch'), 'x'),            # x stands for ch from here on
+    (re.compile(r'qu(?=[ei])'), 'k'),
+    (re.compile(r'q'), 'k'),
+    (re.compile(r'g(?=[ei])'), 'j'),     # gente ~ jente
+    (re.compile(r'gu(?=[ei])'), 'g'),    # guerra ~ gerra
+    (re.compile(r'c(?=[ei])'), 's'),     # ceci ~ sesi
+    (re.compile(r'c'), 'k'),
+    (re.compile(r'z'), 's'),
+    (re.compile(r'v'), 'b'),
+    (re.compile(r'w'), 'u'),
+    (re.compile(r'll'), 'y'),
+    (re.compile(r'y(?![aeiou])'), 'i'),  # Ruy ~ Rui
+    (re.compile(r'h'), ''),
+    (re.compile(r'(.)\1+'), r'\1'),      # rr, ss, ll...
+]
+VOCALES_INTERIORES = re.compile(r'(?<=.)[aeiou]')
+NO_LETRAS = re.compile(r'[^a-z ]+')
+
+
+def normalizar_nombre(nombre):
+    """Lowercase, no accents or punctuation, single spaces"""
+    texto = unicodedata.normalize('NFKD', nombre or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+    return ' '.join(NO_LETRAS.sub(' ', texto).split())
+
+
+def fonetica_palabra(palabra):
+    """Phonetic code of one normalized word: Rodríguez, Rodriges -> rdrgs"""
+    for patron, reemplazo in REGLAS_FONETICAS:
+        palabra = patron.sub(reemplazo, palabra)
+    return VOCALES_INTERIORES.sub('', palabra)
+
+
+def palabras_nombre(nombre):
+    """Normalized words of a name without particles"""
+    return [p for p in normalizar_nombre(nombre).split() if p not in PARTICULAS]
+
+
+def fonetica_nombre(nombre):
+    """
+    Sorted phonetic codes of the words of a name, so that spelling variants
+    and swapped given names/surnames share the key
+    """
+    return ' '.join(sorted(fonetica_palabra(p) for p in palabras_nombre(nombre)))[:100]
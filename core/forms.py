@@ -5,7 +5,7 @@ Formularios para registro de pacientes y triaje
 
 from django import forms
 from django.contrib.auth.forms import AuthenticationForm
-from .models import Paciente, Triaje, Atencion, Usuario
+from .models import Paciente, Triaje, NotaClinica, Usuario, CATEGORIAS_PRESION, parse_presion
 
 
 class LoginForm(AuthenticationForm):
@@ -138,6 +138,15 @@ class TriajeSignosVitalesForm(forms.Form):
         widget=forms.RadioSelect(attrs={'class': 'priority-radio'})
     )
 
+    def clean_presion_arterial(self):
+        presion = self.cleaned_data['presion_arterial'].strip()
+        sistolica, diastolica = parse_presion(presion)
+        if sistolica is None:
+            raise forms.ValidationError('Use el formato sistólica/diastólica, p. ej. 120/80.')
+        if not (50 <= sistolica <= 300 and 20 <= diastolica <= 200) or diastolica >= sistolica:
+            raise forms.ValidationError('La presión arterial ingresada no es válida.')
+        return f'{sistolica}/{diastolica}'
+
 
 class TriajeDiagnosticoForm(forms.Form):
     """Form for triage - Step 4: Diagnosis"""
@@ -171,9 +180,9 @@ class TriajeDiagnosticoForm(forms.Form):
 
 
 class AtencionForm(forms.ModelForm):
-    """Form for completing patient attention"""
+    """Form for completing patient attention (notes are stored in NotaClinica)"""
     class Meta:
-        model = Atencion
+        model = NotaClinica
         fields = ['observaciones', 'medicamentos_dispensados']
         widgets = {
             'observaciones': forms.Textarea(attrs={
@@ -217,3 +226,10 @@ class BusquedaPacienteForm(forms.Form):
             'type': 'date'
         })
     )
+    presion = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Todas')] + [
+            (codigo, etiqueta) for codigo, etiqueta, _ in CATEGORIAS_PRESION if codigo != 'normal'
+        ],
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
@@ -0,0 +1,129 @@
+"""
+Merge duplicate patient records
+Fusión de pacientes duplicados: reasigna triajes al paciente que se conserva
+"""
+
+from django.db import transaction
+from django.db.models import Case, Value, When
+
+from .models import Paciente, RegistroAuditoria, Triaje, TriajeArchivado
+from .queue import bump_queue_version
+from .reports import bump_report_version
+from .tendencias import invalidar_signos
+
+
+# Merge groups per transaction in batch jobs: short locks on live tables
+LOTE_FUSION = 100
+
+
+def agrupar_pares(pares):
+    """
+    Connected groups of patient ids from (a, b) pairs, so chains like
+    A~B, B~C merge into one patient instead of depending on order
+    """
+    padres = {}
+
+    def raiz(x):
+        padres.setdefault(x, x)
+        while padres[x] != x:
+            padres[x] = padres[padres[x]]
+            x = padres[x]
+        return x
+
+    for a, b in pares:
+        padres[raiz(a)] = raiz(b)
+    grupos = {}
+    for x in list(padres):
+        grupos.setdefault(raiz(x), []).append(x)
+    return list(grupos.values())
+
+
+def elegir_supervivientes(grupos):
+    """
+    (superviviente, [duplicados]) per group: the patient with most triages
+    survives, ties go to the earliest registered (lowest id)
+    """
+    ids = [pid for grupo in grupos for pid in grupo]
+    triajes = dict(Paciente.objects.filter(id__in=ids).values_list('id', 'total_visitas'))
+    resultado = []
+    for grupo in grupos:
+        existentes = sorted((pid for pid in grupo if pid in triajes), key=lambda pid: (-triajes[pid], pid))
+        if len(existentes) > 1:
+            resultado.append((existentes[0], existentes[1:]))
+    return resultado
+
+
+def fusionar_pacientes(fusiones, usuario=None, ip_address=None):
+    """
+    Merge every (superviviente, [duplicados]) in one transaction:
+    one UPDATE per table re-points all their live and archived triages (and
+    one refreshes their patient snapshot), the survivors' visit counters and tipo_paciente are
+    recomputed, the duplicates are deleted and each merge writes one audit entry
+    Returns the number of triages moved
+    """
+    destino = {dup: superviviente for superviviente, duplicados in fusiones for dup in duplicados}
+    supervivientes = {superviviente for superviviente, _ in fusiones}
+    if not destino:
+        return 0
+    if supervivientes & destino.keys():
+        raise ValueError('Un paciente no puede conservarse y fusionarse en la misma operación')
+
+    with transaction.atomic():
+        # Lock the patients in id order so concurrent merges cannot deadlock
+        pacientes = {
+            p.id: p for p in Paciente.objects.select_for_update().filter(
+                id__in=[*supervivientes, *destino]
+            ).order_by('id')
+        }
+        reasignar = Case(*[When(paciente_id=dup, then=Value(sup)) for dup, sup in destino.items()])
+        movidos = 0
+        for modelo in (Triaje, TriajeArchivado):
+            movidos += modelo.objects.filter(paciente_id__in=list(destino)).update(paciente_id=reasignar)
+            # Moved triages take the survivor's name, CI and age snapshot
+            modelo.objects.filter(paciente_id__in=list(supervivientes)).sincronizar_paciente()
+        sobrevivientes = Paciente.objects.filter(id__in=list(supervivientes))
+        sobrevivientes.recalcular_visitas()
+        sobrevivientes.update(
+            tipo_paciente=Case(When(total_visitas__gt=1, then=Value('antiguo')), default=Value('nuevo'))
+        )
+        # Cascades to their PosibleDuplicado pairs
+        Paciente.objects.filter(id__in=list(destino)).delete()
+
+        RegistroAuditoria.objects.bulk_create([
+            RegistroAuditoria(
+                usuario=usuario,
+                accion='fusionar_pacientes',
+                descripcion='Pacientes fusionados en {}: {}'.format(
+                    pacientes[sup],
+                    ', '.join(str(pacientes[dup]) for dup in duplicados if dup in pacientes),
+                ),
+                ip_address=ip_address,
+            )
+            for sup, duplicados in fusiones if sup in pacientes
+        ])
+
+        def invalidar():
+            # QuerySet.update sends no signals: refresh cached queue, reports
+            # and the survivors' vitals trend here
+            bump_queue_version()
+            bump_report_version()
+            for sup in supervivientes:
+                invalidar_signos(sup)
+
+        transaction.on_commit(invalidar)
+    return movidos
+
+
+def fusionar_en_lotes(fusiones, lote=LOTE_FUSION, usuario=None, progreso=None):
+    """
+    Batch job: merge in chunks of `lote` groups, each committed on its own
+    Returns (groups merged, triages moved)
+    """
+    fusionados = movidos = 0
+    for desde in range(0, len(fusiones), lote):
+        parte = fusiones[desde:desde + lote]
+        movidos += fusionar_pacientes(parte, usuario=usuario)
+        fusionados += len(parte)
+        if progreso:
+            progreso(fusionados, movidos)
+    return fusionados, movidos
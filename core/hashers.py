@@ -0,0 +1,29 @@
+"""
+Password hashers for Clinical Triage System
+Perfil de costo configurable para el hash de contraseñas
+"""
+
+from django.conf import settings
+from django.contrib.auth.hashers import ScryptPasswordHasher
+
+
+class PerfilScryptPasswordHasher(ScryptPasswordHasher):
+    """
+    scrypt with cost parameters taken from settings.PASSWORD_SCRYPT
+    Hashes made with other parameters (or with PBKDF2) are upgraded
+    transparently on the user's next successful login
+    """
+    # Upper bound only; scrypt allocates ~128 * N * r bytes
+    maxmem = 256 * 1024 * 1024
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT['N']
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT['r']
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT['p']
@@ -0,0 +1,59 @@
+"""
+Nightly report snapshots
+Agregados de reportes precalculados para los rangos estándar; la vista de
+reportes solo calcula en vivo el día en curso y lo combina
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import InstantaneaReporte
+from .reports import MotorReportes, bump_report_version
+
+
+def rangos_estandar(hoy=None):
+    """Name -> (fecha_desde, fecha_hasta) of the ranges the reports page offers"""
+    hoy = hoy or timezone.localdate()
+    inicio_mes = hoy.replace(day=1)
+    fin_mes_anterior = inicio_mes - timedelta(days=1)
+    return {
+        'ultimos_7': (hoy - timedelta(days=7), hoy),
+        # rango_fechas() default
+        'ultimos_30': (hoy - timedelta(days=30), hoy),
+        'ultimos_90': (hoy - timedelta(days=90), hoy),
+        'mes': (inicio_mes, hoy),
+        'mes_anterior': (fin_mes_anterior.replace(day=1), fin_mes_anterior),
+        'anio': (hoy.replace(month=1, day=1), hoy),
+    }
+
+
+def generar_instantaneas(hoy=None, progreso=None):
+    """
+    Precompute every standard range up to yesterday and replace the old
+    snapshots; run after midnight so today's ranges start where the
+    requests will
+    Returns {name: triages covered}
+    """
+    hoy = hoy or timezone.localdate()
+    ayer = hoy - timedelta(days=1)
+    nuevas = {}
+    resumen = {}
+    for nombre, (desde, hasta) in rangos_estandar(hoy).items():
+        hasta = min(hasta, ayer)
+        # Nothing before today yet, or the same range as another name
+        if hasta < desde or (desde, hasta) in nuevas:
+            continue
+        datos = MotorReportes(desde, hasta).agregados(histogramas=True)
+        nuevas[desde, hasta] = InstantaneaReporte(fecha_desde=desde, fecha_hasta=hasta, datos=datos)
+        resumen[nombre] = datos['totales']['total_registrados']
+        if progreso:
+            progreso(nombre, desde, hasta)
+
+    with transaction.atomic():
+        InstantaneaReporte.objects.all().delete()
+        InstantaneaReporte.objects.bulk_create(nuevas.values())
+    # Cached reports of these ranges were computed without the snapshots
+    bump_report_version()
+    return resumen
@@ -0,0 +1,30 @@
+"""
+Move closed triages older than ARCHIVO_DIAS to the archive tables
+Lotes cortos con pausa entre ellos para no competir con la clínica en uso
+
+Usage: python manage.py archivar_triajes [--dias 365] [--lote 500] [--pausa 0.5]
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.archivo import archivar
+
+
+class Command(BaseCommand):
+    help = "Archive 'atendido' triages older than a given age in batched transactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=settings.ARCHIVO_DIAS,
+                            help='Archive triages seen more than this many days ago')
+        parser.add_argument('--lote', type=int, default=settings.ARCHIVO_LOTE,
+                            help='Triages moved per transaction')
+        parser.add_argument('--pausa', type=float, default=settings.ARCHIVO_PAUSA,
+                            help='Seconds to sleep between batches')
+
+    def handle(self, *args, **options):
+        def progreso(total):
+            self.stdout.write(f'{total} triajes archivados')
+
+        total = archivar(options['dias'], options['lote'], options['pausa'], progreso=progreso)
+        self.stdout.write(self.style.SUCCESS(f'Archivo completado: {total} triajes'))
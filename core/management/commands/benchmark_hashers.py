@@ -0,0 +1,77 @@
+"""
+Measure password hashing cost on this host
+Ayuda a elegir los parámetros de PASSWORD_SCRYPT para el servidor de despliegue
+
+Usage: python manage.py benchmark_hashers [--rounds 3] [--target-ms 250]
+"""
+
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, get_hasher
+from django.core.management.base import BaseCommand
+
+from core.hashers import PerfilScryptPasswordHasher
+
+
+# scrypt parameter sets of equivalent strength (OWASP password storage
+# guidance): lower memory is compensated with more parallel lanes
+CANDIDATOS_SCRYPT = [
+    (2**17, 8, 1),
+    (2**16, 8, 2),
+    (2**15, 8, 3),
+    (2**14, 8, 5),
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark password hashers on this host to tune PASSWORD_SCRYPT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=3,
+                            help='Hashes per measurement (median is reported)')
+        parser.add_argument('--target-ms', type=float, default=250,
+                            help='Maximum acceptable time per login hash')
+
+    def handle(self, *args, **options):
+        rounds = options['rounds']
+        target_ms = options['target_ms']
+
+        actual = get_hasher('default')
+        self.stdout.write(f'Preferred hasher: {actual.algorithm} '
+                          f'(profile {settings.PASSWORD_HASH_PROFILE})')
+        self.stdout.write(f'  current profile: {self._medir(lambda: actual.encode("benchmark", actual.salt()), rounds):8.1f} ms')
+
+        pbkdf2 = PBKDF2PasswordHasher()
+        ms = self._medir(lambda: pbkdf2.encode('benchmark', pbkdf2.salt()), rounds)
+        self.stdout.write(f'  pbkdf2_sha256 ({pbkdf2.iterations} iterations): {ms:8.1f} ms')
+
+        scrypt = PerfilScryptPasswordHasher()
+        resultados = []
+        for n, r, p in CANDIDATOS_SCRYPT:
+            ms = self._medir(lambda: scrypt.encode('benchmark', scrypt.salt(), n, r, p), rounds)
+            memoria_mb = 128 * n * r / (1024 * 1024)
+            resultados.append((ms, n, r, p))
+            self.stdout.write(f'  scrypt N=2^{n.bit_length() - 1} r={r} p={p} '
+                              f'({memoria_mb:.0f} MB): {ms:8.1f} ms')
+
+        ms, n, r, p = min(resultados)
+        self.stdout.write('')
+        if ms > target_ms:
+            self.stdout.write(self.style.WARNING(
+                f'No scrypt profile fits in {target_ms:.0f} ms on this host; '
+                f'fastest is {ms:.1f} ms'
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Recommended: PASSWORD_HASH_PROFILE=scrypt PASSWORD_SCRYPT_N={n} '
+            f'PASSWORD_SCRYPT_R={r} PASSWORD_SCRYPT_P={p}'
+        ))
+
+    def _medir(self, func, rounds):
+        tiempos = []
+        for _ in range(rounds):
+            inicio = time.perf_counter()
+            func()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        tiempos.sort()
+        return tiempos[len(tiempos) // 2]
@@ -0,0 +1,27 @@
+"""
+Compute the arrival heatmap and staffing forecast
+Ejecutar cada noche; el resultado queda guardado en la base de datos para reportes y API
+
+Usage: python manage.py calcular_pronostico [--semanas 8]
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.demanda import DEMANDA_SEMANAS, actualizar_pronostico
+
+
+class Command(BaseCommand):
+    help = 'Compute arrival heatmaps and the 7-day staffing forecast'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--semanas', type=int, default=DEMANDA_SEMANAS,
+                            help='Weeks of history used for the heatmap and forecast')
+
+    def handle(self, *args, **options):
+        resultado = actualizar_pronostico(semanas=options['semanas'])
+        for dia in resultado['pronostico']:
+            self.stdout.write(
+                f"{dia['fecha']} {dia['dia_semana']}: {dia['total']:.1f} llegadas, "
+                f"pico {dia['hora_pico']:02d}:00, hasta {dia['medicos_max']} médicos"
+            )
+        self.stdout.write(self.style.SUCCESS('Pronóstico actualizado'))
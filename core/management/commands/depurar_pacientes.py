@@ -0,0 +1,48 @@
+"""
+Anonymize or purge patients not seen within the retention period
+Lotes cortos ordenados por id, con pausa entre ellos; se puede reanudar
+
+Usage: python manage.py depurar_pacientes [--modo anonimizar|purgar] [--dias 3650]
+       [--lote 200] [--pausa 0.5] [--desde-id 0] [--aplicar]
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.retencion import MODOS, depurar, limite_retencion, vencidos
+
+
+class Command(BaseCommand):
+    help = 'Apply the patient retention policy in small, resumable batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modo', choices=MODOS, default='anonimizar',
+                            help='anonimizar: remove identifiers, keep statistics; purgar: delete')
+        parser.add_argument('--dias', type=int, default=settings.RETENCION_DIAS,
+                            help='Patients not seen for this many days are affected')
+        parser.add_argument('--lote', type=int, default=settings.RETENCION_LOTE,
+                            help='Patients processed per transaction')
+        parser.add_argument('--pausa', type=float, default=settings.RETENCION_PAUSA,
+                            help='Seconds to sleep between batches')
+        parser.add_argument('--desde-id', type=int, default=0,
+                            help='Resume after this patient id (printed by a previous run)')
+        parser.add_argument('--aplicar', action='store_true',
+                            help='Apply the policy (default: only report how many patients match)')
+
+    def handle(self, *args, **options):
+        modo = options['modo']
+        pendientes = vencidos(limite_retencion(options['dias']), modo).filter(id__gt=options['desde_id'])
+        self.stdout.write(f"{pendientes.count()} pacientes a {modo} (sin visitas en {options['dias']} días)")
+        if not options['aplicar']:
+            self.stdout.write('Sin cambios: use --aplicar para ejecutar')
+            return
+
+        def progreso(resumen):
+            self.stdout.write('{pacientes} pacientes, {triajes} triajes (último id {ultimo_id})'.format(**resumen))
+
+        resumen = depurar(
+            modo, options['dias'], options['lote'], options['pausa'], options['desde_id'], progreso=progreso,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Retención completada: {pacientes} pacientes, {triajes} triajes'.format(**resumen)
+        ))
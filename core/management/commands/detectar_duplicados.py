@@ -0,0 +1,37 @@
+"""
+Scan the whole patient master for likely duplicate records
+Los pares encontrados quedan en PosibleDuplicado para su revisión
+
+Usage: python manage.py detectar_duplicados [--procesos 4] [--umbral 0.75] [--max-bloque 500]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.duplicados import MAX_BLOQUE, UMBRAL_DUPLICADO, detectar_duplicados
+
+
+class Command(BaseCommand):
+    help = 'Find likely duplicate patients with a blocking index and parallel scoring'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=None,
+                            help='Worker processes (default: one per CPU)')
+        parser.add_argument('--umbral', type=float, default=UMBRAL_DUPLICADO,
+                            help='Minimum similarity (0-1) to record a pair')
+        parser.add_argument('--max-bloque', type=int, default=MAX_BLOQUE,
+                            help='Blocks with more patients than this are skipped')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        resultado = detectar_duplicados(
+            procesos=options['procesos'],
+            umbral=options['umbral'],
+            max_bloque=options['max_bloque'],
+            progreso=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['pares']} posibles duplicados entre {resultado['pacientes']} pacientes "
+            f"({time.perf_counter() - inicio:.1f} s)"
+        ))
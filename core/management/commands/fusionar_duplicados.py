@@ -0,0 +1,42 @@
+"""
+Merge the pending duplicate pairs found by detectar_duplicados
+Cada lote de fusiones se confirma por separado para no bloquear las tablas de triaje
+
+Usage: python manage.py fusionar_duplicados [--umbral 0.9] [--lote 100] [--aplicar]
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.fusion import LOTE_FUSION, agrupar_pares, elegir_supervivientes, fusionar_en_lotes
+from core.models import PosibleDuplicado
+
+
+class Command(BaseCommand):
+    help = 'Merge pending PosibleDuplicado pairs above a score in chunked transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--umbral', type=float, default=0.9,
+                            help='Only merge pairs scoring at least this')
+        parser.add_argument('--lote', type=int, default=LOTE_FUSION,
+                            help='Merge groups committed per transaction')
+        parser.add_argument('--aplicar', action='store_true',
+                            help='Perform the merge (default: only report what would be merged)')
+
+    def handle(self, *args, **options):
+        pares = PosibleDuplicado.objects.filter(
+            estado='pendiente', puntaje__gte=options['umbral'],
+        ).values_list('paciente_id', 'duplicado_id')
+        fusiones = elegir_supervivientes(agrupar_pares(pares))
+        duplicados = sum(len(d) for _, d in fusiones)
+        self.stdout.write(f'{len(fusiones)} grupos, {duplicados} pacientes duplicados')
+        if not options['aplicar']:
+            self.stdout.write('Sin cambios: use --aplicar para fusionar')
+            return
+
+        def progreso(fusionados, movidos):
+            self.stdout.write(f'{fusionados} grupos fusionados, {movidos} triajes reasignados')
+
+        fusionados, movidos = fusionar_en_lotes(fusiones, options['lote'], progreso=progreso)
+        self.stdout.write(self.style.SUCCESS(
+            f'Fusión completada: {fusionados} grupos, {movidos} triajes reasignados'
+        ))
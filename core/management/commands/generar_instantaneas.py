@@ -0,0 +1,22 @@
+"""
+Precompute the report aggregates of the standard date ranges
+Ejecutar cada noche, después de medianoche; los reportes de esos rangos solo
+calculan en vivo el día en curso
+
+Usage: python manage.py generar_instantaneas
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.instantaneas import generar_instantaneas
+
+
+class Command(BaseCommand):
+    help = 'Precompute report snapshots for the standard date ranges'
+
+    def handle(self, *args, **options):
+        def progreso(nombre, desde, hasta):
+            self.stdout.write(f'{nombre}: {desde} a {hasta}')
+
+        resumen = generar_instantaneas(progreso=progreso)
+        self.stdout.write(self.style.SUCCESS(f'{len(resumen)} instantáneas generadas'))
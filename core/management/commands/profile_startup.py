@@ -0,0 +1,88 @@
+"""
+Measure cold-start cost of the WSGI entry point
+Reporta los módulos más lentos al importar y el tiempo hasta el primer byte
+
+Usage: python manage.py profile_startup [--top 20] [--runs 5] [--path /login/]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+# Fresh interpreter: import the WSGI app, then serve one GET request
+COLD_START_SCRIPT = '''
+import io, sys, time
+t0 = time.perf_counter()
+from triaje_clinico.wsgi import application
+t1 = time.perf_counter()
+environ = {
+    'REQUEST_METHOD': 'GET', 'PATH_INFO': sys.argv[1], 'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'wsgi.url_scheme': 'http',
+    'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+}
+status = []
+b''.join(application(environ, lambda s, h: status.append(s)))
+t2 = time.perf_counter()
+print((t1 - t0) * 1000, (t2 - t0) * 1000, status[0].split()[0])
+'''
+
+
+class Command(BaseCommand):
+    help = 'Report slowest imports and cold-start time to first byte of the WSGI app'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20,
+                            help='Number of modules to list')
+        parser.add_argument('--runs', type=int, default=5,
+                            help='Cold starts to measure (median is reported)')
+        parser.add_argument('--path', default='/login/',
+                            help='URL requested after startup')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'PYTHONPATH': os.pathsep.join(
+            [str(settings.BASE_DIR), os.environ.get('PYTHONPATH', '')]
+        )}
+        self._importaciones(env, options['top'])
+        self._arranques(env, options['runs'], options['path'])
+
+    def _importaciones(self, env, top):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', 'import triaje_clinico.wsgi'],
+            env=env, capture_output=True, text=True,
+        )
+        modulos = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            propio, acumulado, nombre = line[len('import time:'):].split('|')
+            modulos.append((int(propio), int(acumulado), nombre.strip()))
+
+        self.stdout.write(f'Slowest modules by self time (of {len(modulos)} imported):')
+        for propio, acumulado, nombre in sorted(modulos, reverse=True)[:top]:
+            self.stdout.write(f'  {propio / 1000:8.1f} ms  (cumulative {acumulado / 1000:8.1f} ms)  {nombre}')
+
+    def _arranques(self, env, runs, path):
+        imports, primer_byte = [], []
+        for _ in range(runs):
+            result = subprocess.run(
+                [sys.executable, '-c', COLD_START_SCRIPT, path],
+                env=env, capture_output=True, text=True,
+            )
+            if result.returncode != 0:
+                self.stderr.write(result.stderr)
+                return
+            importacion, total, status = result.stdout.split()
+            imports.append(float(importacion))
+            primer_byte.append(float(total))
+
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f'Cold start over {runs} runs (GET {path} -> {status}): '
+            f'import {statistics.median(imports):.1f} ms, '
+            f'first byte {statistics.median(primer_byte):.1f} ms'
+        ))
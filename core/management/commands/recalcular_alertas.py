@@ -0,0 +1,40 @@
+"""
+Re-score the early-warning score of every triage, live and archived
+Ejecutar después de modificar REGLAS_ALERTA en core/alerta.py
+
+Usage: python manage.py recalcular_alertas [--lote 5000]
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.alerta import LOTE_ALERTA, recalcular_puntajes
+from core.models import Triaje, TriajeArchivado
+from core.queue import bump_queue_version
+from core.reports import bump_report_version
+
+
+class Command(BaseCommand):
+    help = 'Recompute puntaje_alerta of live and archived triages in batches after a rule change'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=LOTE_ALERTA,
+                            help='Rows read and written per batch')
+
+    def handle(self, *args, **options):
+        procesados = actualizados = 0
+        # Archived triages are scored too: history reports read them
+        for modelo in (Triaje, TriajeArchivado):
+            def progreso(parcial, cambiados, nombre=modelo._meta.verbose_name_plural):
+                self.stdout.write(f'{nombre}: {parcial} procesados, {cambiados} actualizados')
+
+            parcial, cambiados = recalcular_puntajes(modelo, options['lote'], progreso)
+            procesados += parcial
+            actualizados += cambiados
+
+        # QuerySet.update sends no signals: refresh cached queue and reports here
+        if actualizados:
+            bump_queue_version()
+            bump_report_version()
+        self.stdout.write(self.style.SUCCESS(
+            f'Puntajes recalculados: {actualizados} de {procesados} triajes cambiaron'
+        ))
@@ -0,0 +1,82 @@
+"""
+Simulate the triage queue offline
+Prueba dotación de médicos y reglas de cola con llegadas históricas o sintéticas
+
+Usage: python manage.py simular_cola [--dias 365] [--medicos 2,3,4] [--escala 1.0]
+       python manage.py simular_cola --desde 2025-01-01 --hasta 2025-12-31 --medicos 3
+"""
+
+import time
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.demanda import PRIORIDADES
+from core.simulacion import (
+    llegadas_historicas, llegadas_sinteticas, resumen_simulacion, simular,
+)
+
+
+def _fecha(valor):
+    return datetime.strptime(valor, '%Y-%m-%d').date()
+
+
+class Command(BaseCommand):
+    help = 'Discrete-event simulation of the triage queue (waits per priority)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--medicos', default='2,3,4',
+                            help='Comma-separated clinician counts to compare')
+        parser.add_argument('--dias', type=int, default=365,
+                            help='Days of synthetic arrivals (from historical rates)')
+        parser.add_argument('--escala', type=float, default=1.0,
+                            help='Multiplier for synthetic arrival rates (surge testing)')
+        parser.add_argument('--desde', type=_fecha,
+                            help='Replay recorded triages from this date (YYYY-MM-DD)')
+        parser.add_argument('--hasta', type=_fecha,
+                            help='Last replayed date (YYYY-MM-DD, default today)')
+        parser.add_argument('--semilla', type=int, default=None,
+                            help='Random seed, for reproducible runs')
+
+    def handle(self, *args, **options):
+        import numpy as np
+
+        try:
+            medicos = [int(m) for m in options['medicos'].split(',')]
+        except ValueError:
+            raise CommandError('--medicos debe ser una lista de enteros, p. ej. 2,3,4')
+        if any(m < 1 for m in medicos):
+            raise CommandError('Cada simulación necesita al menos un médico')
+
+        rng = np.random.default_rng(options['semilla'])
+        if options['desde']:
+            hasta = options['hasta'] or datetime.now().date()
+            llegadas = llegadas_historicas(np, rng, options['desde'], hasta)
+            origen = f"triajes registrados {options['desde']} a {hasta}"
+        else:
+            llegadas = llegadas_sinteticas(np, rng, options['dias'], escala=options['escala'])
+            origen = f"{options['dias']} días sintéticos (escala {options['escala']})"
+
+        if not len(llegadas):
+            raise CommandError('No hay llegadas para simular (¿historial de triajes vacío?)')
+        self.stdout.write(f'{len(llegadas)} llegadas: {origen}')
+
+        for cantidad in medicos:
+            inicio = time.perf_counter()
+            esperas, eventos, pico = simular(np, llegadas, cantidad)
+            segundos = time.perf_counter() - inicio
+            resumen = resumen_simulacion(np, llegadas, esperas)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'\n{cantidad} médicos: {eventos} eventos en {segundos:.2f} s '
+                f'({eventos / segundos:,.0f} eventos/s), cola máxima {pico}'
+            ))
+            for grupo in ['global', *PRIORIDADES]:
+                medidas = resumen[grupo]
+                if not medidas['total']:
+                    continue
+                self.stdout.write(
+                    f"  {grupo:<7} n={medidas['total']:<7} media {medidas['media']:>8.1f}  "
+                    f"p50 {medidas['p50']:>8.1f}  p90 {medidas['p90']:>8.1f}  "
+                    f"p99 {medidas['p99']:>8.1f}  máx {medidas['max']:>8.1f} min"
+                )
@@ -0,0 +1,45 @@
+"""
+Run queued background jobs (core/trabajos.py)
+Trabajador de la cola en base de datos: sin broker externo
+
+Usage: python manage.py trabajador [--hilos 2] [--procesos] [--intervalo 1] [--una-vez]
+"""
+
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.trabajos import trabajar
+
+
+class Command(BaseCommand):
+    help = 'Claim and run queued jobs with a thread or process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=settings.TRABAJOS_HILOS,
+                            help='Jobs run at the same time')
+        parser.add_argument('--procesos', action='store_true',
+                            help='Use worker processes instead of threads (CPU-bound tasks)')
+        parser.add_argument('--intervalo', type=float, default=settings.TRABAJOS_INTERVALO,
+                            help='Seconds between polls while the queue is empty')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        detener = threading.Event()
+        # Finish the running jobs, claim no more
+        for senal in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(senal, lambda *_: detener.set())
+
+        def progreso(trabajo_id, estado):
+            self.stdout.write(f'Trabajo {trabajo_id}: {estado}')
+
+        modo = 'procesos' if options['procesos'] else 'hilos'
+        self.stdout.write(f"Trabajador iniciado ({options['hilos']} {modo})")
+        trabajar(
+            options['hilos'], options['procesos'], options['intervalo'],
+            una_vez=options['una_vez'], detener=detener, progreso=progreso,
+        )
+        self.stdout.write(self.style.SUCCESS('Trabajador detenido'))
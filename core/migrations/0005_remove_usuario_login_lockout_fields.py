@@ -0,0 +1,21 @@
+# Generated by Django 6.0.2 on 2026-10-19 13:51
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_triaje_tipo_servicio'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='usuario',
+            name='bloqueado_hasta',
+        ),
+        migrations.RemoveField(
+            model_name='usuario',
+            name='intentos_fallidos',
+        ),
+    ]
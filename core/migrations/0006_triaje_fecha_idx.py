@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_remove_usuario_login_lockout_fields'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='triaje',
+            index=models.Index(fields=['fecha_hora_consulta'], name='triaje_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:11
+
+import re
+
+from django.db import migrations, models
+
+
+# Frozen copy of core.models.PRESION_PATRON: this migration must keep
+# parsing the way it did when it was written, whatever the model does later
+PRESION_PATRON = re.compile(r'^\s*(\d{2,3})\s*/\s*(\d{2,3})\s*$')
+LOTE = 2000
+
+
+def poblar_presion(apps, schema_editor):
+    """Parse existing '120/80' readings into the numeric columns"""
+    Triaje = apps.get_model('core', 'Triaje')
+    ultimo = 0
+    # Keyset batches keep each query small; they all run inside the
+    # migration's transaction
+    while filas := list(
+        Triaje.objects.filter(id__gt=ultimo).order_by('id').values_list('id', 'presion_arterial')[:LOTE]
+    ):
+        ultimo = filas[-1][0]
+        # Readings repeat a lot (120/80, 110/70...): one UPDATE per distinct
+        # reading in the batch, instead of bulk_update's per-row CASE
+        por_lectura = {}
+        for triaje_id, presion in filas:
+            coincidencia = PRESION_PATRON.match(presion or '')
+            if coincidencia:
+                lectura = (int(coincidencia.group(1)), int(coincidencia.group(2)))
+                por_lectura.setdefault(lectura, []).append(triaje_id)
+        for (sistolica, diastolica), ids in por_lectura.items():
+            Triaje.objects.filter(id__in=ids).update(
+                presion_sistolica=sistolica, presion_diastolica=diastolica,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_triaje_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='triaje',
+            name='presion_diastolica',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='triaje',
+            name='presion_sistolica',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        # Indexes are built after the backfill, not maintained row by row
+        migrations.RunPython(poblar_presion, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='triaje',
+            index=models.Index(fields=['presion_sistolica'], name='triaje_pas_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='triaje',
+            index=models.Index(fields=['presion_diastolica'], name='triaje_pad_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:13
+
+from bisect import bisect_left
+
+from django.db import migrations, models
+
+
+# Frozen copy of core.alerta.REGLAS_ALERTA: this migration must score the
+# way it did when it was written, whatever the rule table says later
+# (a later rule change is applied with `manage.py recalcular_alertas`)
+REGLAS_ALERTA = {
+    'temperatura': [(35.0, 3), (36.0, 1), (38.0, 0), (39.0, 1), (float('inf'), 2)],
+    'pulsacion': [(40, 3), (50, 1), (90, 0), (110, 1), (130, 2), (float('inf'), 3)],
+    'presion_sistolica': [(90, 3), (100, 2), (110, 1), (219, 0), (float('inf'), 3)],
+}
+LOTE = 2000
+
+
+def puntaje_alerta(signos):
+    total = 0
+    for signo, valor in zip(REGLAS_ALERTA, signos):
+        if valor is not None:
+            bandas = REGLAS_ALERTA[signo]
+            total += bandas[bisect_left([limite for limite, _ in bandas], float(valor))][1]
+    return total
+
+
+def calcular_puntajes(apps, schema_editor):
+    """Score existing triages with the rule table above"""
+    Triaje = apps.get_model('core', 'Triaje')
+    ultimo = 0
+    # Keyset batches keep each query small; they all run inside the
+    # migration's transaction
+    while filas := list(
+        Triaje.objects.filter(id__gt=ultimo).order_by('id').values_list('id', *REGLAS_ALERTA)[:LOTE]
+    ):
+        ultimo = filas[-1][0]
+        # Few distinct scores: one UPDATE per score in the batch (0 is the default)
+        por_puntaje = {}
+        for triaje_id, *signos in filas:
+            puntaje = puntaje_alerta(signos)
+            if puntaje:
+                por_puntaje.setdefault(puntaje, []).append(triaje_id)
+        for puntaje, ids in por_puntaje.items():
+            Triaje.objects.filter(id__in=ids).update(puntaje_alerta=puntaje)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_triaje_presion_columnas'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='triaje',
+            options={'ordering': [models.Case(models.When(nivel_prioridad='alta', then=0), models.When(nivel_prioridad='media', then=1), models.When(nivel_prioridad='baja', then=2)), '-puntaje_alerta', 'fecha_hora_consulta'], 'verbose_name': 'Triaje', 'verbose_name_plural': 'Triajes'},
+        ),
+        migrations.AddField(
+            model_name='triaje',
+            name='puntaje_alerta',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(calcular_puntajes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='triaje',
+            index=models.Index(fields=['puntaje_alerta'], name='triaje_alerta_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_triaje_puntaje_alerta'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='triaje',
+            index=models.Index(fields=['paciente', 'fecha_hora_consulta'], name='triaje_paciente_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+LOTE = 2000
+
+
+def poblar_clave_fonetica(apps, schema_editor):
+    """Phonetic key of every existing patient name"""
+    from core.fonetica import fonetica_nombre
+
+    Paciente = apps.get_model('core', 'Paciente')
+    ultimo = 0
+    while filas := list(
+        Paciente.objects.filter(id__gt=ultimo).order_by('id').values_list('id', 'nombre_completo')[:LOTE]
+    ):
+        ultimo = filas[-1][0]
+        # Common names share a key: one UPDATE per distinct key in the batch
+        por_clave = {}
+        for paciente_id, nombre in filas:
+            por_clave.setdefault(fonetica_nombre(nombre), []).append(paciente_id)
+        for clave, ids in por_clave.items():
+            Paciente.objects.filter(id__in=ids).update(clave_fonetica=clave)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_triaje_paciente_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PosibleDuplicado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('puntaje', models.FloatField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('descartado', 'Descartado')], default='pendiente', max_length=20)),
+                ('fecha_deteccion', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Posible Duplicado',
+                'verbose_name_plural': 'Posibles Duplicados',
+                'ordering': ['-puntaje'],
+            },
+        ),
+        migrations.AddField(
+            model_name='paciente',
+            name='clave_fonetica',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+        migrations.RunPython(poblar_clave_fonetica, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(fields=['clave_fonetica'], name='paciente_fonetica_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(fields=['fecha_nacimiento'], name='paciente_nacimiento_idx'),
+        ),
+        migrations.AddField(
+            model_name='posibleduplicado',
+            name='duplicado',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.paciente'),
+        ),
+        migrations.AddField(
+            model_name='posibleduplicado',
+            name='paciente',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='posibles_duplicados', to='core.paciente'),
+        ),
+        migrations.AddConstraint(
+            model_name='posibleduplicado',
+            constraint=models.UniqueConstraint(fields=('paciente', 'duplicado'), name='posible_duplicado_unico'),
+        ),
+    ]
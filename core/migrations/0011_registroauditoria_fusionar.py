@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_paciente_duplicados'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='registroauditoria',
+            name='accion',
+            field=models.CharField(choices=[('login', 'Inicio de sesión'), ('logout', 'Cierre de sesión'), ('crear_paciente', 'Crear paciente'), ('crear_triaje', 'Crear triaje'), ('iniciar_atencion', 'Iniciar atención'), ('finalizar_atencion', 'Finalizar atención'), ('ver_historial', 'Ver historial'), ('generar_reporte', 'Generar reporte'), ('eliminar_paciente', 'Eliminar paciente'), ('fusionar_pacientes', 'Fusionar pacientes'), ('crear_usuario', 'Crear usuario'), ('editar_usuario', 'Editar usuario')], max_length=50),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q
+
+
+LOTE = 2000
+CAMPOS_TRIAJE = ['sintomatologia', 'tratamiento', 'estudios_complementarios']
+CAMPOS_ATENCION = ['observaciones', 'medicamentos_dispensados']
+
+
+def copiar_notas(apps, schema_editor):
+    """One NotaClinica per triage that has any diagnosis or attention text"""
+    Triaje = apps.get_model('core', 'Triaje')
+    NotaClinica = apps.get_model('core', 'NotaClinica')
+    origen = [*CAMPOS_TRIAJE, *(f'atencion__{campo}' for campo in CAMPOS_ATENCION)]
+    con_texto = Q()
+    for campo in origen:
+        con_texto |= Q(**{f'{campo}__gt': ''})
+    consulta = Triaje.objects.filter(con_texto).order_by('id')
+    ultimo = 0
+    while filas := list(consulta.filter(id__gt=ultimo).values_list('id', *origen)[:LOTE]):
+        ultimo = filas[-1][0]
+        NotaClinica.objects.bulk_create([
+            NotaClinica(triaje_id=fila[0], **dict(zip([*CAMPOS_TRIAJE, *CAMPOS_ATENCION], fila[1:])))
+            for fila in filas
+        ])
+
+
+def restaurar_notas(apps, schema_editor):
+    """Reverse: copy the notes back into Triaje and Atencion"""
+    Triaje = apps.get_model('core', 'Triaje')
+    Atencion = apps.get_model('core', 'Atencion')
+    NotaClinica = apps.get_model('core', 'NotaClinica')
+    for nota in NotaClinica.objects.iterator(chunk_size=LOTE):
+        Triaje.objects.filter(id=nota.triaje_id).update(
+            **{campo: getattr(nota, campo) for campo in CAMPOS_TRIAJE}
+        )
+        Atencion.objects.filter(triaje_id=nota.triaje_id).update(
+            **{campo: getattr(nota, campo) for campo in CAMPOS_ATENCION}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_registroauditoria_fusionar'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotaClinica',
+            fields=[
+                ('triaje', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='nota', serialize=False, to='core.triaje')),
+                ('sintomatologia', models.TextField(blank=True, null=True)),
+                ('tratamiento', models.TextField(blank=True, null=True)),
+                ('estudios_complementarios', models.TextField(blank=True, null=True)),
+                ('observaciones', models.TextField(blank=True, null=True)),
+                ('medicamentos_dispensados', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Nota Clínica',
+                'verbose_name_plural': 'Notas Clínicas',
+            },
+        ),
+        migrations.RunPython(copiar_notas, restaurar_notas),
+        migrations.RemoveField(
+            model_name='atencion',
+            name='medicamentos_dispensados',
+        ),
+        migrations.RemoveField(
+            model_name='atencion',
+            name='observaciones',
+        ),
+        migrations.RemoveField(
+            model_name='triaje',
+            name='estudios_complementarios',
+        ),
+        migrations.RemoveField(
+            model_name='triaje',
+            name='sintomatologia',
+        ),
+        migrations.RemoveField(
+            model_name='triaje',
+            name='tratamiento',
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:40
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+# Triage ids per UPDATE: bounded statements instead of one long table lock
+LOTE = 10000
+INDICES_TRIGRAMA = {
+    'triaje_paciente_nombre_trgm': 'paciente_nombre',
+    'triaje_paciente_ci_trgm': 'paciente_ci',
+}
+
+
+def poblar_resumen(apps, schema_editor):
+    """Copy the patient's name, CI, sex and age at visit onto each triage"""
+    from core.expressions import edad_en
+
+    Triaje = apps.get_model('core', 'Triaje')
+    Paciente = apps.get_model('core', 'Paciente')
+    paciente = Paciente.objects.filter(id=OuterRef('paciente_id')).order_by()
+    ultimo = Triaje.objects.aggregate(maximo=Max('id'))['maximo'] or 0
+    for desde in range(0, ultimo, LOTE):
+        Triaje.objects.filter(id__gt=desde, id__lte=desde + LOTE).update(
+            paciente_nombre=Subquery(paciente.values('nombre_completo')),
+            paciente_ci=Subquery(paciente.values('ci')),
+            paciente_sexo=Subquery(paciente.values('sexo')),
+            edad_consulta=edad_en(Subquery(paciente.values('fecha_nacimiento')), 'fecha_hora_consulta'),
+        )
+
+
+def crear_indices_trigrama(apps, schema_editor):
+    """
+    History search is a substring match (icontains -> UPPER(col) LIKE '%x%'),
+    which a btree cannot serve; PostgreSQL gets trigram GIN indexes on the
+    same expression. Other backends keep the plain scan
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nombre, columna in INDICES_TRIGRAMA.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nombre} ON core_triaje USING gin (UPPER({columna}) gin_trgm_ops)'
+        )
+
+
+def borrar_indices_trigrama(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre in INDICES_TRIGRAMA:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_notas_clinicas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='triaje',
+            name='edad_consulta',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='triaje',
+            name='paciente_ci',
+            field=models.CharField(default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='triaje',
+            name='paciente_nombre',
+            field=models.CharField(default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='triaje',
+            name='paciente_sexo',
+            field=models.CharField(default='', editable=False, max_length=1),
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='triaje',
+            index=models.Index(condition=models.Q(('estado', 'en_espera')), fields=['fecha_hora_consulta'], name='triaje_en_espera_idx'),
+        ),
+        migrations.RunPython(crear_indices_trigrama, borrar_indices_trigrama),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:57
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+# Patient ids per UPDATE: bounded statements instead of one long table lock
+LOTE = 10000
+
+
+def poblar_contadores(apps, schema_editor):
+    """Visit count, last visit and last priority of every patient"""
+    Triaje = apps.get_model('core', 'Triaje')
+    Paciente = apps.get_model('core', 'Paciente')
+    triajes = Triaje.objects.filter(paciente_id=OuterRef('id')).order_by()
+    ultimo = triajes.order_by('-fecha_hora_consulta')
+    ultimo_id = Paciente.objects.aggregate(maximo=Max('id'))['maximo'] or 0
+    for desde in range(0, ultimo_id, LOTE):
+        Paciente.objects.filter(id__gt=desde, id__lte=desde + LOTE).update(
+            total_visitas=Coalesce(
+                Subquery(triajes.values('paciente_id').annotate(total=Count('id')).values('total')),
+                0,
+            ),
+            ultima_visita=Subquery(ultimo.values('fecha_hora_consulta')[:1]),
+            ultima_prioridad=Coalesce(Subquery(ultimo.values('nivel_prioridad')[:1]), Value('')),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_triaje_resumen_paciente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paciente',
+            name='total_visitas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='paciente',
+            name='ultima_prioridad',
+            field=models.CharField(blank=True, default='', editable=False, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='paciente',
+            name='ultima_visita',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 6.0.2 on 2026-10-19 14:59
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_paciente_contadores_visitas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TriajeArchivado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('paciente_nombre', models.CharField(default='', editable=False, max_length=100)),
+                ('paciente_ci', models.CharField(default='', editable=False, max_length=20)),
+                ('paciente_sexo', models.CharField(default='', editable=False, max_length=1)),
+                ('edad_consulta', models.PositiveSmallIntegerField(blank=True, editable=False, null=True)),
+                ('fecha_hora_consulta', models.DateTimeField(default=django.utils.timezone.now)),
+                ('especialidad', models.CharField(choices=[('medicina_general', 'Medicina General'), ('pediatria', 'Pediatría'), ('ginecologia', 'Ginecología'), ('traumatologia', 'Traumatología'), ('cardiologia', 'Cardiología'), ('dermatologia', 'Dermatología'), ('neurologia', 'Neurología'), ('oftalmologia', 'Oftalmología'), ('otorrinolaringologia', 'Otorrinolaringología'), ('urologia', 'Urología'), ('psiquiatria', 'Psiquiatría'), ('emergencias', 'Emergencias')], max_length=50)),
+                ('medico', models.CharField(max_length=100)),
+                ('enfermeria', models.CharField(max_length=100)),
+                ('tipo_servicio', models.CharField(choices=[('consulta_externa', 'Consulta Externa'), ('laboratorio', 'Laboratorio'), ('internacion', 'Internación'), ('cirugia', 'Cirugía'), ('emergencia', 'Emergencia'), ('farmacia', 'Farmacia'), ('otro', 'Otro')], default='consulta_externa', max_length=20, verbose_name='Tipo de Servicio')),
+                ('talla', models.DecimalField(decimal_places=2, help_text='Talla en cm', max_digits=5)),
+                ('peso', models.DecimalField(decimal_places=2, help_text='Peso en kg', max_digits=5)),
+                ('temperatura', models.DecimalField(decimal_places=2, help_text='Temperatura en °C', max_digits=4)),
+                ('presion_arterial', models.CharField(help_text='Formato: 120/80', max_length=10)),
+                ('presion_sistolica', models.PositiveSmallIntegerField(blank=True, editable=False, null=True)),
+                ('presion_diastolica', models.PositiveSmallIntegerField(blank=True, editable=False, null=True)),
+                ('pulsacion', models.IntegerField(help_text='Pulsaciones por minuto')),
+                ('nivel_prioridad', models.CharField(choices=[('alta', 'Alta'), ('media', 'Media'), ('baja', 'Baja')], max_length=10)),
+                ('estado', models.CharField(choices=[('en_espera', 'En Espera'), ('en_atencion', 'En Atención'), ('atendido', 'Atendido')], default='en_espera', max_length=20)),
+                ('puntaje_alerta', models.PositiveSmallIntegerField(default=0, editable=False)),
+                ('paciente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='triajes_archivados', to='core.paciente')),
+            ],
+            options={
+                'verbose_name': 'Triaje Archivado',
+                'verbose_name_plural': 'Triajes Archivados',
+                'ordering': ['-fecha_hora_consulta'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotaClinicaArchivada',
+            fields=[
+                ('sintomatologia', models.TextField(blank=True, null=True)),
+                ('tratamiento', models.TextField(blank=True, null=True)),
+                ('estudios_complementarios', models.TextField(blank=True, null=True)),
+                ('observaciones', models.TextField(blank=True, null=True)),
+                ('medicamentos_dispensados', models.TextField(blank=True, null=True)),
+                ('triaje', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='nota', serialize=False, to='core.triajearchivado')),
+            ],
+            options={
+                'verbose_name': 'Nota Clínica Archivada',
+                'verbose_name_plural': 'Notas Clínicas Archivadas',
+            },
+        ),
+        migrations.CreateModel(
+            name='AtencionArchivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_inicio', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='atenciones_archivadas', to=settings.AUTH_USER_MODEL)),
+                ('triaje', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='atencion', to='core.triajearchivado')),
+            ],
+            options={
+                'verbose_name': 'Atención Archivada',
+                'verbose_name_plural': 'Atenciones Archivadas',
+                'ordering': ['-fecha_inicio'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='triajearchivado',
+            index=models.Index(fields=['fecha_hora_consulta'], name='archivo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='triajearchivado',
+            index=models.Index(fields=['paciente', 'fecha_hora_consulta'], name='archivo_paciente_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:09
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_trabajos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InstantaneaReporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_desde', models.DateField()),
+                ('fecha_hasta', models.DateField()),
+                ('datos', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('generado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Instantánea de Reporte',
+                'verbose_name_plural': 'Instantáneas de Reportes',
+                'constraints': [models.UniqueConstraint(fields=('fecha_desde', 'fecha_hasta'), name='instantanea_rango_unico')],
+            },
+        ),
+    ]
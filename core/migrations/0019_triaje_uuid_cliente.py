@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_instantaneas_reporte'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='triaje',
+            name='uuid_cliente',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='triajearchivado',
+            name='uuid_cliente',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:22
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_triaje_uuid_cliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IntentoAcceso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=50, unique=True)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('inicio', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('bloqueado_hasta', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Intento de Acceso',
+                'verbose_name_plural': 'Intentos de Acceso',
+            },
+        ),
+    ]
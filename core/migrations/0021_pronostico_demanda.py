@@ -0,0 +1,28 @@
+# Generated by Django 6.0.2 on 2026-10-19 15:23
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_intentos_acceso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PronosticoDemanda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('datos', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('generado', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Pronóstico de Demanda',
+                'verbose_name_plural': 'Pronósticos de Demanda',
+                'ordering': ['-generado'],
+            },
+        ),
+    ]
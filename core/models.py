@@ -3,10 +3,19 @@ Core Models for Clinical Triage System
 Modelos de base de datos siguiendo el SRS
 """
 
+import re
+
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 
+from .alerta import puntaje_alerta
+from .expressions import banda_edad, edad_en
+from .fonetica import fonetica_nombre
+
 
 class Usuario(AbstractUser): 
     """
@@ -24,8 +33,6 @@ class Usuario(AbstractUser):
     nombre_completo = models.CharField(max_length=100)
     fecha_creacion = models.DateTimeField(default=timezone.now)
     activo = models.BooleanField(default=True)
-    intentos_fallidos = models.IntegerField(default=0)
-    bloqueado_hasta = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         verbose_name = 'Usuario'
@@ -35,6 +42,66 @@ class Usuario(AbstractUser):
         return f"{self.nombre_completo} ({self.get_rol_display()})"
 
 
+class IntentoAcceso(models.Model):
+    """
+    Failed-login counter for one username or client IP (core/ratelimit.py)
+    Contador en la base de datos, compartido por todas las instancias y
+    actualizado con UPDATE atómicos
+    """
+    # 'usuario:<hash>' or 'ip:<hash>'
+    clave = models.CharField(max_length=50, unique=True)
+    intentos = models.PositiveIntegerField(default=0)
+    # Start of the current counting window
+    inicio = models.DateTimeField(default=timezone.now, db_index=True)
+    bloqueado_hasta = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Intento de Acceso'
+        verbose_name_plural = 'Intentos de Acceso'
+    
+    def __str__(self):
+        return f"{self.clave}: {self.intentos}"
+
+
+def ultima_visita_campos(paciente_id=None):
+    """
+    ultima_visita / ultima_prioridad expressions for Paciente.update(),
+    from the live triages or, when none is left, the archived ones
+    """
+    paciente = models.OuterRef('id') if paciente_id is None else paciente_id
+    
+    def ultimo(modelo, campo):
+        return models.Subquery(
+            modelo.objects.filter(paciente_id=paciente).order_by('-fecha_hora_consulta').values(campo)[:1]
+        )
+    return {
+        'ultima_visita': Coalesce(
+            ultimo(Triaje, 'fecha_hora_consulta'), ultimo(TriajeArchivado, 'fecha_hora_consulta'),
+        ),
+        'ultima_prioridad': Coalesce(
+            ultimo(Triaje, 'nivel_prioridad'), ultimo(TriajeArchivado, 'nivel_prioridad'), models.Value(''),
+        ),
+    }
+
+
+class PacienteQuerySet(models.QuerySet):
+    def recalcular_visitas(self):
+        """
+        Recompute the visit counters from the live and archived triages in
+        one UPDATE, for changes made without signals (merges, bulk operations)
+        """
+        def total(modelo):
+            triajes = modelo.objects.filter(paciente_id=models.OuterRef('id')).order_by()
+            return Coalesce(
+                models.Subquery(triajes.values('paciente_id').annotate(total=models.Count('id')).values('total')),
+                0,
+            )
+        return self.update(
+            total_visitas=total(Triaje) + total(TriajeArchivado),
+            **ultima_visita_campos(),
+        )
+
+
 class Paciente(models.Model):
     """
     Patient master data
@@ -56,26 +123,149 @@ class Paciente(models.Model):
     fecha_nacimiento = models.DateField()
     tipo_paciente = models.CharField(max_length=10, choices=TIPO_PACIENTE, default='nuevo')
     fecha_registro = models.DateTimeField(default=timezone.now)
+    # Phonetic key of the name (core/fonetica.py), set on save; blocking
+    # column for duplicate detection
+    clave_fonetica = models.CharField(max_length=100, blank=True, editable=False)
+    # Visit counters, kept with F() updates as triages are created or deleted
+    # (signals.contar_visita / descontar_visita) instead of COUNT queries
+    total_visitas = models.PositiveIntegerField(default=0, editable=False)
+    ultima_visita = models.DateTimeField(null=True, blank=True, editable=False)
+    ultima_prioridad = models.CharField(max_length=10, blank=True, default='', editable=False)
+    # Set by the retention job (core/retencion.py) once identifiers are removed
+    anonimizado = models.BooleanField(default=False, editable=False)
+    
+    objects = PacienteQuerySet.as_manager()
     
     class Meta:
         verbose_name = 'Paciente'
         verbose_name_plural = 'Pacientes'
         ordering = ['-fecha_registro']
+        indexes = [
+            # Duplicate candidates on registration (core/duplicados.py)
+            models.Index(fields=['clave_fonetica'], name='paciente_fonetica_idx'),
+            models.Index(fields=['fecha_nacimiento'], name='paciente_nacimiento_idx'),
+        ]
+    
+    # Copied onto every triage (Triaje.paciente_*, edad_consulta)
+    CAMPOS_RESUMEN = ('nombre_completo', 'ci', 'sexo', 'fecha_nacimiento')
     
     def __str__(self):
         return f"{self.nombre_completo} - CI: {self.ci}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._cargado = dict(zip(field_names, values))
+        return instancia
+    
+    def save(self, *args, **kwargs):
+        self.clave_fonetica = fonetica_nombre(self.nombre_completo)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'nombre_completo' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'clave_fonetica'}
+        super().save(*args, **kwargs)
+        self._cargado = {campo: getattr(self, campo) for campo in self.CAMPOS_RESUMEN}
+    
+    def resumen_cambiado(self):
+        """Whether a field copied onto the triages changed since it was loaded"""
+        cargado = getattr(self, '_cargado', {})
+        return any(
+            campo in cargado and cargado[campo] != getattr(self, campo)
+            for campo in self.CAMPOS_RESUMEN
+        )
+    
+    def edad_al(self, fecha):
+        """Age in whole years on a given date"""
+        nacimiento = self._meta.get_field('fecha_nacimiento').to_python(self.fecha_nacimiento)
+        return fecha.year - nacimiento.year - (
+            (fecha.month, fecha.day) < (nacimiento.month, nacimiento.day)
+        )
+    
     @property
     def edad(self):
-        today = timezone.now().date()
-        return today.year - self.fecha_nacimiento.year - (
-            (today.month, today.day) < (self.fecha_nacimiento.month, self.fecha_nacimiento.day)
+        return self.edad_al(timezone.now().date())
+
+
+PRESION_PATRON = re.compile(r'^\s*(\d{2,3})\s*/\s*(\d{2,3})\s*$')
+
+
+def parse_presion(texto):
+    """'120/80' -> (120, 80); (None, None) when the text is not a reading"""
+    coincidencia = PRESION_PATRON.match(texto or '')
+    if not coincidencia:
+        return None, None
+    return int(coincidencia.group(1)), int(coincidencia.group(2))
+
+
+# Blood pressure categories (JNC 7 thresholds plus crisis and hypotension),
+# most severe first; each condition only reads the indexed numeric columns
+CATEGORIAS_PRESION = [
+    ('crisis', 'Crisis hipertensiva (≥180/120)',
+     Q(presion_sistolica__gte=180) | Q(presion_diastolica__gte=120)),
+    ('hipertension', 'Hipertensión (≥140/90)',
+     Q(presion_sistolica__gte=140) | Q(presion_diastolica__gte=90)),
+    ('prehipertension', 'Prehipertensión (≥120/80)',
+     Q(presion_sistolica__gte=120) | Q(presion_diastolica__gte=80)),
+    ('hipotension', 'Hipotensión (<90/60)',
+     Q(presion_sistolica__lt=90) | Q(presion_diastolica__lt=60)),
+    ('normal', 'Normal', Q(presion_sistolica__isnull=False)),
+]
+
+
+def categoria_presion():
+    """Case expression with the first matching CATEGORIAS_PRESION code"""
+    return models.Case(
+        *[models.When(condicion, then=models.Value(codigo)) for codigo, _, condicion in CATEGORIAS_PRESION],
+        default=models.Value('sin_dato'),
+        output_field=models.CharField(),
+    )
+
+
+# Columns rendered by the queue and history tables, all on the triage row
+COLUMNAS_LISTADO = [
+    'paciente_nombre', 'paciente_ci', 'fecha_hora_consulta', 'especialidad',
+    'nivel_prioridad', 'estado', 'puntaje_alerta',
+]
+
+
+class TriajeQuerySet(models.QuerySet):
+    def listado(self):
+        """Triages loading only the COLUMNAS_LISTADO, without a Paciente join"""
+        return self.only(*COLUMNAS_LISTADO)
+    
+    def con_edad(self):
+        """
+        Annotate banda_edad (pediatrico/adulto/geriatrico, or sin_dato) from
+        the stored edad_consulta (patient age at triage time, not today)
+        """
+        return self.annotate(banda_edad=banda_edad(models.F('edad_consulta')))
+    
+    def sincronizar_paciente(self):
+        """
+        Refresh the patient snapshot columns from Paciente in one UPDATE
+        (QuerySet.update sends no signals)
+        """
+        paciente = Paciente.objects.filter(id=models.OuterRef('paciente_id')).order_by()
+        return self.update(
+            paciente_nombre=models.Subquery(paciente.values('nombre_completo')),
+            paciente_ci=models.Subquery(paciente.values('ci')),
+            paciente_sexo=models.Subquery(paciente.values('sexo')),
+            edad_consulta=edad_en(models.Subquery(paciente.values('fecha_nacimiento')), 'fecha_hora_consulta'),
         )
+    
+    def con_presion(self, categoria):
+        """
+        Triages at or beyond a category's thresholds (e.g. 'hipertension'
+        includes crises), as an indexed filter on the numeric columns
+        """
+        condiciones = {codigo: condicion for codigo, _, condicion in CATEGORIAS_PRESION}
+        return self.filter(condiciones[categoria])
 
 
-class Triaje(models.Model):
+class TriajeBase(models.Model):
     """
     Triage evaluation record with vital signs and priority
+    Campos comunes al triaje vivo (Triaje) y al archivado (TriajeArchivado)
     """
     PRIORIDAD_CHOICES = [
         ('alta', 'Alta'),
@@ -114,8 +304,12 @@ class Triaje(models.Model):
         ('otro', 'Otro'),
     ]
     
-    # Relationships
-    paciente = models.ForeignKey(Paciente, on_delete=models.CASCADE, related_name='triajes')
+    # Patient snapshot, set on creation and refreshed when the patient is
+    # edited (signals.sincronizar_resumen): lists and search need no join
+    paciente_nombre = models.CharField(max_length=100, default='', editable=False)
+    paciente_ci = models.CharField(max_length=20, default='', editable=False)
+    paciente_sexo = models.CharField(max_length=1, default='', editable=False)
+    edad_consulta = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
     
     # Consultation info
     fecha_hora_consulta = models.DateTimeField(default=timezone.now)
@@ -123,37 +317,36 @@ class Triaje(models.Model):
     medico = models.CharField(max_length=100)
     enfermeria = models.CharField(max_length=100)
     tipo_servicio = models.CharField(max_length=20, choices=TIPO_SERVICIO, default='consulta_externa', verbose_name='Tipo de Servicio')
+    # Id assigned by the registering station (core/sincronizacion.py): a
+    # record sent again after a dropped connection is not created twice
+    uuid_cliente = models.UUIDField(null=True, blank=True, unique=True, editable=False)
     
     # Vital signs
     talla = models.DecimalField(max_digits=5, decimal_places=2, help_text='Talla en cm')
     peso = models.DecimalField(max_digits=5, decimal_places=2, help_text='Peso en kg')
     temperatura = models.DecimalField(max_digits=4, decimal_places=2, help_text='Temperatura en °C')
     presion_arterial = models.CharField(max_length=10, help_text='Formato: 120/80')
+    # Numeric copy of presion_arterial, kept in sync on save, for indexed queries
+    presion_sistolica = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
+    presion_diastolica = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
     pulsacion = models.IntegerField(help_text='Pulsaciones por minuto')
     
     # Priority and status
     nivel_prioridad = models.CharField(max_length=10, choices=PRIORIDAD_CHOICES)
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='en_espera')
+    # Early-warning score from the vitals (core/alerta.py), set on save;
+    # breaks ties within a priority in the queue
+    puntaje_alerta = models.PositiveSmallIntegerField(default=0, editable=False)
     
-    # Diagnosis
-    sintomatologia = models.TextField(blank=True, null=True)
-    tratamiento = models.TextField(blank=True, null=True)
-    estudios_complementarios = models.TextField(blank=True, null=True)
+    # Diagnosis text lives in NotaClinica (triaje.nota)
+    
+    objects = TriajeQuerySet.as_manager()
     
     class Meta:
-        verbose_name = 'Triaje'
-        verbose_name_plural = 'Triajes'
-        ordering = [
-            models.Case(
-                models.When(nivel_prioridad='alta', then=0),
-                models.When(nivel_prioridad='media', then=1),
-                models.When(nivel_prioridad='baja', then=2),
-            ),
-            'fecha_hora_consulta'
-        ]
+        abstract = True
     
     def __str__(self):
-        return f"Triaje {self.id} - {self.paciente.nombre_completo} ({self.get_nivel_prioridad_display()})"
+        return f"Triaje {self.id} - {self.paciente_nombre} ({self.get_nivel_prioridad_display()})"
     
     @property
     def prioridad_color(self):
@@ -168,27 +361,106 @@ class Triaje(models.Model):
     def tiempo_espera(self):
         if self.estado == 'en_espera':
             delta = timezone.now() - self.fecha_hora_consulta
-            hours, remainder = divmod(delta.seconds, 3600)
+            hours, remainder = divmod(int(delta.total_seconds()), 3600)
             minutes, _ = divmod(remainder, 60)
             return f"{hours}h {minutes}m"
         return None
 
 
-class Atencion(models.Model):
+class Triaje(TriajeBase):
+    """
+    Live triage: the queue, attentions in progress and recent history
+    Los atendidos antiguos pasan a TriajeArchivado (core/archivo.py)
+    """
+    paciente = models.ForeignKey(Paciente, on_delete=models.CASCADE, related_name='triajes')
+    
+    class Meta:
+        verbose_name = 'Triaje'
+        verbose_name_plural = 'Triajes'
+        ordering = [
+            models.Case(
+                models.When(nivel_prioridad='alta', then=0),
+                models.When(nivel_prioridad='media', then=1),
+                models.When(nivel_prioridad='baja', then=2),
+            ),
+            '-puntaje_alerta',
+            'fecha_hora_consulta'
+        ]
+        indexes = [
+            # Date-range reports and analytics
+            models.Index(fields=['fecha_hora_consulta'], name='triaje_fecha_idx'),
+            # Per-patient history and vitals trend, already in date order
+            models.Index(fields=['paciente', 'fecha_hora_consulta'], name='triaje_paciente_fecha_idx'),
+            # Clinical-quality queries (hypertension, hypotension)
+            models.Index(fields=['presion_sistolica'], name='triaje_pas_idx'),
+            models.Index(fields=['presion_diastolica'], name='triaje_pad_idx'),
+            models.Index(fields=['puntaje_alerta'], name='triaje_alerta_idx'),
+            # The waiting queue is a small slice of the table
+            models.Index(
+                fields=['fecha_hora_consulta'], condition=Q(estado='en_espera'), name='triaje_en_espera_idx',
+            ),
+        ]
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        cargado = dict(zip(field_names, values))
+        if 'paciente_id' in cargado:
+            instancia._paciente_cargado = cargado['paciente_id']
+        return instancia
+    
+    def copiar_resumen_paciente(self):
+        """Snapshot of the patient's name, CI, sex and age at this triage"""
+        paciente = self.paciente
+        fecha = self._meta.get_field('fecha_hora_consulta').to_python(self.fecha_hora_consulta)
+        if timezone.is_aware(fecha):
+            fecha = timezone.localtime(fecha)
+        self.paciente_nombre = paciente.nombre_completo
+        self.paciente_ci = paciente.ci
+        self.paciente_sexo = paciente.sexo
+        self.edad_consulta = paciente.edad_al(fecha.date())
+    
+    def calcular_signos(self):
+        """Numeric blood pressure and early-warning score from the vitals"""
+        self.presion_sistolica, self.presion_diastolica = parse_presion(self.presion_arterial)
+        self.puntaje_alerta = puntaje_alerta(
+            temperatura=self.temperatura,
+            pulsacion=self.pulsacion,
+            presion_sistolica=self.presion_sistolica,
+        )
+    
+    def save(self, *args, **kwargs):
+        movido = '_paciente_cargado' in self.__dict__ and self.paciente_id != self._paciente_cargado
+        if movido:
+            # Both patients' visit counters are refreshed (signals.contar_visita)
+            self._paciente_anterior = self._paciente_cargado
+        if self._state.adding or movido:
+            self.copiar_resumen_paciente()
+            self._paciente_cargado = self.paciente_id
+        self.calcular_signos()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'presion_arterial', 'temperatura', 'pulsacion'} & set(update_fields):
+            kwargs['update_fields'] = {
+                *update_fields, 'presion_sistolica', 'presion_diastolica', 'puntaje_alerta',
+            }
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'paciente' in update_fields:
+            kwargs['update_fields'] = {
+                *update_fields, 'paciente_nombre', 'paciente_ci', 'paciente_sexo', 'edad_consulta',
+            }
+        super().save(*args, **kwargs)
+
+
+class AtencionBase(models.Model):
     """
     Care/Attention record for completed consultations
     """
-    triaje = models.OneToOneField(Triaje, on_delete=models.CASCADE, related_name='atencion')
-    usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, related_name='atenciones')
     fecha_inicio = models.DateTimeField(default=timezone.now)
     fecha_fin = models.DateTimeField(null=True, blank=True)
-    observaciones = models.TextField(blank=True, null=True)
-    medicamentos_dispensados = models.TextField(blank=True, null=True)
+    # Observations and dispensed medication live in NotaClinica (triaje.nota)
     
     class Meta:
-        verbose_name = 'Atención'
-        verbose_name_plural = 'Atenciones'
-        ordering = ['-fecha_inicio']
+        abstract = True
     
     def __str__(self):
         return f"Atención {self.id} - {self.triaje.paciente.nombre_completo}"
@@ -202,6 +474,119 @@ class Atencion(models.Model):
         return "En curso"
 
 
+class Atencion(AtencionBase):
+    """Attention of a live triage"""
+    triaje = models.OneToOneField(Triaje, on_delete=models.CASCADE, related_name='atencion')
+    usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, related_name='atenciones')
+    
+    class Meta:
+        verbose_name = 'Atención'
+        verbose_name_plural = 'Atenciones'
+        ordering = ['-fecha_inicio']
+
+
+class NotaClinicaBase(models.Model):
+    """
+    Free-text clinical notes of a triage and its attention
+    Separadas de Triaje/Atencion para que la cola, el historial y los reportes
+    no lean texto que solo muestra el detalle
+    """
+    # Diagnosis (registration, step 4)
+    sintomatologia = models.TextField(blank=True, null=True)
+    tratamiento = models.TextField(blank=True, null=True)
+    estudios_complementarios = models.TextField(blank=True, null=True)
+    
+    # Attention
+    observaciones = models.TextField(blank=True, null=True)
+    medicamentos_dispensados = models.TextField(blank=True, null=True)
+    
+    class Meta:
+        abstract = True
+    
+    def __str__(self):
+        return f"Nota clínica - Triaje {self.triaje_id}"
+
+
+class NotaClinica(NotaClinicaBase):
+    """Notes of a live triage"""
+    triaje = models.OneToOneField(Triaje, on_delete=models.CASCADE, primary_key=True, related_name='nota')
+    
+    class Meta:
+        verbose_name = 'Nota Clínica'
+        verbose_name_plural = 'Notas Clínicas'
+
+
+# ---------------------------------------------------------------
+# Archive (cold storage) of closed triages, see core/archivo.py
+# ---------------------------------------------------------------
+
+class TriajeArchivado(TriajeBase):
+    """
+    Closed triage moved out of the live table by the archivar_triajes
+    command; keeps its original id, so detail links stay valid
+    """
+    paciente = models.ForeignKey(Paciente, on_delete=models.CASCADE, related_name='triajes_archivados')
+    
+    class Meta:
+        verbose_name = 'Triaje Archivado'
+        verbose_name_plural = 'Triajes Archivados'
+        ordering = ['-fecha_hora_consulta']
+        indexes = [
+            models.Index(fields=['fecha_hora_consulta'], name='archivo_fecha_idx'),
+            models.Index(fields=['paciente', 'fecha_hora_consulta'], name='archivo_paciente_fecha_idx'),
+        ]
+
+
+class AtencionArchivada(AtencionBase):
+    """Attention of an archived triage"""
+    triaje = models.OneToOneField(TriajeArchivado, on_delete=models.CASCADE, related_name='atencion')
+    usuario = models.ForeignKey(
+        Usuario, on_delete=models.SET_NULL, null=True, related_name='atenciones_archivadas',
+    )
+    
+    class Meta:
+        verbose_name = 'Atención Archivada'
+        verbose_name_plural = 'Atenciones Archivadas'
+        ordering = ['-fecha_inicio']
+
+
+class NotaClinicaArchivada(NotaClinicaBase):
+    """Notes of an archived triage"""
+    triaje = models.OneToOneField(TriajeArchivado, on_delete=models.CASCADE, primary_key=True, related_name='nota')
+    
+    class Meta:
+        verbose_name = 'Nota Clínica Archivada'
+        verbose_name_plural = 'Notas Clínicas Archivadas'
+
+
+class PosibleDuplicado(models.Model):
+    """
+    Candidate pair of duplicate patient records, paciente.id < duplicado.id
+    Detectado al registrar o por el comando detectar_duplicados
+    """
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('descartado', 'Descartado'),
+    ]
+    
+    paciente = models.ForeignKey(Paciente, on_delete=models.CASCADE, related_name='posibles_duplicados')
+    duplicado = models.ForeignKey(Paciente, on_delete=models.CASCADE, related_name='+')
+    puntaje = models.FloatField()
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    fecha_deteccion = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Posible Duplicado'
+        verbose_name_plural = 'Posibles Duplicados'
+        ordering = ['-puntaje']
+        constraints = [
+            models.UniqueConstraint(fields=['paciente', 'duplicado'], name='posible_duplicado_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.paciente} ~ {self.duplicado} ({self.puntaje:.2f})"
+
+
 class RegistroAuditoria(models.Model):
     """
     Audit log for tracking user actions
@@ -216,6 +601,8 @@ class RegistroAuditoria(models.Model):
         ('ver_historial', 'Ver historial'),
         ('generar_reporte', 'Generar reporte'),
         ('eliminar_paciente', 'Eliminar paciente'),
+        ('fusionar_pacientes', 'Fusionar pacientes'),
+        ('depurar_pacientes', 'Depurar pacientes (retención)'),
         ('crear_usuario', 'Crear usuario'),
         ('editar_usuario', 'Editar usuario'),
     ]
@@ -233,3 +620,92 @@ class RegistroAuditoria(models.Model):
     
     def __str__(self):
         return f"{self.usuario} - {self.get_accion_display()} - {self.fecha_hora}"
+
+
+class Trabajo(models.Model):
+    """
+    Background job stored in the database (core/trabajos.py)
+    Cola de trabajos sin broker externo: el comando trabajador los reclama con
+    SELECT ... FOR UPDATE SKIP LOCKED
+    """
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('en_curso', 'En curso'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+    
+    tarea = models.CharField(max_length=100)
+    parametros = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='trabajos')
+    
+    # Retries: failed runs go back to 'pendiente' with ejecutar_desde pushed back
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=3)
+    ejecutar_desde = models.DateTimeField(default=timezone.now)
+    # Lease of the worker running it, renewed while the task runs; an
+    # expired lease means the worker died
+    trabajador = models.CharField(max_length=100, blank=True)
+    vence = models.DateTimeField(null=True, blank=True)
+    
+    resultado = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(default=timezone.now)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Trabajo'
+        verbose_name_plural = 'Trabajos'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            # Workers only poll the pending slice of the table
+            models.Index(
+                fields=['ejecutar_desde'], condition=Q(estado='pendiente'), name='trabajo_pendiente_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Trabajo {self.id} - {self.tarea} ({self.get_estado_display()})"
+
+
+class InstantaneaReporte(models.Model):
+    """
+    Report aggregates precomputed for a standard range (core/instantaneas.py)
+    Agregados de reportes ya calculados por el comando nocturno; el motor de
+    reportes solo calcula en vivo los días posteriores a fecha_hasta
+    """
+    fecha_desde = models.DateField()
+    fecha_hasta = models.DateField()
+    # MotorReportes.agregados(histogramas=True)
+    datos = models.JSONField(encoder=DjangoJSONEncoder)
+    generado = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Instantánea de Reporte'
+        verbose_name_plural = 'Instantáneas de Reportes'
+        constraints = [
+            models.UniqueConstraint(fields=['fecha_desde', 'fecha_hasta'], name='instantanea_rango_unico'),
+        ]
+    
+    def __str__(self):
+        return f"Instantánea {self.fecha_desde} a {self.fecha_hasta}"
+
+
+class PronosticoDemanda(models.Model):
+    """
+    Last arrival heatmap and staffing forecast (core/demanda.py)
+    Resultado del cálculo nocturno, guardado en la base de datos para que lo
+    lean todas las instancias
+    """
+    datos = models.JSONField(encoder=DjangoJSONEncoder)
+    generado = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = 'Pronóstico de Demanda'
+        verbose_name_plural = 'Pronósticos de Demanda'
+        ordering = ['-generado']
+    
+    def __str__(self):
+        return f"Pronóstico {self.generado:%Y-%m-%d %H:%M}"
@@ -0,0 +1,63 @@
+"""
+Triage queue helpers
+Orden de la cola y versión usada para invalidar fragmentos cacheados
+"""
+
+from django.core.cache import cache
+from django.db.models import Case, When, IntegerField, Count, Q
+
+from .models import Triaje
+
+
+QUEUE_VERSION_KEY = 'cola:version'
+
+# Same ordering as Triaje.Meta: alta=0, media=1, baja=2, then the highest
+# early-warning score, then arrival time
+RANGO_PRIORIDAD = {'alta': 0, 'media': 1, 'baja': 2}
+
+ORDEN_PRIORIDAD = Case(
+    *[When(nivel_prioridad=prioridad, then=rango) for prioridad, rango in RANGO_PRIORIDAD.items()],
+    default=len(RANGO_PRIORIDAD),
+    output_field=IntegerField(),
+)
+
+
+def clave_cola(nivel_prioridad, llegada, puntaje_alerta=0):
+    """Python sort key equivalent to the ORDER BY of cola_en_espera()"""
+    return (RANGO_PRIORIDAD.get(nivel_prioridad, len(RANGO_PRIORIDAD)), -puntaje_alerta, llegada)
+
+
+def get_queue_version():
+    """Current queue version, used as cache key for rendered queue fragments"""
+    version = cache.get(QUEUE_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(QUEUE_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def bump_queue_version():
+    """Invalidate every cached queue fragment after a queue change"""
+    try:
+        cache.incr(QUEUE_VERSION_KEY)
+    except ValueError:
+        cache.set(QUEUE_VERSION_KEY, 2, timeout=None)
+
+
+def cola_en_espera():
+    """Waiting triages in queue order (see clave_cola), sorted in the database"""
+    return Triaje.objects.filter(
+        estado='en_espera'
+    ).listado().annotate(
+        orden_prioridad=ORDEN_PRIORIDAD
+    ).order_by('orden_prioridad', '-puntaje_alerta', 'fecha_hora_consulta')
+
+
+def conteo_por_prioridad():
+    """Waiting patients per priority in a single aggregate query"""
+    return Triaje.objects.filter(estado='en_espera').aggregate(
+        total=Count('id'),
+        alta=Count('id', filter=Q(nivel_prioridad='alta')),
+        media=Count('id', filter=Q(nivel_prioridad='media')),
+        baja=Count('id', filter=Q(nivel_prioridad='baja')),
+    )
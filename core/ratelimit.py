@@ -0,0 +1,77 @@
+"""
+Login rate limiting
+Contadores de intentos fallidos por usuario e IP en la base de datos, con
+ventana fija y UPDATE atómicos (compartidos por todas las instancias)
+
+Brute-force traffic does reach the database: each login checks the lock
+with one query and each failure costs several statements (cleanup and an
+insert-or-update per counter); a lock only spares the password hash
+"""
+
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .models import IntentoAcceso
+
+
+def _ventana():
+    return timedelta(minutes=settings.LOGIN_BLOQUEO_MINUTOS)
+
+
+def _key(tipo, valor):
+    # Hash so arbitrary usernames/IPs fit the column
+    digest = hashlib.sha256((valor or '').strip().lower().encode()).hexdigest()[:32]
+    return f'{tipo}:{digest}'
+
+
+def login_bloqueado(username, ip):
+    """True while the username or the client IP is locked out"""
+    return IntentoAcceso.objects.filter(
+        clave__in=[_key('usuario', username), _key('ip', ip)],
+        bloqueado_hasta__gt=timezone.now(),
+    ).exists()
+
+
+def _contar(clave, maximo, ahora):
+    """
+    Add one failure to `clave` in a single UPDATE (concurrent failures are
+    never lost) and lock it once it reaches `maximo` within the window
+    Returns the failures counted in the current window
+    """
+    ventana = _ventana()
+    IntentoAcceso.objects.get_or_create(clave=clave, defaults={'inicio': ahora})
+    vencida = Q(inicio__lte=ahora - ventana)
+    contador = IntentoAcceso.objects.filter(clave=clave)
+    contador.update(
+        intentos=Case(When(vencida, then=Value(1)), default=F('intentos') + 1),
+        inicio=Case(When(vencida, then=Value(ahora)), default=F('inicio')),
+    )
+    contador.filter(intentos__gte=maximo).filter(
+        Q(bloqueado_hasta__isnull=True) | Q(bloqueado_hasta__lte=ahora)
+    ).update(bloqueado_hasta=ahora + ventana)
+    return contador.values_list('intentos', flat=True).first() or 0
+
+
+def registrar_intento_fallido(username, ip):
+    """
+    Record a failed login for username and IP
+    Returns the attempts left before the username is locked (0 = now locked)
+    """
+    ahora = timezone.now()
+    # Counters idle for more than a window are no longer needed
+    IntentoAcceso.objects.filter(
+        inicio__lt=ahora - 2 * _ventana(),
+    ).exclude(bloqueado_hasta__gt=ahora).delete()
+
+    _contar(_key('ip', ip), settings.LOGIN_MAX_INTENTOS_IP, ahora)
+    intentos = _contar(_key('usuario', username), settings.LOGIN_MAX_INTENTOS, ahora)
+    return max(settings.LOGIN_MAX_INTENTOS - intentos, 0)
+
+
+def limpiar_intentos(username):
+    """Reset the username counter after a successful login"""
+    IntentoAcceso.objects.filter(clave=_key('usuario', username)).delete()
@@ -0,0 +1,352 @@
+"""
+Report engine for Clinical Triage System
+Cálculo único y cacheado de las métricas de reportes (RF-06)
+"""
+
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Max, Q, Sum, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .analytics import combinar_histogramas, histogramas_espera, resumen_espera, resumen_histogramas
+from .expressions import BANDAS_EDAD
+from .models import (
+    CATEGORIAS_PRESION, Atencion, AtencionArchivada, InstantaneaReporte, Triaje, TriajeArchivado,
+    categoria_presion,
+)
+
+
+REPORT_VERSION_KEY = 'reportes:version'
+
+# Reports are also refreshed periodically, since the version counter lives
+# in each instance's cache and other instances may write new triages
+REPORT_CACHE_TIMEOUT = 300
+
+PRIORIDAD_COLORES = {'alta': '#DC3545', 'media': '#FFC107', 'baja': '#28A745'}
+
+
+def get_report_version():
+    """Data watermark for cached reports"""
+    version = cache.get(REPORT_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(REPORT_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def bump_report_version():
+    """Invalidate every cached report after triage/attention changes"""
+    try:
+        cache.incr(REPORT_VERSION_KEY)
+    except ValueError:
+        cache.set(REPORT_VERSION_KEY, 2, timeout=None)
+
+
+def rango_fechas(params, dias=30):
+    """
+    Parse fecha_desde/fecha_hasta (YYYY-MM-DD) from request params
+    Defaults to the last `dias` days ending today
+    """
+    fecha_hasta = params.get('fecha_hasta')
+    fecha_desde = params.get('fecha_desde')
+
+    if not fecha_hasta:
+        fecha_hasta = timezone.localdate()
+    else:
+        fecha_hasta = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
+
+    if not fecha_desde:
+        fecha_desde = fecha_hasta - timedelta(days=dias)
+    else:
+        fecha_desde = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
+
+    return fecha_desde, fecha_hasta
+
+
+def ultimo_dia_archivado():
+    """Local date of the newest archived triage (core/archivo.py), or None"""
+    ultima = TriajeArchivado.objects.aggregate(ultima=Max('fecha_hora_consulta'))['ultima']
+    return timezone.localdate(ultima) if ultima else None
+
+
+def requiere_archivo(fecha_desde=None):
+    """Whether a range starting on `fecha_desde` (a date) reaches the archive"""
+    if fecha_desde is None:
+        return TriajeArchivado.objects.exists()
+    ultimo = ultimo_dia_archivado()
+    return ultimo is not None and ultimo >= fecha_desde
+
+
+def leer_instantanea(instantanea):
+    """Snapshot agregados with the dates JSON turned into strings restored"""
+    datos = instantanea.datos
+    for fila in datos['tendencia']:
+        fila['fecha'] = date.fromisoformat(fila['fecha'])
+    for fila in datos['espera']['dia']:
+        fila['grupo'] = date.fromisoformat(fila['grupo'])
+    return datos
+
+
+def combinar_agregados(a, b):
+    """
+    MotorReportes.agregados() of two consecutive ranges (b after a), both
+    with histograms -> those of the whole range
+    Also adds the live and archived rows of one range, whose days overlap,
+    when both carry per-day histograms (histogramas_espera(por_dia=True))
+    Counts add up exactly; wait percentiles come from the merged histograms
+    """
+    usuarios = {fila['usuario__id']: dict(fila) for fila in a['usuarios']}
+    for fila in b['usuarios']:
+        if fila['usuario__id'] in usuarios:
+            usuarios[fila['usuario__id']]['total_atendidos'] += fila['total_atendidos']
+            usuarios[fila['usuario__id']]['duracion'] += fila['duracion']
+        else:
+            usuarios[fila['usuario__id']] = dict(fila)
+
+    tendencia = Counter()
+    for fila in a['tendencia'] + b['tendencia']:
+        tendencia[fila['fecha']] += fila['total']
+
+    histogramas = combinar_histogramas(a['histogramas'], b['histogramas'])
+    espera = resumen_histogramas(histogramas)
+    # Without per-day histograms the two ranges share no day
+    espera.setdefault('dia', a['espera']['dia'] + b['espera']['dia'])
+    return {
+        'totales': {clave: a['totales'][clave] + b['totales'][clave] for clave in a['totales']},
+        'especialidades': dict(Counter(a['especialidades']) + Counter(b['especialidades'])),
+        'tendencia': [{'fecha': fecha, 'total': total} for fecha, total in sorted(tendencia.items())],
+        'por_edad': a['por_edad'] + b['por_edad'],
+        'por_presion': dict(Counter(a['por_presion']) + Counter(b['por_presion'])),
+        'usuarios': list(usuarios.values()),
+        'espera': espera,
+        'histogramas': histogramas,
+    }
+
+
+class MotorReportes:
+    """
+    Computes every report metric for a date range in a few grouped queries
+    Results are cached by (range, data version) and shared by the reports
+    page and the JSON API
+    With `archivo`, reads the archive tables instead of the live ones
+    """
+
+    def __init__(self, fecha_desde, fecha_hasta, archivo=False):
+        self.fecha_desde = fecha_desde
+        self.fecha_hasta = fecha_hasta
+        self.archivo = archivo
+        # Half-open datetime range in local time: index-friendly, no __date casts
+        self.inicio = timezone.make_aware(datetime.combine(fecha_desde, time.min))
+        self.fin = timezone.make_aware(datetime.combine(fecha_hasta + timedelta(days=1), time.min))
+
+    @property
+    def cache_key(self):
+        return f'reportes:{self.fecha_desde}:{self.fecha_hasta}:v{get_report_version()}'
+
+    def triajes(self):
+        modelo = TriajeArchivado if self.archivo else Triaje
+        return modelo.objects.filter(
+            fecha_hora_consulta__gte=self.inicio,
+            fecha_hora_consulta__lt=self.fin,
+        ).order_by()
+
+    def atenciones(self):
+        modelo = AtencionArchivada if self.archivo else Atencion
+        return modelo.objects.filter(
+            fecha_fin__isnull=False,
+            triaje__fecha_hora_consulta__gte=self.inicio,
+            triaje__fecha_hora_consulta__lt=self.fin,
+        ).order_by()
+
+    def calcular(self):
+        """All report metrics, computed once per range and data version"""
+        return cache.get_or_set(self.cache_key, self._calcular, REPORT_CACHE_TIMEOUT)
+
+    def _calcular(self):
+        # A nightly snapshot covering the start of the range (see
+        # core/instantaneas.py) leaves only the days after it to compute
+        instantanea = InstantaneaReporte.objects.filter(
+            fecha_desde=self.fecha_desde, fecha_hasta__lte=self.fecha_hasta,
+        ).order_by('-fecha_hasta').first()
+        if instantanea is None:
+            return self.presentar(self.agregados())
+
+        datos = leer_instantanea(instantanea)
+        if instantanea.fecha_hasta < self.fecha_hasta:
+            resto = MotorReportes(instantanea.fecha_hasta + timedelta(days=1), self.fecha_hasta)
+            datos = combinar_agregados(datos, resto.agregados(histogramas=True))
+        return {**self.presentar(datos), 'instantanea': instantanea.generado}
+
+    def agregados(self, histogramas=False):
+        """
+        Report figures for the range in a mergeable form: counts per group,
+        attention time sums and, with `histogramas`, the wait-time histograms
+        that let two ranges' percentiles be combined
+        Closed triages older than limite_archivo() are in the archive tables:
+        when the range reaches them, both parts are computed and added up
+        """
+        if self.archivo or not requiere_archivo(self.fecha_desde):
+            return self._agregados(histogramas)
+
+        archivo = MotorReportes(self.fecha_desde, self.fecha_hasta, archivo=True)
+        datos = combinar_agregados(
+            self._agregados(True, por_dia=True), archivo._agregados(True, por_dia=True),
+        )
+        if histogramas:
+            # Per-day histograms are only needed for this merge
+            del datos['histogramas']['dia']
+        else:
+            del datos['histogramas']
+        return datos
+
+    def _agregados(self, histogramas, por_dia=False):
+        triajes = self.triajes()
+
+        # Totals and priority split in one pass
+        totales = triajes.aggregate(
+            total_registrados=Count('id'),
+            total_atendidos=Count('id', filter=Q(estado='atendido')),
+            alta=Count('id', filter=Q(nivel_prioridad='alta')),
+            media=Count('id', filter=Q(nivel_prioridad='media')),
+            baja=Count('id', filter=Q(nivel_prioridad='baja')),
+        )
+
+        especialidades = triajes.values('especialidad').annotate(total=Count('id'))
+
+        tendencia = triajes.annotate(
+            fecha=TruncDate('fecha_hora_consulta')
+        ).values('fecha').annotate(
+            total=Count('id')
+        ).order_by('fecha')
+
+        # Age bands per especialidad, age taken at triage time
+        por_edad = triajes.con_edad().values(
+            'especialidad', 'banda_edad'
+        ).annotate(
+            total=Count('id')
+        )
+
+        # Blood pressure categories from the indexed numeric columns
+        por_presion = triajes.annotate(
+            categoria=categoria_presion()
+        ).values('categoria').annotate(
+            total=Count('id')
+        )
+
+        usuarios = self.atenciones().values(
+            'usuario__id', 'usuario__nombre_completo'
+        ).annotate(
+            total_atendidos=Count('id'),
+            duracion=Sum(F('fecha_fin') - F('fecha_inicio')),
+        )
+
+        datos = {
+            'totales': totales,
+            'especialidades': {fila['especialidad']: fila['total'] for fila in especialidades},
+            'tendencia': list(tendencia),
+            'por_edad': list(por_edad),
+            'por_presion': {fila['categoria']: fila['total'] for fila in por_presion},
+            'usuarios': [
+                {**fila, 'duracion': fila['duracion'].total_seconds() if fila['duracion'] else 0}
+                for fila in usuarios
+            ],
+            'espera': resumen_espera(triajes),
+        }
+        if histogramas:
+            datos['histogramas'] = histogramas_espera(triajes, por_dia)
+        return datos
+
+    def presentar(self, datos):
+        """agregados() -> the metrics used by the reports page and API"""
+        especialidades = sorted(datos['especialidades'].items(), key=lambda item: -item[1])[:10]
+        usuarios_stats = []
+        for fila in sorted(datos['usuarios'], key=lambda fila: -fila['total_atendidos']):
+            usuarios_stats.append({
+                'usuario__id': fila['usuario__id'],
+                'usuario__nombre_completo': fila['usuario__nombre_completo'],
+                'total_atendidos': fila['total_atendidos'],
+                'promedio_minutos': round(fila['duracion'] / fila['total_atendidos'] / 60),
+            })
+
+        totales = datos['totales']
+        return {
+            'stats': {
+                'total_registrados': totales['total_registrados'],
+                'total_atendidos': totales['total_atendidos'],
+            },
+            'prioridad': {p: totales[p] for p in PRIORIDAD_COLORES},
+            'especialidad_stats': [{'especialidad': e, 'total': total} for e, total in especialidades],
+            'tendencia_diaria': datos['tendencia'],
+            'usuarios_stats': usuarios_stats,
+            'edad_especialidad': self._pivotar_edades(datos['por_edad']),
+            'espera': self._ordenar_espera(datos['espera']),
+            'presion_stats': self._ordenar_presion(datos['por_presion']),
+        }
+
+    @staticmethod
+    def _ordenar_presion(totales):
+        """Blood pressure categories, most severe first, without empty ones"""
+        categorias = [(codigo, etiqueta) for codigo, etiqueta, _ in CATEGORIAS_PRESION]
+        return [
+            {'categoria': codigo, 'etiqueta': etiqueta, 'total': totales[codigo]}
+            for codigo, etiqueta in categorias + [('sin_dato', 'Sin dato')] if totales.get(codigo)
+        ]
+
+    @staticmethod
+    def _ordenar_espera(resumen):
+        """Priority rows in clinical order and especialidad display names"""
+        orden = list(PRIORIDAD_COLORES)
+        resumen['prioridad'].sort(key=lambda fila: orden.index(fila['grupo']))
+        nombres = dict(Triaje.ESPECIALIDADES)
+        for fila in resumen['especialidad']:
+            fila['especialidad_display'] = nombres.get(fila['grupo'], fila['grupo'])
+        resumen['especialidad'].sort(key=lambda fila: -fila['total'])
+        return resumen
+
+    @staticmethod
+    def _pivotar_edades(filas):
+        """(especialidad, banda, total) rows -> one row per especialidad"""
+        nombres = dict(Triaje.ESPECIALIDADES)
+        tabla = {}
+        for fila in filas:
+            item = tabla.setdefault(fila['especialidad'], {
+                'especialidad': fila['especialidad'],
+                'especialidad_display': nombres.get(fila['especialidad'], fila['especialidad']),
+                'total': 0,
+                **{banda: 0 for banda, _ in BANDAS_EDAD},
+                'sin_dato': 0,
+            })
+            item[fila['banda_edad']] += fila['total']
+            item['total'] += fila['total']
+        return sorted(tabla.values(), key=lambda item: -item['total'])
+
+    def datos_graficos(self, datos=None):
+        """Chart.js payload (priority doughnut, daily trend and wait times)"""
+        datos = datos or self.calcular()
+        espera = datos['espera']
+        por_hora = {fila['grupo']: fila for fila in espera['hora']}
+        return {
+            'prioridad': {
+                'labels': ['Alta', 'Media', 'Baja'],
+                'data': list(datos['prioridad'].values()),
+                'colors': list(PRIORIDAD_COLORES.values()),
+            },
+            'tendencia': {
+                'labels': [str(t['fecha']) for t in datos['tendencia_diaria']],
+                'data': [t['total'] for t in datos['tendencia_diaria']],
+            },
+            'espera_dia': {
+                'labels': [str(fila['grupo']) for fila in espera['dia']],
+                'p50': [fila['p50'] for fila in espera['dia']],
+                'p90': [fila['p90'] for fila in espera['dia']],
+            },
+            # Every hour of the day, empty where nobody was seen
+            'espera_hora': {
+                'labels': [f'{hora:02d}:00' for hora in range(24)],
+                'p50': [por_hora.get(hora, {}).get('p50') for hora in range(24)],
+                'p90': [por_hora.get(hora, {}).get('p90') for hora in range(24)],
+            },
+        }
@@ -0,0 +1,189 @@
+"""
+Patient data retention
+Anonimización o depuración por lotes de pacientes sin visitas dentro del
+período de retención, sin bloquear el registro en la clínica
+"""
+
+import re
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, Exists, OuterRef, Q, Value
+from django.db.models.functions import Cast, Concat, TruncYear
+from django.utils import timezone
+
+from .models import (
+    Atencion, AtencionArchivada, NotaClinica, NotaClinicaArchivada, Paciente, PosibleDuplicado,
+    RegistroAuditoria, Triaje, TriajeArchivado,
+)
+from .queue import bump_queue_version
+from .reports import bump_report_version
+from .tendencias import invalidar_signos
+
+
+MODOS = ['anonimizar', 'purgar']
+NOMBRE_ANONIMO = 'Paciente anonimizado'
+# Audit entries whose description names a patient (views.py,
+# sincronizacion.py, fusion.py)
+ACCIONES_CON_PACIENTE = [
+    'crear_triaje', 'iniciar_atencion', 'finalizar_atencion', 'eliminar_paciente', 'fusionar_pacientes',
+]
+
+
+def limite_retencion(dias=None):
+    """Patients not seen since this moment are beyond retention"""
+    return timezone.now() - timedelta(days=settings.RETENCION_DIAS if dias is None else dias)
+
+
+def vencidos(limite, modo='anonimizar'):
+    """Patients whose last visit (or registration, if never seen) is before `limite`"""
+    pacientes = Paciente.objects.filter(
+        Q(ultima_visita__lt=limite) | Q(ultima_visita__isnull=True, fecha_registro__lt=limite)
+    )
+    if modo == 'anonimizar':
+        pacientes = pacientes.filter(anonimizado=False)
+    return pacientes
+
+
+def _borrar(consulta):
+    """Set-based DELETE without CASCADE collection or per-row signals"""
+    return consulta._raw_delete(consulta.db)
+
+
+def _anonimizar(ids):
+    """
+    Replace the identifiers of the patients and their triage snapshots,
+    keep sex, birth year and the clinical measurements for statistics,
+    drop the free-text notes and duplicate candidates
+    Returns the number of triages touched
+    """
+    _borrar(NotaClinica.objects.filter(triaje__paciente_id__in=ids))
+    _borrar(NotaClinicaArchivada.objects.filter(triaje__paciente_id__in=ids))
+    _borrar(PosibleDuplicado.objects.filter(Q(paciente_id__in=ids) | Q(duplicado_id__in=ids)))
+    triajes = 0
+    for modelo in (Triaje, TriajeArchivado):
+        triajes += modelo.objects.filter(paciente_id__in=ids).update(
+            paciente_nombre=Value(NOMBRE_ANONIMO),
+            paciente_ci=Concat(Value('ANON'), Cast('paciente_id', CharField())),
+        )
+    Paciente.objects.filter(id__in=ids).update(
+        nombre_completo=Value(NOMBRE_ANONIMO),
+        ci=Concat(Value('ANON'), Cast('id', CharField())),
+        fecha_nacimiento=TruncYear('fecha_nacimiento'),
+        clave_fonetica='',
+        anonimizado=True,
+    )
+    return triajes
+
+
+def _depurar_auditoria(ids):
+    """
+    Scrub the names and CIs of the patients from the audit descriptions
+    that mention them; the entries are kept. Most descriptions name a
+    patient without the CI, so a namesake's entries are scrubbed too
+    Runs before the patients are anonymized or deleted
+    """
+    reemplazos = []
+    menciones = Q()
+    for paciente_id, nombre, ci in Paciente.objects.filter(id__in=ids).values_list('id', 'nombre_completo', 'ci'):
+        patron = re.escape(nombre)
+        # str(paciente) in fusion.py, then the bare name closing a
+        # description or followed by ' (sincronización)'
+        reemplazos.append((
+            re.compile(rf'(?<!\w){patron} - CI: {re.escape(ci)}(?!\w)'), f'{NOMBRE_ANONIMO} - CI: ANON{paciente_id}',
+        ))
+        reemplazos.append((re.compile(rf'(?<!\w){patron}(?=$| \()'), NOMBRE_ANONIMO))
+        menciones |= Q(descripcion__contains=nombre)
+    if not reemplazos:
+        return
+    registros = list(
+        RegistroAuditoria.objects.filter(menciones, accion__in=ACCIONES_CON_PACIENTE).only('id', 'descripcion')
+    )
+    for registro in registros:
+        for patron, anonimo in reemplazos:
+            registro.descripcion = patron.sub(anonimo, registro.descripcion)
+    RegistroAuditoria.objects.bulk_update(registros, ['descripcion'])
+
+
+def _purgar(ids):
+    """Delete the patients and everything hanging from them, children first"""
+    _borrar(NotaClinica.objects.filter(triaje__paciente_id__in=ids))
+    _borrar(NotaClinicaArchivada.objects.filter(triaje__paciente_id__in=ids))
+    _borrar(Atencion.objects.filter(triaje__paciente_id__in=ids))
+    _borrar(AtencionArchivada.objects.filter(triaje__paciente_id__in=ids))
+    triajes = _borrar(Triaje.objects.filter(paciente_id__in=ids))
+    triajes += _borrar(TriajeArchivado.objects.filter(paciente_id__in=ids))
+    _borrar(PosibleDuplicado.objects.filter(Q(paciente_id__in=ids) | Q(duplicado_id__in=ids)))
+    _borrar(Paciente.objects.filter(id__in=ids))
+    return triajes
+
+
+def depurar_lote(limite, modo, desde, lote):
+    """
+    Anonymize or purge the next `lote` patients beyond retention with
+    id > `desde`, in one short transaction
+    Patients locked by a live registration are skipped (the next run takes
+    them); the retention condition is re-checked under the row lock, also
+    against the triages themselves, in case one was inserted before its
+    visit counters were updated
+    Names and CIs in the audit log are scrubbed in the same transaction
+    Returns (patient ids processed, triages touched)
+    """
+    with transaction.atomic():
+        ids = list(
+            vencidos(limite, modo).filter(id__gt=desde)
+            .filter(~Exists(Triaje.objects.filter(paciente_id=OuterRef('id'), fecha_hora_consulta__gte=limite)))
+            .order_by('id')
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:lote]
+        )
+        if not ids:
+            return [], 0
+        _depurar_auditoria(ids)
+        triajes = _anonimizar(ids) if modo == 'anonimizar' else _purgar(ids)
+
+        def invalidar():
+            # Raw deletes and updates send no signals
+            bump_queue_version()
+            bump_report_version()
+            for paciente_id in ids:
+                invalidar_signos(paciente_id)
+
+        transaction.on_commit(invalidar)
+    return ids, triajes
+
+
+def depurar(modo='anonimizar', dias=None, lote=None, pausa=None, desde=0, progreso=None):
+    """
+    Retention job: walk the patients beyond retention in id order, one
+    transaction per `lote` with `pausa` seconds between them
+    Re-running resumes where it stopped (processed patients no longer
+    match); `desde` skips ids already covered
+    A summary is written to the audit log even if the job is interrupted
+    """
+    if modo not in MODOS:
+        raise ValueError(f'Modo de retención desconocido: {modo}')
+    dias = settings.RETENCION_DIAS if dias is None else dias
+    lote = lote or settings.RETENCION_LOTE
+    pausa = settings.RETENCION_PAUSA if pausa is None else pausa
+    limite = limite_retencion(dias)
+    resumen = {'modo': modo, 'dias': dias, 'pacientes': 0, 'triajes': 0, 'ultimo_id': desde}
+    try:
+        while True:
+            ids, triajes = depurar_lote(limite, modo, resumen['ultimo_id'], lote)
+            if not ids:
+                return resumen
+            resumen['pacientes'] += len(ids)
+            resumen['triajes'] += triajes
+            resumen['ultimo_id'] = ids[-1]
+            if progreso:
+                progreso(resumen)
+            time.sleep(pausa)
+    finally:
+        RegistroAuditoria.objects.create(
+            accion='depurar_pacientes',
+            descripcion='Retención ({modo}, más de {dias} días): {pacientes} pacientes, '
+                        '{triajes} triajes, último id {ultimo_id}'.format(**resumen),
+        )
@@ -0,0 +1,96 @@
+"""
+Signal handlers for Clinical Triage System
+Invalidación de caché de la cola de triaje y de los reportes, ritmo de atención,
+detección de pacientes duplicados, contadores de visitas
+"""
+
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .duplicados import registrar_duplicados
+from .estimacion import registrar_atencion_finalizada
+from .models import Paciente, Triaje, TriajeArchivado, Atencion, ultima_visita_campos
+from .queue import bump_queue_version
+from .reports import bump_report_version
+from .tendencias import invalidar_signos
+
+
+@receiver(post_save, sender=Triaje)
+@receiver(post_delete, sender=Triaje)
+@receiver(post_save, sender=Paciente)
+@receiver(post_delete, sender=Paciente)
+def invalidar_cola(sender, **kwargs):
+    """Any triage or patient change may alter the rendered queue"""
+    bump_queue_version()
+
+
+@receiver(post_save, sender=Triaje)
+@receiver(post_delete, sender=Triaje)
+@receiver(post_save, sender=Atencion)
+@receiver(post_delete, sender=Atencion)
+def invalidar_reportes(sender, **kwargs):
+    """Triage and attention changes alter report metrics"""
+    bump_report_version()
+
+
+@receiver(post_save, sender=Triaje)
+@receiver(post_delete, sender=Triaje)
+def invalidar_serie_signos(sender, instance, **kwargs):
+    """A new or edited triage changes the patient's vitals trend"""
+    invalidar_signos(instance.paciente_id)
+
+
+@receiver(post_save, sender=Atencion)
+def actualizar_ritmo(sender, instance, **kwargs):
+    """Finished attentions feed the queue's estimated wait"""
+    if instance.fecha_fin:
+        registrar_atencion_finalizada(instance)
+
+
+@receiver(post_save, sender=Paciente)
+def sincronizar_resumen(sender, instance, created, **kwargs):
+    """Edited name, CI, sex or birth date: refresh the triage snapshots"""
+    if not created and instance.resumen_cambiado():
+        Triaje.objects.filter(paciente=instance).sincronizar_paciente()
+        TriajeArchivado.objects.filter(paciente=instance).sincronizar_paciente()
+        bump_report_version()
+
+
+@receiver(post_save, sender=Paciente)
+def detectar_duplicado(sender, instance, created, **kwargs):
+    """New patients are checked against the master for likely duplicates"""
+    if created:
+        registrar_duplicados(instance)
+
+
+@receiver(post_save, sender=Triaje)
+def contar_visita(sender, instance, created, **kwargs):
+    """
+    A new triage bumps the patient's visit counters in one UPDATE: the F()
+    increment is atomic under concurrent registrations, and a returning
+    patient becomes 'antiguo'
+    """
+    if created:
+        posterior = Q(ultima_visita__isnull=True) | Q(ultima_visita__lte=instance.fecha_hora_consulta)
+        Paciente.objects.filter(id=instance.paciente_id).update(
+            total_visitas=F('total_visitas') + 1,
+            ultima_visita=Case(When(posterior, then=Value(instance.fecha_hora_consulta)), default=F('ultima_visita')),
+            ultima_prioridad=Case(When(posterior, then=Value(instance.nivel_prioridad)), default=F('ultima_prioridad')),
+            tipo_paciente=Case(When(total_visitas__gte=1, then=Value('antiguo')), default=F('tipo_paciente')),
+        )
+        return
+    anterior = instance.__dict__.pop('_paciente_anterior', None)
+    if anterior is not None:
+        # Triage moved to another patient
+        Paciente.objects.filter(id__in=[anterior, instance.paciente_id]).recalcular_visitas()
+
+
+@receiver(post_delete, sender=Triaje)
+def descontar_visita(sender, instance, **kwargs):
+    """A deleted triage decrements the count; the latest visit is looked up again"""
+    Paciente.objects.filter(id=instance.paciente_id).update(
+        total_visitas=Greatest(F('total_visitas') - 1, 0),
+        **ultima_visita_campos(instance.paciente_id),
+    )
@@ -0,0 +1,197 @@
+"""
+Discrete-event simulator for the triage queue
+Simula llegadas históricas o sintéticas con la misma regla de orden de la cola
+"""
+
+import heapq
+import math
+from datetime import datetime, time, timedelta
+
+from django.db.models import DateTimeField, DurationField, ExpressionWrapper, F, Value
+from django.utils import timezone
+
+from .demanda import (
+    DEMANDA_SEMANAS, DURACION_POR_DEFECTO_MINUTOS, PRIORIDADES, indices_de, tensor_llegadas,
+)
+from .models import Atencion, Triaje, TriajeArchivado
+from .queue import clave_cola
+from .reports import requiere_archivo
+
+
+PERCENTILES_SIMULACION = (50, 90, 99)
+MUESTRAS_DURACION = 5000
+
+
+class Llegadas:
+    """
+    Compact arrival stream: minutes since the start, priority index into
+    PRIORIDADES, service minutes and early-warning score, as NumPy arrays
+    sorted by arrival
+    """
+
+    def __init__(self, np, tiempos, prioridades, servicios, puntajes=None):
+        orden = np.argsort(tiempos, kind='stable')
+        self.tiempos = np.asarray(tiempos, dtype=np.float64)[orden]
+        self.prioridades = np.asarray(prioridades, dtype=np.int8)[orden]
+        self.servicios = np.asarray(servicios, dtype=np.float64)[orden]
+        if puntajes is None:
+            puntajes = np.zeros(len(self.tiempos))
+        self.puntajes = np.asarray(puntajes, dtype=np.int16)[orden]
+
+    def __len__(self):
+        return len(self.tiempos)
+
+
+def duraciones_historicas(np, limite=MUESTRAS_DURACION):
+    """Recent attention durations (minutes) per priority index"""
+    filas = Atencion.objects.filter(fecha_fin__isnull=False).annotate(
+        duracion=F('fecha_fin') - F('fecha_inicio'),
+    ).order_by('-fecha_fin').values_list('triaje__nivel_prioridad', 'duracion')[:limite]
+
+    por_prioridad = {}
+    if filas:
+        prioridades, duraciones = zip(*filas)
+        minutos = np.array(duraciones, dtype='timedelta64[us]').astype(np.float64) / 60e6
+        prioridades = np.array(prioridades)
+        for indice, prioridad in enumerate(PRIORIDADES):
+            por_prioridad[indice] = minutos[prioridades == prioridad]
+        por_prioridad[None] = minutos
+    return por_prioridad
+
+
+def _muestrear_servicios(np, rng, prioridades, duraciones):
+    """Draw service minutes from the empirical durations of each priority"""
+    servicios = np.empty(len(prioridades))
+    for indice in range(len(PRIORIDADES)):
+        mascara = prioridades == indice
+        muestra = duraciones.get(indice)
+        if muestra is None or not len(muestra):
+            muestra = duraciones.get(None)
+        if muestra is not None and len(muestra):
+            servicios[mascara] = rng.choice(muestra, size=mascara.sum())
+        else:
+            servicios[mascara] = rng.exponential(DURACION_POR_DEFECTO_MINUTOS, size=mascara.sum())
+    return servicios
+
+
+def llegadas_sinteticas(np, rng, dias, escala=1.0, semanas=DEMANDA_SEMANAS, hoy=None):
+    """
+    Poisson arrivals with the historical mean rate of each priority at each
+    weekday/hour (see core.demanda), scaled by `escala`, starting today
+    """
+    hoy = hoy or timezone.localdate()
+    tasas = tensor_llegadas(np, hoy, semanas).mean(axis=0).sum(axis=0) * escala
+    dias_semana = (np.arange(dias) + hoy.weekday()) % 7
+    # (priority, day, hour) rates for the simulated horizon
+    tasas = tasas[:, dias_semana, :]
+    conteos = rng.poisson(tasas).ravel()
+
+    inicios = np.broadcast_to(
+        (np.arange(dias)[:, None] * 24 + np.arange(24)) * 60.0, tasas.shape
+    ).ravel()
+    prioridades = np.repeat(
+        np.broadcast_to(np.arange(len(PRIORIDADES))[:, None, None], tasas.shape).ravel(), conteos
+    )
+    tiempos = np.repeat(inicios, conteos) + rng.uniform(0, 60, size=conteos.sum())
+    servicios = _muestrear_servicios(np, rng, prioridades, duraciones_historicas(np))
+    return Llegadas(np, tiempos, prioridades, servicios)
+
+
+def llegadas_historicas(np, rng, fecha_desde, fecha_hasta):
+    """
+    Replay recorded triages in a date range; attentions without a recorded
+    duration get one drawn from the empirical distribution
+    """
+    inicio = timezone.make_aware(datetime.combine(fecha_desde, time.min))
+    fin = timezone.make_aware(datetime.combine(fecha_hasta + timedelta(days=1), time.min))
+    # Archived (closed) triages of the range are replayed too
+    modelos = [Triaje, TriajeArchivado] if requiere_archivo(fecha_desde) else [Triaje]
+    consultas = [
+        modelo.objects.filter(
+            fecha_hora_consulta__gte=inicio,
+            fecha_hora_consulta__lt=fin,
+        ).annotate(
+            desde_inicio=ExpressionWrapper(
+                F('fecha_hora_consulta') - Value(inicio, output_field=DateTimeField()),
+                output_field=DurationField(),
+            ),
+            duracion=F('atencion__fecha_fin') - F('atencion__fecha_inicio'),
+        ).order_by().values_list('desde_inicio', 'nivel_prioridad', 'duracion', 'puntaje_alerta')
+        for modelo in modelos
+    ]
+    filas = consultas[0].union(*consultas[1:], all=True)
+
+    if not filas:
+        return Llegadas(np, [], [], [])
+    desde_inicio, prioridades, duraciones, puntajes = zip(*filas)
+    tiempos = np.array(desde_inicio, dtype='timedelta64[us]').astype(np.float64) / 60e6
+    prioridades = indices_de(np, PRIORIDADES, np.array(prioridades))
+    duraciones = np.array(duraciones, dtype='timedelta64[us]')
+    faltantes = np.isnat(duraciones)
+    servicios = np.where(faltantes, 0, duraciones.astype(np.int64)) / 60e6
+    servicios[faltantes] = _muestrear_servicios(
+        np, rng, prioridades[faltantes], duraciones_historicas(np)
+    )
+    return Llegadas(np, tiempos, prioridades, servicios, puntajes)
+
+
+def simular(np, llegadas, medicos):
+    """
+    Run the queue with `medicos` clinicians taking the next patient by
+    clave_cola (priority, early-warning score, arrival) whenever they are free
+    Synthetic arrivals have no vitals, so their ties fall back to arrival
+    Returns (wait minutes per arrival, processed events, peak queue length)
+    """
+    tiempos = llegadas.tiempos.tolist()
+    prioridades = [PRIORIDADES[p] for p in llegadas.prioridades.tolist()]
+    servicios = llegadas.servicios.tolist()
+    puntajes = llegadas.puntajes.tolist()
+    esperas = [0.0] * len(tiempos)
+
+    cola = []          # (*clave_cola, index)
+    fines = []         # completion times of busy clinicians
+    libres = medicos
+    siguiente = 0
+    eventos = 0
+    pico = 0
+    total = len(tiempos)
+
+    while siguiente < total or cola:
+        llegada = tiempos[siguiente] if siguiente < total else math.inf
+        if fines and fines[0] < llegada:
+            ahora = heapq.heappop(fines)
+            libres += 1
+        else:
+            ahora = llegada
+            heapq.heappush(cola, (*clave_cola(prioridades[siguiente], ahora, puntajes[siguiente]), siguiente))
+            siguiente += 1
+            pico = max(pico, len(cola))
+        eventos += 1
+
+        while libres and cola:
+            indice = heapq.heappop(cola)[-1]
+            esperas[indice] = ahora - tiempos[indice]
+            heapq.heappush(fines, ahora + servicios[indice])
+            libres -= 1
+
+    return np.array(esperas), eventos + len(fines), pico
+
+
+def resumen_simulacion(np, llegadas, esperas):
+    """Wait percentiles (minutes) overall and per priority"""
+    def medidas(valores):
+        if not len(valores):
+            return {'total': 0}
+        return {
+            'total': int(len(valores)),
+            'media': round(float(valores.mean()), 1),
+            **{f'p{p}': round(float(v), 1)
+               for p, v in zip(PERCENTILES_SIMULACION, np.percentile(valores, PERCENTILES_SIMULACION))},
+            'max': round(float(valores.max()), 1),
+        }
+
+    return {
+        'global': medidas(esperas),
+        **{prioridad: medidas(esperas[llegadas.prioridades == indice])
+           for indice, prioridad in enumerate(PRIORIDADES)},
+    }
@@ -0,0 +1,205 @@
+"""
+Offline registration sync
+Registros de paciente y triaje capturados sin conexión en la estación de
+enfermería, enviados por lotes; el uuid del cliente hace idempotente el reenvío
+"""
+
+import uuid
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .duplicados import registrar_duplicados
+from .fonetica import fonetica_nombre
+from .forms import PacienteForm, TriajeAntecedentesForm, TriajeDiagnosticoForm, TriajeSignosVitalesForm
+from .models import NotaClinica, Paciente, RegistroAuditoria, Triaje, TriajeArchivado
+from .queue import bump_queue_version
+from .reports import bump_report_version
+from .tendencias import invalidar_signos
+
+
+SYNC_MAX_REGISTROS = 100
+# A capture time older than this (or in the future) is replaced by the
+# arrival time: a station clock that is off must not reorder the queue
+SYNC_ANTIGUEDAD_MAXIMA = timedelta(hours=24)
+
+# Record section -> the registration wizard form that validates it
+SECCIONES = {
+    'paciente': PacienteForm,
+    'antecedentes': TriajeAntecedentesForm,
+    'signos_vitales': TriajeSignosVitalesForm,
+    'diagnostico': TriajeDiagnosticoForm,
+}
+CAMPOS_NOTA = ('sintomatologia', 'tratamiento', 'estudios_complementarios')
+
+
+def _uuid(valor):
+    try:
+        return uuid.UUID(str(valor))
+    except ValueError:
+        return None
+
+
+def _fecha_consulta(valor, ahora):
+    """Capture time sent by the station, if plausible"""
+    try:
+        fecha = parse_datetime(valor) if isinstance(valor, str) else None
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        return ahora
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha if ahora - SYNC_ANTIGUEDAD_MAXIMA <= fecha <= ahora else ahora
+
+
+def validar_registro(registro, pacientes):
+    """
+    Clean one record with the wizard's forms; a known CI is a returning
+    patient, whose stored data is kept (as the wizard's get_or_create)
+    Returns (cleaned data by section, errors by section)
+    """
+    limpio, errores = {}, {}
+    for seccion, formulario in SECCIONES.items():
+        datos = registro.get(seccion)
+        datos = datos if isinstance(datos, dict) else {}
+        if formulario is PacienteForm:
+            existente = pacientes.get(str(datos.get('ci', '')).strip())
+            instancia = None
+            if existente:
+                # Blank stand-in: the unique CI check skips the stored row and
+                # the form writes the cleaned values here, not into it
+                instancia = Paciente(id=existente.id)
+                instancia._state.adding = False
+            form = PacienteForm(datos, instance=instancia)
+        else:
+            form = formulario(datos)
+        if form.is_valid():
+            limpio[seccion] = form.cleaned_data
+        else:
+            errores[seccion] = form.errors.get_json_data()
+    return limpio, errores
+
+
+def sincronizar(registros, usuario, ip_address=None):
+    """
+    Store a batch of offline registrations: records already stored (same
+    uuid) are reported as 'duplicado', invalid ones as 'error' with the
+    form errors, and the rest are written with bulk inserts in one
+    transaction
+    Two stations creating the same new CI at once raise IntegrityError;
+    the whole batch is rolled back and can be sent again
+    Returns one {'uuid', 'estado', 'triaje_id' | 'errores'} per record
+    """
+    if not isinstance(registros, list):
+        raise ValueError('Se esperaba una lista de registros')
+    if len(registros) > SYNC_MAX_REGISTROS:
+        raise ValueError(f'Máximo {SYNC_MAX_REGISTROS} registros por lote')
+    registros = [registro if isinstance(registro, dict) else {} for registro in registros]
+
+    claves = [_uuid(registro.get('uuid')) for registro in registros]
+    guardados = {}
+    for modelo in (Triaje, TriajeArchivado):
+        guardados.update(
+            modelo.objects.filter(uuid_cliente__in=[c for c in claves if c]).values_list('uuid_cliente', 'id')
+        )
+    cis = [str(r['paciente'].get('ci', '')).strip() for r in registros if isinstance(r.get('paciente'), dict)]
+    pacientes = Paciente.objects.in_bulk(cis, field_name='ci')
+
+    ahora = timezone.now()
+    resultados = []
+    nuevos = {}
+    for registro, clave in zip(registros, claves):
+        if clave is None:
+            resultados.append({
+                'uuid': registro.get('uuid'),
+                'estado': 'error',
+                'errores': {'registro': {'uuid': [{'message': 'Identificador de registro inválido.', 'code': 'invalid'}]}},
+            })
+            continue
+        resultado = {'uuid': str(clave)}
+        resultados.append(resultado)
+        if clave in guardados:
+            resultado.update(estado='duplicado', triaje_id=guardados[clave])
+        elif clave in nuevos:
+            # Queued twice on the station; filled in once created
+            resultado['estado'] = 'duplicado'
+        else:
+            limpio, errores = validar_registro(registro, pacientes)
+            if errores:
+                resultado.update(estado='error', errores=errores)
+            else:
+                resultado['estado'] = 'creado'
+                nuevos[clave] = (limpio, _fecha_consulta(registro.get('registrado'), ahora))
+
+    if nuevos:
+        creados = _guardar(nuevos, pacientes, usuario, ip_address)
+        for resultado in resultados:
+            if resultado['estado'] != 'error' and 'triaje_id' not in resultado:
+                resultado['triaje_id'] = creados[uuid.UUID(resultado['uuid'])]
+    return resultados
+
+
+def _guardar(nuevos, pacientes, usuario, ip_address):
+    """
+    Insert the patients, triages, notes and audit entries of the valid
+    records, and do what the model signals would have done per row
+    Returns {uuid: triaje id}
+    """
+    with transaction.atomic():
+        por_crear = {}
+        for limpio, _ in nuevos.values():
+            datos = limpio['paciente']
+            if datos['ci'] not in pacientes and datos['ci'] not in por_crear:
+                por_crear[datos['ci']] = Paciente(**datos, clave_fonetica=fonetica_nombre(datos['nombre_completo']))
+        Paciente.objects.bulk_create(por_crear.values())
+        pacientes = {**pacientes, **por_crear}
+
+        triajes = []
+        notas = []
+        for clave, (limpio, fecha) in nuevos.items():
+            triaje = Triaje(
+                paciente=pacientes[limpio['paciente']['ci']],
+                uuid_cliente=clave,
+                fecha_hora_consulta=fecha,
+                **limpio['antecedentes'],
+                **limpio['signos_vitales'],
+            )
+            triaje.copiar_resumen_paciente()
+            triaje.calcular_signos()
+            triajes.append(triaje)
+            # Diagnosis text goes to the notes table, only when given
+            nota = {campo: limpio['diagnostico'].get(campo) for campo in CAMPOS_NOTA}
+            if any(nota.values()):
+                notas.append((triaje, nota))
+        Triaje.objects.bulk_create(triajes)
+        NotaClinica.objects.bulk_create([NotaClinica(triaje=triaje, **nota) for triaje, nota in notas])
+
+        # Visit counters (signals.contar_visita): a returning patient becomes 'antiguo'
+        ids = {triaje.paciente_id for triaje in triajes}
+        Paciente.objects.filter(id__in=ids).recalcular_visitas()
+        Paciente.objects.filter(id__in=ids, total_visitas__gt=1).update(tipo_paciente='antiguo')
+        for paciente in por_crear.values():
+            registrar_duplicados(paciente)
+
+        RegistroAuditoria.objects.bulk_create([
+            RegistroAuditoria(
+                usuario=usuario,
+                accion='crear_triaje',
+                descripcion=f'Triaje creado para {triaje.paciente_nombre} (sincronización)',
+                ip_address=ip_address,
+            )
+            for triaje in triajes
+        ])
+
+        def invalidar():
+            # Bulk inserts send no signals
+            bump_queue_version()
+            bump_report_version()
+            for paciente_id in ids:
+                invalidar_signos(paciente_id)
+
+        transaction.on_commit(invalidar)
+    return {triaje.uuid_cliente: triaje.id for triaje in triajes}
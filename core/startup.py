@@ -0,0 +1,32 @@
+"""
+Startup helpers for the serverless WSGI entry point
+Precalentamiento de la instancia antes de la primera petición
+"""
+
+import logging
+
+from django.db import connection
+from django.template.loader import get_template
+from django.urls import get_resolver, reverse
+
+
+logger = logging.getLogger(__name__)
+
+# Templates hit by the first requests after a deploy or scale-out
+WARMUP_TEMPLATES = ['base.html', 'login.html', 'dashboard.html']
+
+
+def warm_up():
+    """
+    Populate the URL resolver, compile the hot templates into the cached
+    loader and open the database connection (kept by CONN_MAX_AGE)
+    Safe to call more than once; failures never block startup
+    """
+    try:
+        get_resolver()
+        reverse('login')
+        for name in WARMUP_TEMPLATES:
+            get_template(name)
+        connection.ensure_connection()
+    except Exception:
+        logger.warning('Warm-up incompleto', exc_info=True)
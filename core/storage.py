@@ -0,0 +1,60 @@
+"""
+Static files storage for production builds
+Minificación, optimización de imágenes, nombres con hash y precompresión
+"""
+
+from django.conf import settings
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class OptimizedStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    Minifies CSS/JS and recompresses PNGs in STATIC_ROOT before hashing;
+    WhiteNoise then writes .gz/.br variants of every hashed file
+    Only used by collectstatic (build_files.sh), so the optimizers are
+    imported lazily and never load on a serverless cold start
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        if not dry_run:
+            for name in paths:
+                self._optimizar(name)
+            # Hash and compress the optimized copies, not the source files
+            paths = {name: (self, name) for name in paths}
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+
+    def _optimizar(self, name):
+        if name.endswith(('.min.js', '.min.css')):
+            return
+        if name.endswith('.css'):
+            from rcssmin import cssmin
+            self._reescribir(name, lambda data: cssmin(data.decode('utf-8')).encode('utf-8'))
+        elif name.endswith('.js'):
+            from rjsmin import jsmin
+            self._reescribir(name, lambda data: jsmin(data.decode('utf-8')).encode('utf-8'))
+        elif name.endswith('.png'):
+            self._optimizar_png(name)
+
+    def _reescribir(self, name, transformar):
+        with open(self.path(name), 'rb') as f:
+            original = f.read()
+        optimizado = transformar(original)
+        if len(optimizado) < len(original):
+            with open(self.path(name), 'wb') as f:
+                f.write(optimizado)
+
+    def _optimizar_png(self, name):
+        import io
+        from PIL import Image
+
+        def transformar(data):
+            imagen = Image.open(io.BytesIO(data))
+            # Downscale images whose display size is known (2x for HiDPI)
+            max_size = settings.STATIC_IMAGE_SIZES.get(name)
+            if max_size:
+                imagen.thumbnail(max_size, Image.LANCZOS)
+            salida = io.BytesIO()
+            imagen.save(salida, format='PNG', optimize=True)
+            return salida.getvalue()
+
+        self._reescribir(name, transformar)
@@ -0,0 +1,34 @@
+"""
+Background job tasks
+Tareas que el trabajador puede ejecutar; cada una devuelve un resumen en JSON
+y las breves también corren desde la ruta cron
+"""
+
+from . import archivo, demanda, duplicados, instantaneas, retencion
+from .trabajos import tarea
+
+
+@tarea('calcular_pronostico', api=True, breve=True)
+def calcular_pronostico(semanas=demanda.DEMANDA_SEMANAS):
+    resultado = demanda.actualizar_pronostico(semanas=semanas)
+    return {'generado': resultado['generado']}
+
+
+@tarea('generar_instantaneas', api=True, breve=True)
+def generar_instantaneas():
+    return instantaneas.generar_instantaneas()
+
+
+@tarea('detectar_duplicados', api=True)
+def detectar_duplicados(procesos=1, umbral=duplicados.UMBRAL_DUPLICADO):
+    return duplicados.detectar_duplicados(procesos=procesos, umbral=umbral)
+
+
+@tarea('archivar_triajes', api=True)
+def archivar_triajes(dias=None):
+    return {'triajes': archivo.archivar(dias)}
+
+
+@tarea('depurar_pacientes')
+def depurar_pacientes(modo='anonimizar', dias=None):
+    return retencion.depurar(modo, dias)
@@ -0,0 +1,55 @@
+"""
+Vital-sign trend series per patient
+Series columnares de signos vitales para graficar la evolución del paciente
+"""
+
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Triaje, TriajeArchivado
+
+
+SIGNOS_TIMEOUT = 600
+
+# Triage columns returned as series, in addition to the timestamps
+CAMPOS_SIGNOS = [
+    'peso', 'talla', 'temperatura', 'pulsacion',
+    'presion_sistolica', 'presion_diastolica', 'puntaje_alerta',
+]
+
+
+def _signos_key(paciente_id):
+    return f'signos:{paciente_id}'
+
+
+def invalidar_signos(paciente_id):
+    """Drop a patient's cached series after one of their triages changes"""
+    cache.delete(_signos_key(paciente_id))
+
+
+def serie_signos(paciente_id):
+    """
+    Columnar vitals for every triage of a patient, oldest first:
+    {'fechas': [...], 'peso': [...], ...}, one list per CAMPOS_SIGNOS field
+    """
+    return cache.get_or_set(
+        _signos_key(paciente_id), lambda: _serie_signos(paciente_id), SIGNOS_TIMEOUT
+    )
+
+
+def _serie_signos(paciente_id):
+    # Only the vitals columns, from the live and archived triages, each
+    # read through its (paciente, fecha) index
+    columnas = ['fecha_hora_consulta', *CAMPOS_SIGNOS]
+    filas = Triaje.objects.filter(paciente_id=paciente_id).order_by().values_list(*columnas).union(
+        TriajeArchivado.objects.filter(paciente_id=paciente_id).order_by().values_list(*columnas), all=True,
+    ).order_by('fecha_hora_consulta')
+
+    columnas = list(zip(*filas)) or [()] * (len(CAMPOS_SIGNOS) + 1)
+    serie = {'fechas': [timezone.localtime(fecha).isoformat() for fecha in columnas[0]]}
+    for campo, valores in zip(CAMPOS_SIGNOS, columnas[1:]):
+        # Decimals are not JSON numbers
+        serie[campo] = [float(v) if isinstance(v, Decimal) else v for v in valores]
+    return serie
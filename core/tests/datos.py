@@ -0,0 +1,36 @@
+"""
+Test data helpers
+Pacientes y triajes mínimos para las pruebas
+"""
+
+from datetime import date
+from itertools import count
+
+from core.models import Paciente, Triaje
+
+
+_ci = count(1000)
+
+
+def crear_paciente(**datos):
+    datos.setdefault('ci', str(next(_ci)))
+    datos.setdefault('nombre_completo', f'Paciente {datos["ci"]}')
+    datos.setdefault('sexo', 'F')
+    datos.setdefault('fecha_nacimiento', date(1980, 5, 5))
+    return Paciente.objects.create(**datos)
+
+
+def crear_triaje(paciente, modelo=Triaje, **datos):
+    datos = {
+        'especialidad': 'medicina_general',
+        'medico': 'Dr. Quispe',
+        'enfermeria': 'Lic. Mamani',
+        'talla': 165,
+        'peso': 60,
+        'temperatura': 36.8,
+        'presion_arterial': '120/80',
+        'pulsacion': 72,
+        'nivel_prioridad': 'baja',
+        **datos,
+    }
+    return modelo.objects.create(paciente=paciente, **datos)
@@ -0,0 +1,79 @@
+from io import StringIO
+
+import numpy as np
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+
+from core.alerta import puntaje_alerta, puntajes_alerta
+from core.models import Triaje, TriajeArchivado
+
+from .datos import crear_paciente, crear_triaje
+
+
+class PuntajeAlertaTests(SimpleTestCase):
+    def test_bandas_en_los_limites(self):
+        casos = [
+            ({'temperatura': 35.0}, 3),
+            ({'temperatura': 35.1}, 1),
+            ({'temperatura': 36.0}, 1),
+            ({'temperatura': 36.1}, 0),
+            ({'temperatura': 38.0}, 0),
+            ({'temperatura': 39.0}, 1),
+            ({'temperatura': 39.1}, 2),
+            ({'pulsacion': 40}, 3),
+            ({'pulsacion': 41}, 1),
+            ({'pulsacion': 51}, 0),
+            ({'pulsacion': 91}, 1),
+            ({'pulsacion': 111}, 2),
+            ({'pulsacion': 131}, 3),
+            ({'presion_sistolica': 90}, 3),
+            ({'presion_sistolica': 91}, 2),
+            ({'presion_sistolica': 101}, 1),
+            ({'presion_sistolica': 111}, 0),
+            ({'presion_sistolica': 219}, 0),
+            ({'presion_sistolica': 220}, 3),
+        ]
+        for signos, puntos in casos:
+            with self.subTest(**signos):
+                self.assertEqual(puntaje_alerta(**signos), puntos)
+
+    def test_suma_y_signos_faltantes(self):
+        self.assertEqual(puntaje_alerta(), 0)
+        self.assertEqual(puntaje_alerta(temperatura=None, pulsacion=None, presion_sistolica=None), 0)
+        self.assertEqual(puntaje_alerta(temperatura=34.5, pulsacion=120, presion_sistolica=85), 8)
+
+    def test_version_vectorizada_igual_a_la_escalar(self):
+        rng = np.random.default_rng(0)
+        columnas = {
+            'temperatura': rng.uniform(33, 42, 500).round(1),
+            'pulsacion': rng.integers(30, 160, 500).astype(float),
+            'presion_sistolica': rng.integers(70, 240, 500).astype(float),
+        }
+        columnas['pulsacion'][::7] = np.nan
+        vectorizado = puntajes_alerta(np, columnas)
+        for i in range(500):
+            signos = {
+                signo: None if np.isnan(valores[i]) else valores[i] for signo, valores in columnas.items()
+            }
+            self.assertEqual(vectorizado[i], puntaje_alerta(**signos))
+
+
+class RecalcularAlertasTests(TestCase):
+    def test_save_calcula_el_puntaje(self):
+        triaje = crear_triaje(crear_paciente(), temperatura=39.5, pulsacion=120, presion_arterial='85/50')
+        self.assertEqual(triaje.puntaje_alerta, 2 + 2 + 3)
+
+    def test_comando_recalcula_vivos_y_archivados(self):
+        paciente = crear_paciente()
+        vivo = crear_triaje(paciente, temperatura=39.5)
+        archivado = crear_triaje(paciente, modelo=TriajeArchivado, temperatura=34.0, pulsacion=72)
+        # Scores left by an older rule table
+        Triaje.objects.update(puntaje_alerta=0)
+        TriajeArchivado.objects.update(puntaje_alerta=0)
+
+        call_command('recalcular_alertas', lote=1, stdout=StringIO())
+
+        vivo.refresh_from_db()
+        archivado.refresh_from_db()
+        self.assertEqual(vivo.puntaje_alerta, 2)
+        self.assertEqual(archivado.puntaje_alerta, 3)
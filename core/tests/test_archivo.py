@@ -0,0 +1,103 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core.archivo import archivar, buscar_triaje, historial_combinado
+from core.cube import Cubo
+from core.models import (
+    Atencion, AtencionArchivada, NotaClinica, NotaClinicaArchivada, Triaje, TriajeArchivado, Usuario,
+)
+from core.reports import MotorReportes
+
+from .datos import crear_paciente, crear_triaje
+
+
+class ArchivoTests(TestCase):
+    def setUp(self):
+        self.ahora = timezone.now()
+        self.medico = Usuario.objects.create_user('medico', password='x', rol='doctor', nombre_completo='Dr. Quispe')
+        self.paciente = crear_paciente()
+        self.viejos = [self.atendido(dias) for dias in (400, 420, 450)]
+        # Old but never closed: stays in the live table
+        self.pendiente = crear_triaje(self.paciente, fecha_hora_consulta=self.ahora - timedelta(days=430))
+        self.reciente = self.atendido(3)
+
+    def atendido(self, dias):
+        triaje = crear_triaje(
+            self.paciente, estado='atendido', fecha_hora_consulta=self.ahora - timedelta(days=dias),
+        )
+        inicio = triaje.fecha_hora_consulta + timedelta(minutes=20)
+        Atencion.objects.create(
+            triaje=triaje, usuario=self.medico, fecha_inicio=inicio, fecha_fin=inicio + timedelta(minutes=15),
+        )
+        NotaClinica.objects.create(triaje=triaje, sintomatologia=f'nota {dias}')
+        return triaje
+
+    def test_traslado_y_lectura(self):
+        self.paciente.refresh_from_db()
+        visitas = (self.paciente.total_visitas, self.paciente.ultima_visita)
+
+        self.assertEqual(archivar(dias=365, lote=2, pausa=0), 3)
+
+        ids = {triaje.id for triaje in self.viejos}
+        self.assertEqual(set(TriajeArchivado.objects.values_list('id', flat=True)), ids)
+        self.assertEqual(set(Triaje.objects.values_list('id', flat=True)), {self.pendiente.id, self.reciente.id})
+        self.assertEqual(AtencionArchivada.objects.count(), 3)
+        self.assertEqual(NotaClinicaArchivada.objects.count(), 3)
+        self.assertEqual(Atencion.objects.count(), 1)
+        self.assertEqual(NotaClinica.objects.count(), 1)
+        # Archiving is not a deleted visit
+        self.paciente.refresh_from_db()
+        self.assertEqual((self.paciente.total_visitas, self.paciente.ultima_visita), visitas)
+
+        archivado = buscar_triaje(self.viejos[0].id, 'atencion', 'nota')
+        self.assertIsInstance(archivado, TriajeArchivado)
+        self.assertEqual(archivado.nota.sintomatologia, 'nota 400')
+        self.assertEqual(archivado.atencion.usuario, self.medico)
+
+        # Re-running finds nothing left to move
+        self.assertEqual(archivar(dias=365, pausa=0), 0)
+
+    def test_historial_combina_ambas_tablas_solo_si_hace_falta(self):
+        archivar(dias=365, pausa=0)
+        vivos = Triaje.objects.filter(paciente=self.paciente)
+        archivados = TriajeArchivado.objects.filter(paciente=self.paciente)
+
+        todos = historial_combinado(vivos, archivados, (self.ahora - timedelta(days=500)).date())
+        self.assertEqual(
+            sorted((t.id, t.archivado) for t in todos),
+            sorted([(t.id, True) for t in self.viejos] + [(self.pendiente.id, False), (self.reciente.id, False)]),
+        )
+        recientes = historial_combinado(vivos, archivados, (self.ahora - timedelta(days=30)).date())
+        self.assertEqual({t.archivado for t in recientes}, {False})
+
+    def test_reportes_iguales_antes_y_despues_de_archivar(self):
+        hoy = timezone.localdate()
+        motor = MotorReportes(hoy - timedelta(days=500), hoy)
+        antes = motor.presentar(motor.agregados())
+        archivar(dias=365, pausa=0)
+        despues = motor.presentar(motor.agregados())
+
+        for clave in ('stats', 'prioridad', 'tendencia_diaria', 'usuarios_stats', 'edad_especialidad', 'presion_stats'):
+            self.assertEqual(antes[clave], despues[clave], clave)
+        self.assertEqual(antes['espera']['global']['total'], despues['espera']['global']['total'])
+        self.assertAlmostEqual(antes['espera']['global']['p50'], despues['espera']['global']['p50'], delta=0.1)
+
+    def test_cubo_suma_ambas_tablas(self):
+        hoy = timezone.localdate()
+        desde = hoy - timedelta(days=500)
+        medidas = ['total', 'atencion_media', 'espera_media']
+        antes = Cubo(desde, hoy, ['estado', 'usuario'], medidas).ejecutar()
+        archivar(dias=365, pausa=0)
+
+        despues = Cubo(desde, hoy, ['estado', 'usuario'], medidas).ejecutar()
+        self.assertEqual(despues['filas'], antes['filas'])
+        self.assertEqual(
+            [(fila['estado'], fila['total']) for fila in despues['filas']],
+            [('atendido', 4), ('en_espera', 1)],
+        )
+        # Percentiles of the two tables cannot be added up
+        with self.assertRaises(ValueError):
+            Cubo(desde, hoy, ['especialidad'], ['total', 'espera_p90'])
+        Cubo(hoy - timedelta(days=30), hoy, ['especialidad'], ['espera_p90'])
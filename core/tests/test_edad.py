@@ -0,0 +1,29 @@
+from datetime import date, timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Triaje
+from core.reports import MotorReportes
+
+from .datos import crear_paciente, crear_triaje
+
+
+class BandaEdadTests(TestCase):
+    def test_bandas_y_edad_desconocida(self):
+        hoy = timezone.localdate()
+        for nacimiento in (date(hoy.year - 5, 1, 1), date(1980, 5, 5), date(1940, 5, 5)):
+            crear_triaje(crear_paciente(fecha_nacimiento=nacimiento))
+        sin_edad = crear_triaje(crear_paciente())
+        Triaje.objects.filter(id=sin_edad.id).update(edad_consulta=None)
+
+        self.assertEqual(
+            sorted(Triaje.objects.con_edad().values_list('banda_edad', flat=True)),
+            ['adulto', 'geriatrico', 'pediatrico', 'sin_dato'],
+        )
+        motor = MotorReportes(hoy - timedelta(days=1), hoy)
+        fila, = motor.presentar(motor.agregados())['edad_especialidad']
+        self.assertEqual(
+            [fila[banda] for banda in ('pediatrico', 'adulto', 'geriatrico', 'sin_dato', 'total')],
+            [1, 1, 1, 1, 4],
+        )
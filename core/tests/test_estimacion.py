@@ -0,0 +1,66 @@
+import threading
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from core.estimacion import _sumas_ventana, estimar_esperas, get_ritmo, registrar_atencion_finalizada
+from core.models import Atencion, Usuario
+
+from .datos import crear_paciente, crear_triaje
+
+
+def atencion(id, especialidad, minutos, fin=None):
+    fin = fin or timezone.now()
+    triaje = SimpleNamespace(especialidad=especialidad)
+    return SimpleNamespace(id=id, triaje=triaje, fecha_inicio=fin - timedelta(minutes=minutos), fecha_fin=fin)
+
+
+class RitmoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def sumas(self, *claves):
+        return _sumas_ventana(get_ritmo(), claves, timezone.now())
+
+    def test_finalizaciones_concurrentes_no_se_pierden(self):
+        get_ritmo()
+        hilos = [
+            threading.Thread(target=registrar_atencion_finalizada, args=(atencion(i, 'pediatria', 10),))
+            for i in range(40)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(self.sumas('pediatria', None), {'pediatria': (40, 24000), None: (40, 24000)})
+
+    def test_guardar_dos_veces_cuenta_una(self):
+        registrar_atencion_finalizada(atencion(1, 'pediatria', 10))
+        registrar_atencion_finalizada(atencion(1, 'pediatria', 10))
+        self.assertEqual(self.sumas('pediatria'), {'pediatria': (1, 600)})
+
+    def test_estado_desde_bd_y_estimacion(self):
+        medico = Usuario.objects.create_user('medico', password='x', rol='doctor', nombre_completo='Dr. Quispe')
+        paciente = crear_paciente()
+        ahora = timezone.now()
+        # Two 20-minute attentions in the window, one long one a day ago
+        for minutos_atras, duracion in ((30, 20), (60, 20), (60 * 24, 90)):
+            triaje = crear_triaje(paciente, estado='atendido', especialidad='pediatria')
+            fin = ahora - timedelta(minutes=minutos_atras)
+            Atencion.objects.create(
+                triaje=triaje, usuario=medico, fecha_inicio=fin - timedelta(minutes=duracion), fecha_fin=fin,
+            )
+        cache.clear()
+        self.assertEqual(self.sumas('pediatria'), {'pediatria': (2, 2400)})
+
+        cola = [
+            crear_triaje(paciente, especialidad=especialidad)
+            for especialidad in ('pediatria', 'pediatria', 'cardiologia')
+        ]
+        esperas = estimar_esperas(cola)
+        # 20 minutes per patient; cardiologia has no data and uses the overall pace
+        self.assertEqual([esperas[t.id] for t in cola], [10, 30, 10])
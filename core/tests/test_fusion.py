@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core.fusion import agrupar_pares, elegir_supervivientes, fusionar_pacientes
+from core.models import Paciente, PosibleDuplicado, RegistroAuditoria, Triaje, TriajeArchivado
+
+from .datos import crear_paciente, crear_triaje
+
+
+class AgruparParesTests(SimpleTestCase):
+    def test_cadenas_forman_un_grupo(self):
+        grupos = agrupar_pares([(1, 2), (3, 2), (4, 5)])
+        self.assertEqual(sorted(sorted(grupo) for grupo in grupos), [[1, 2, 3], [4, 5]])
+
+
+class FusionarPacientesTests(TestCase):
+    def setUp(self):
+        ahora = timezone.now()
+        self.conservado = crear_paciente(nombre_completo='Juan Perez', fecha_nacimiento=date(1980, 5, 5))
+        self.duplicado = crear_paciente(nombre_completo='Juan Peres', fecha_nacimiento=date(1980, 5, 6))
+        crear_triaje(self.conservado, fecha_hora_consulta=ahora - timedelta(days=10))
+        crear_triaje(self.conservado, fecha_hora_consulta=ahora - timedelta(days=5))
+        self.ultimo = crear_triaje(self.duplicado, fecha_hora_consulta=ahora - timedelta(days=1), nivel_prioridad='alta')
+        self.archivado = crear_triaje(
+            self.duplicado, modelo=TriajeArchivado, fecha_hora_consulta=ahora - timedelta(days=400),
+            paciente_nombre='Juan Peres',
+        )
+        PosibleDuplicado.objects.get_or_create(
+            paciente=self.conservado, duplicado=self.duplicado, defaults={'puntaje': 0.9},
+        )
+
+    def test_superviviente_con_mas_triajes(self):
+        self.assertEqual(
+            elegir_supervivientes([[self.duplicado.id, self.conservado.id]]),
+            [(self.conservado.id, [self.duplicado.id])],
+        )
+
+    def test_reasigna_triajes_y_recalcula_contadores(self):
+        movidos = fusionar_pacientes([(self.conservado.id, [self.duplicado.id])])
+
+        self.assertEqual(movidos, 2)
+        self.assertFalse(Paciente.objects.filter(id=self.duplicado.id).exists())
+        self.assertEqual(Triaje.objects.filter(paciente=self.conservado).count(), 3)
+        self.assertEqual(TriajeArchivado.objects.filter(paciente=self.conservado).count(), 1)
+        self.ultimo.refresh_from_db()
+        self.archivado.refresh_from_db()
+        self.assertEqual(self.ultimo.paciente_nombre, 'Juan Perez')
+        self.assertEqual(self.archivado.paciente_nombre, 'Juan Perez')
+
+        self.conservado.refresh_from_db()
+        self.assertEqual(self.conservado.total_visitas, 4)
+        self.assertEqual(self.conservado.ultima_visita, self.ultimo.fecha_hora_consulta)
+        self.assertEqual(self.conservado.ultima_prioridad, 'alta')
+        self.assertEqual(self.conservado.tipo_paciente, 'antiguo')
+        self.assertFalse(PosibleDuplicado.objects.exists())
+        self.assertTrue(RegistroAuditoria.objects.filter(accion='fusionar_pacientes').exists())
+
+    def test_no_conservar_y_fusionar_el_mismo(self):
+        otro = crear_paciente()
+        with self.assertRaises(ValueError):
+            fusionar_pacientes([(self.conservado.id, [self.duplicado.id]), (otro.id, [self.conservado.id])])
@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from core.instantaneas import generar_instantaneas, rangos_estandar
+from core.models import Atencion, InstantaneaReporte, Usuario
+from core.reports import MotorReportes
+
+from .datos import crear_paciente, crear_triaje
+
+
+class InstantaneasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.ahora = timezone.now()
+        self.hoy = timezone.localdate()
+        self.medico = Usuario.objects.create_user('medico', password='x', rol='doctor', nombre_completo='Dr. Quispe')
+        self.paciente = crear_paciente()
+        prioridades = ('alta', 'media', 'baja')
+        for dias in range(12):
+            self.atendido(dias, prioridades[dias % 3], espera=10 + dias * 7)
+        crear_triaje(self.paciente, fecha_hora_consulta=self.ahora - timedelta(days=2), especialidad='pediatria')
+
+    def atendido(self, dias, prioridad, espera):
+        triaje = crear_triaje(
+            self.paciente, estado='atendido', nivel_prioridad=prioridad,
+            fecha_hora_consulta=self.ahora - timedelta(days=dias),
+        )
+        inicio = triaje.fecha_hora_consulta + timedelta(minutes=espera)
+        Atencion.objects.create(
+            triaje=triaje, usuario=self.medico, fecha_inicio=inicio, fecha_fin=inicio + timedelta(minutes=15),
+        )
+
+    def assertReportesIguales(self, combinado, completo):
+        for clave in (
+            'stats', 'prioridad', 'especialidad_stats', 'tendencia_diaria', 'usuarios_stats',
+            'edad_especialidad', 'presion_stats',
+        ):
+            self.assertEqual(combinado[clave], completo[clave], clave)
+        # Percentiles of merged histograms are exact to the bin width
+        self.assertEqual(len(combinado['espera']['prioridad']), len(completo['espera']['prioridad']))
+        filas = [(combinado['espera']['global'], completo['espera']['global'])]
+        filas += zip(combinado['espera']['prioridad'], completo['espera']['prioridad'])
+        for a, b in filas:
+            self.assertEqual((a.get('grupo'), a['total']), (b.get('grupo'), b['total']))
+            for percentil in ('p50', 'p90'):
+                self.assertAlmostEqual(a[percentil], b[percentil], delta=0.1)
+
+    def test_instantanea_mas_dia_en_curso_igual_a_recalculo(self):
+        resumen = generar_instantaneas(self.hoy)
+        self.assertIn('ultimos_7', resumen)
+        # Today is computed live, including rows added after the snapshot
+        self.atendido(0, 'alta', espera=95)
+
+        desde, hasta = rangos_estandar(self.hoy)['ultimos_7']
+        motor = MotorReportes(desde, hasta)
+        combinado = motor.calcular()
+        self.assertIn('instantanea', combinado)
+        self.assertReportesIguales(combinado, motor.presentar(motor.agregados()))
+
+    def test_sin_instantanea_calcula_en_vivo(self):
+        desde, hasta = rangos_estandar(self.hoy)['ultimos_7']
+        self.assertFalse(InstantaneaReporte.objects.exists())
+        self.assertNotIn('instantanea', MotorReportes(desde, hasta).calcular())
+
+    def test_regenerar_reemplaza_las_anteriores(self):
+        generar_instantaneas(self.hoy)
+        total = InstantaneaReporte.objects.count()
+        generar_instantaneas(self.hoy)
+        self.assertEqual(InstantaneaReporte.objects.count(), total)
+        ayer = self.hoy - timedelta(days=1)
+        self.assertFalse(InstantaneaReporte.objects.filter(fecha_hasta__gt=ayer).exists())
@@ -0,0 +1,56 @@
+from django.test import SimpleTestCase, TestCase
+
+from core.models import Triaje, categoria_presion, parse_presion
+
+from .datos import crear_paciente, crear_triaje
+
+
+class ParsePresionTests(SimpleTestCase):
+    def test_lecturas_validas(self):
+        self.assertEqual(parse_presion('120/80'), (120, 80))
+        self.assertEqual(parse_presion(' 95 / 60 '), (95, 60))
+        self.assertEqual(parse_presion('180/110'), (180, 110))
+
+    def test_texto_que_no_es_lectura(self):
+        for texto in ('', None, '120', '120/80/70', '1200/80', 'alta', '120-80'):
+            with self.subTest(texto=texto):
+                self.assertEqual(parse_presion(texto), (None, None))
+
+
+class PresionTriajeTests(TestCase):
+    def setUp(self):
+        self.paciente = crear_paciente()
+
+    def test_save_llena_columnas_numericas(self):
+        triaje = crear_triaje(self.paciente, presion_arterial='135/85')
+        self.assertEqual((triaje.presion_sistolica, triaje.presion_diastolica), (135, 85))
+
+        triaje.presion_arterial = 'sin dato'
+        triaje.save(update_fields=['presion_arterial'])
+        triaje.refresh_from_db()
+        self.assertEqual((triaje.presion_sistolica, triaje.presion_diastolica), (None, None))
+
+    def test_categorias(self):
+        esperado = {
+            '185/100': 'crisis',
+            '130/125': 'crisis',
+            '145/85': 'hipertension',
+            '125/75': 'prehipertension',
+            '85/55': 'hipotension',
+            '110/70': 'normal',
+            'ilegible': 'sin_dato',
+        }
+        ids = {crear_triaje(self.paciente, presion_arterial=lectura).id: lectura for lectura in esperado}
+        obtenido = dict(
+            Triaje.objects.annotate(categoria=categoria_presion()).values_list('id', 'categoria')
+        )
+        self.assertEqual({ids[i]: categoria for i, categoria in obtenido.items()}, esperado)
+
+    def test_con_presion_incluye_categorias_mas_graves(self):
+        crisis = crear_triaje(self.paciente, presion_arterial='190/100')
+        hipertension = crear_triaje(self.paciente, presion_arterial='150/95')
+        crear_triaje(self.paciente, presion_arterial='118/76')
+        self.assertEqual(
+            set(Triaje.objects.con_presion('hipertension').values_list('id', flat=True)),
+            {crisis.id, hipertension.id},
+        )
@@ -0,0 +1,89 @@
+from datetime import date, timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import (
+    Atencion, NotaClinica, Paciente, PosibleDuplicado, RegistroAuditoria, Triaje, TriajeArchivado,
+)
+from core.retencion import NOMBRE_ANONIMO, depurar
+
+from .datos import crear_paciente, crear_triaje
+
+
+class RetencionTests(TestCase):
+    def setUp(self):
+        ahora = timezone.now()
+        self.viejo = crear_paciente(
+            nombre_completo='Ana Perez', fecha_nacimiento=date(1950, 6, 15), fecha_registro=ahora - timedelta(days=5000),
+        )
+        self.triaje = crear_triaje(self.viejo, fecha_hora_consulta=ahora - timedelta(days=4000), estado='atendido')
+        Atencion.objects.create(triaje=self.triaje, fecha_fin=self.triaje.fecha_hora_consulta)
+        NotaClinica.objects.create(triaje=self.triaje, sintomatologia='dolor')
+        crear_triaje(self.viejo, modelo=TriajeArchivado, fecha_hora_consulta=ahora - timedelta(days=4100))
+        self.reciente = crear_paciente(nombre_completo='Ana Perez Lopez')
+        crear_triaje(self.reciente)
+        PosibleDuplicado.objects.get_or_create(paciente=self.viejo, duplicado=self.reciente, defaults={'puntaje': 0.8})
+        RegistroAuditoria.objects.create(accion='crear_triaje', descripcion='Triaje creado para Ana Perez')
+        RegistroAuditoria.objects.create(accion='crear_triaje', descripcion='Triaje creado para Ana Perez Lopez')
+        RegistroAuditoria.objects.create(
+            accion='fusionar_pacientes', descripcion=f'Pacientes fusionados en {self.reciente}: {self.viejo}',
+        )
+
+    def test_anonimizar(self):
+        resumen = depurar('anonimizar', dias=3650, pausa=0)
+
+        self.assertEqual((resumen['pacientes'], resumen['triajes']), (1, 2))
+        self.viejo.refresh_from_db()
+        self.assertTrue(self.viejo.anonimizado)
+        self.assertEqual(self.viejo.nombre_completo, NOMBRE_ANONIMO)
+        self.assertEqual(self.viejo.ci, f'ANON{self.viejo.id}')
+        self.assertEqual(self.viejo.fecha_nacimiento, date(1950, 1, 1))
+        self.assertEqual(self.viejo.sexo, 'F')
+        for modelo in (Triaje, TriajeArchivado):
+            self.assertEqual(
+                set(modelo.objects.filter(paciente=self.viejo).values_list('paciente_nombre', 'paciente_ci')),
+                {(NOMBRE_ANONIMO, f'ANON{self.viejo.id}')},
+            )
+        self.assertFalse(NotaClinica.objects.filter(triaje=self.triaje).exists())
+        self.assertTrue(Atencion.objects.filter(triaje=self.triaje).exists())
+        self.assertFalse(PosibleDuplicado.objects.exists())
+
+        descripciones = set(RegistroAuditoria.objects.values_list('descripcion', flat=True))
+        self.assertIn(f'Triaje creado para {NOMBRE_ANONIMO}', descripciones)
+        # Another patient whose name starts the same is left alone
+        self.assertIn('Triaje creado para Ana Perez Lopez', descripciones)
+        self.assertIn(
+            f'Pacientes fusionados en {self.reciente}: {NOMBRE_ANONIMO} - CI: ANON{self.viejo.id}', descripciones,
+        )
+        self.assertTrue(RegistroAuditoria.objects.filter(accion='depurar_pacientes').exists())
+
+        self.reciente.refresh_from_db()
+        self.assertFalse(self.reciente.anonimizado)
+        # Nothing left on a second run
+        self.assertEqual(depurar('anonimizar', dias=3650, pausa=0)['pacientes'], 0)
+
+    def test_triaje_reciente_sin_contadores_actualizados(self):
+        # Inserted without signals: ultima_visita still says 4000 days ago
+        Triaje.objects.bulk_create([Triaje(
+            paciente=self.viejo, especialidad='pediatria', medico='m', enfermeria='e', talla=160, peso=60,
+            temperatura=36.5, presion_arterial='120/80', pulsacion=70, nivel_prioridad='baja',
+        )])
+        self.assertEqual(depurar('anonimizar', dias=3650, pausa=0)['pacientes'], 0)
+        self.viejo.refresh_from_db()
+        self.assertFalse(self.viejo.anonimizado)
+
+    def test_purgar(self):
+        resumen = depurar('purgar', dias=3650, pausa=0)
+
+        self.assertEqual((resumen['pacientes'], resumen['triajes']), (1, 2))
+        self.assertFalse(Paciente.objects.filter(id=self.viejo.id).exists())
+        self.assertFalse(Triaje.objects.filter(paciente_id=self.viejo.id).exists())
+        self.assertFalse(TriajeArchivado.objects.filter(paciente_id=self.viejo.id).exists())
+        self.assertFalse(Atencion.objects.filter(triaje_id=self.triaje.id).exists())
+        self.assertTrue(Paciente.objects.filter(id=self.reciente.id).exists())
+        self.assertFalse(RegistroAuditoria.objects.filter(descripcion='Triaje creado para Ana Perez').exists())
+
+    def test_modo_desconocido(self):
+        with self.assertRaises(ValueError):
+            depurar('borrar')
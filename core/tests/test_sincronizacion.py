@@ -0,0 +1,119 @@
+import json
+import uuid
+from datetime import timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import NotaClinica, Paciente, RegistroAuditoria, Triaje, Usuario
+from core.sincronizacion import sincronizar
+
+from .datos import crear_paciente, crear_triaje
+
+
+def registro(ci='7001', **cambios):
+    datos = {
+        'uuid': str(uuid.uuid4()),
+        'registrado': (timezone.now() - timedelta(minutes=30)).isoformat(),
+        'paciente': {
+            'nombre_completo': 'Rosa Condori', 'ci': ci, 'sexo': 'F',
+            'fecha_nacimiento': '1990-03-12', 'tipo_paciente': 'nuevo',
+        },
+        'antecedentes': {
+            'especialidad': 'medicina_general', 'medico': 'Dr. Quispe',
+            'enfermeria': 'Lic. Mamani', 'tipo_servicio': 'consulta_externa',
+        },
+        'signos_vitales': {
+            'talla': '160', 'peso': '58', 'temperatura': '37.1',
+            'presion_arterial': '118/76', 'pulsacion': '80', 'nivel_prioridad': 'media',
+        },
+        'diagnostico': {'sintomatologia': 'Cefalea'},
+    }
+    datos.update(cambios)
+    return datos
+
+
+class SincronizacionTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(
+            'enfermera', password='x', rol='enfermeria', nombre_completo='Lic. Mamani',
+        )
+
+    def test_crea_y_reenvio_es_idempotente(self):
+        lote = [registro(), registro(ci='7002')]
+        primero = sincronizar(lote, self.usuario)
+        self.assertEqual([r['estado'] for r in primero], ['creado', 'creado'])
+        self.assertEqual(Triaje.objects.count(), 2)
+        self.assertEqual(NotaClinica.objects.count(), 2)
+        self.assertEqual(RegistroAuditoria.objects.filter(accion='crear_triaje').count(), 2)
+
+        triaje = Triaje.objects.get(id=primero[0]['triaje_id'])
+        self.assertEqual(str(triaje.uuid_cliente), lote[0]['uuid'])
+        self.assertEqual(triaje.paciente.ci, '7001')
+
+        # The station resends after a lost answer
+        segundo = sincronizar(lote, self.usuario)
+        self.assertEqual([r['estado'] for r in segundo], ['duplicado', 'duplicado'])
+        self.assertEqual([r['triaje_id'] for r in segundo], [r['triaje_id'] for r in primero])
+        self.assertEqual(Triaje.objects.count(), 2)
+
+    def test_uuid_repetido_en_el_mismo_lote(self):
+        uno = registro()
+        resultados = sincronizar([uno, dict(uno)], self.usuario)
+        self.assertEqual([r['estado'] for r in resultados], ['creado', 'duplicado'])
+        self.assertEqual(resultados[0]['triaje_id'], resultados[1]['triaje_id'])
+        self.assertEqual(Triaje.objects.count(), 1)
+
+    def test_errores_por_registro(self):
+        malo = registro(ci='7003')
+        malo['signos_vitales']['presion_arterial'] = '80/120'
+        resultados = sincronizar([registro(uuid='no-es-uuid'), malo, registro(ci='7004')], self.usuario)
+        self.assertEqual([r['estado'] for r in resultados], ['error', 'error', 'creado'])
+        self.assertIn('registro', resultados[0]['errores'])
+        self.assertIn('presion_arterial', resultados[1]['errores']['signos_vitales'])
+        self.assertFalse(Paciente.objects.filter(ci='7003').exists())
+
+    def test_paciente_que_vuelve(self):
+        paciente = crear_paciente(ci='7005', nombre_completo='Juan Flores')
+        crear_triaje(paciente, fecha_hora_consulta=timezone.now() - timedelta(days=20))
+        paciente.refresh_from_db()
+        self.assertEqual(paciente.total_visitas, 1)
+
+        # The stored patient data is kept, not the station's
+        sincronizar([registro(ci='7005')], self.usuario)
+        paciente.refresh_from_db()
+        self.assertEqual((paciente.total_visitas, paciente.tipo_paciente), (2, 'antiguo'))
+        self.assertEqual(paciente.nombre_completo, 'Juan Flores')
+
+    def test_hora_de_captura_implausible(self):
+        antes = timezone.now()
+        resultado, = sincronizar([registro(registrado='2001-01-01T08:00:00')], self.usuario)
+        self.assertGreaterEqual(Triaje.objects.get(id=resultado['triaje_id']).fecha_hora_consulta, antes)
+
+    def test_lote_invalido(self):
+        with self.assertRaises(ValueError):
+            sincronizar({'uuid': 'x'}, self.usuario)
+        with self.assertRaises(ValueError):
+            sincronizar([registro() for _ in range(101)], self.usuario)
+
+
+class ApiSincronizacionTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(
+            'enfermera', password='x', rol='enfermeria', nombre_completo='Lic. Mamani',
+        )
+        self.client.force_login(self.usuario)
+        self.url = reverse('api_sincronizar_registros')
+
+    def enviar(self, cuerpo):
+        return self.client.post(self.url, cuerpo, content_type='application/json')
+
+    def test_respuestas(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.assertEqual(self.enviar('{no es json').status_code, 400)
+        self.assertEqual(self.enviar(json.dumps({'registros': 'x'})).status_code, 400)
+
+        respuesta = self.enviar(json.dumps({'registros': [registro()]}))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['resultados'][0]['estado'], 'creado')
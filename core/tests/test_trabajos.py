@@ -0,0 +1,140 @@
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core.models import Trabajo
+from core.trabajos import TAREAS, ejecutar, encolar, liberar_vencidos, procesar, reclamar, renovar
+
+
+def sumar(a, b):
+    return {'total': a + b}
+
+
+def fallar():
+    raise RuntimeError('sin conexión')
+
+
+def reclamada():
+    # Lease expired mid-run and another worker took the job
+    Trabajo.objects.update(trabajador='w2')
+    return {}
+
+
+@override_settings(TRABAJOS_INTENTOS=2, TRABAJOS_REINTENTO=10, TRABAJOS_TIEMPO_MAXIMO=60)
+class TrabajosTests(TestCase):
+    def setUp(self):
+        self.tareas = mock.patch.dict(TAREAS, {
+            'sumar': (sumar, False, True),
+            'fallar': (fallar, False, True),
+            'larga': (sumar, False, False),
+            'reclamada': (reclamada, False, True),
+        })
+        self.tareas.start()
+        self.addCleanup(self.tareas.stop)
+
+    def test_encolar_valida_tarea_y_parametros(self):
+        with self.assertRaises(ValueError):
+            encolar('desconocida')
+        with self.assertRaises(ValueError):
+            encolar('sumar', {'a': 1})
+        trabajo = encolar('sumar', {'a': 1, 'b': 2})
+        self.assertEqual((trabajo.estado, trabajo.max_intentos), ('pendiente', 2))
+
+    def test_reclamar(self):
+        primero = encolar('sumar', {'a': 1, 'b': 2})
+        encolar('sumar', {'a': 1, 'b': 2}, ejecutar_desde=timezone.now() + timedelta(hours=1))
+        largo = encolar('larga', {'a': 1, 'b': 2})
+
+        self.assertEqual(reclamar(5, 'w1', ['sumar']), [primero.id])
+        primero.refresh_from_db()
+        self.assertEqual((primero.estado, primero.intentos, primero.trabajador), ('en_curso', 1, 'w1'))
+        self.assertIsNotNone(primero.vence)
+        # Already claimed, or not due yet
+        self.assertEqual(reclamar(5, 'w2', ['sumar']), [])
+        self.assertEqual(reclamar(5, 'w2'), [largo.id])
+
+    def test_ejecutar_completa(self):
+        trabajo = encolar('sumar', {'a': 1, 'b': 2})
+        reclamar(1, 'w1')
+        self.assertEqual(ejecutar(trabajo.id), 'completado')
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.resultado, {'total': 3})
+        self.assertIsNone(trabajo.vence)
+
+    def test_reintento_con_espera_y_fallo_final(self):
+        trabajo = encolar('fallar')
+        reclamar(1, 'w1')
+        antes = timezone.now()
+        self.assertEqual(ejecutar(trabajo.id), 'pendiente')
+        trabajo.refresh_from_db()
+        self.assertIn('sin conexión', trabajo.error)
+        self.assertGreaterEqual(trabajo.ejecutar_desde, antes + timedelta(seconds=10))
+
+        Trabajo.objects.filter(id=trabajo.id).update(ejecutar_desde=timezone.now())
+        reclamar(1, 'w1')
+        self.assertEqual(ejecutar(trabajo.id), 'fallido')
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.intentos, 2)
+        self.assertIsNotNone(trabajo.fecha_fin)
+
+    def test_vencimiento_del_plazo(self):
+        trabajo = encolar('sumar', {'a': 1, 'b': 2})
+        reclamar(1, 'muerto')
+        Trabajo.objects.filter(id=trabajo.id).update(vence=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(liberar_vencidos(), 1)
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.trabajador), ('pendiente', ''))
+
+        # Out of attempts on the second expiry
+        reclamar(1, 'w2')
+        Trabajo.objects.filter(id=trabajo.id).update(vence=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(liberar_vencidos(), 1)
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), ('fallido', 2))
+
+    def test_ejecucion_tardia_no_pisa_otro_reclamo(self):
+        trabajo = encolar('reclamada')
+        reclamar(1, 'w1')
+        ejecutar(trabajo.id)
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.trabajador), ('en_curso', 'w2'))
+
+    def test_procesar_solo_tareas_breves(self):
+        breve = encolar('sumar', {'a': 1, 'b': 2})
+        larga = encolar('larga', {'a': 1, 'b': 2})
+        self.assertEqual(procesar(5, 'cron'), 1)
+        breve.refresh_from_db()
+        larga.refresh_from_db()
+        self.assertEqual((breve.estado, larga.estado), ('completado', 'pendiente'))
+
+
+@override_settings(TRABAJOS_TIEMPO_MAXIMO=0.3)
+class LatidoTests(TransactionTestCase):
+    def test_tarea_larga_no_se_ejecuta_dos_veces(self):
+        ejecuciones = []
+
+        def larga():
+            ejecuciones.append(1)
+            # Well past the lease: the heartbeat keeps it ours
+            time.sleep(1)
+            return {'liberados': liberar_vencidos(), 'reclamados': reclamar(1, 'w2')}
+
+        with mock.patch.dict(TAREAS, {'larga': (larga, False, False)}):
+            trabajo = encolar('larga')
+            reclamar(1, 'w1')
+            self.assertEqual(ejecutar(trabajo.id), 'completado')
+
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.resultado, {'liberados': 0, 'reclamados': []})
+        self.assertEqual((trabajo.trabajador, trabajo.intentos, len(ejecuciones)), ('w1', 1, 1))
+
+    def test_renovar_solo_el_propio(self):
+        with mock.patch.dict(TAREAS, {'sumar': (sumar, False, True)}):
+            trabajo = encolar('sumar', {'a': 1, 'b': 2})
+        reclamar(1, 'w1')
+        self.assertTrue(renovar(trabajo.id, 'w1'))
+        self.assertFalse(renovar(trabajo.id, 'w2'))
@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import TriajeArchivado
+
+from .datos import crear_paciente, crear_triaje
+
+
+class ContadorVisitasTests(TestCase):
+    def setUp(self):
+        self.ahora = timezone.now()
+        self.paciente = crear_paciente()
+
+    def test_crear_incrementa_y_marca_antiguo(self):
+        crear_triaje(self.paciente, fecha_hora_consulta=self.ahora - timedelta(days=2), nivel_prioridad='media')
+        self.paciente.refresh_from_db()
+        self.assertEqual(self.paciente.total_visitas, 1)
+        self.assertEqual(self.paciente.tipo_paciente, 'nuevo')
+
+        crear_triaje(self.paciente, fecha_hora_consulta=self.ahora, nivel_prioridad='alta')
+        # Registered late: older than the last visit, which stays
+        crear_triaje(self.paciente, fecha_hora_consulta=self.ahora - timedelta(days=5))
+        self.paciente.refresh_from_db()
+        self.assertEqual(self.paciente.total_visitas, 3)
+        self.assertEqual(self.paciente.tipo_paciente, 'antiguo')
+        self.assertEqual(self.paciente.ultima_visita, self.ahora)
+        self.assertEqual(self.paciente.ultima_prioridad, 'alta')
+
+    def test_eliminar_descuenta_y_busca_la_visita_anterior(self):
+        anterior = crear_triaje(self.paciente, fecha_hora_consulta=self.ahora - timedelta(days=3), nivel_prioridad='media')
+        ultimo = crear_triaje(self.paciente, fecha_hora_consulta=self.ahora)
+
+        ultimo.delete()
+        self.paciente.refresh_from_db()
+        self.assertEqual(self.paciente.total_visitas, 1)
+        self.assertEqual(self.paciente.ultima_visita, anterior.fecha_hora_consulta)
+        self.assertEqual(self.paciente.ultima_prioridad, 'media')
+
+    def test_eliminar_el_ultimo_vivo_usa_el_archivo(self):
+        archivado = crear_triaje(
+            self.paciente, modelo=TriajeArchivado, fecha_hora_consulta=self.ahora - timedelta(days=400),
+            nivel_prioridad='alta',
+        )
+        self.paciente.total_visitas = 1
+        self.paciente.save()
+        vivo = crear_triaje(self.paciente, fecha_hora_consulta=self.ahora)
+
+        vivo.delete()
+        self.paciente.refresh_from_db()
+        self.assertEqual(self.paciente.total_visitas, 1)
+        self.assertEqual(self.paciente.ultima_visita, archivado.fecha_hora_consulta)
+        self.assertEqual(self.paciente.ultima_prioridad, 'alta')
+
+    def test_mover_triaje_recalcula_ambos_pacientes(self):
+        otro = crear_paciente(nombre_completo='Rosa Flores')
+        crear_triaje(self.paciente, fecha_hora_consulta=self.ahora - timedelta(days=1))
+        movido = crear_triaje(self.paciente, fecha_hora_consulta=self.ahora)
+
+        movido.paciente = otro
+        movido.save()
+
+        self.paciente.refresh_from_db()
+        otro.refresh_from_db()
+        movido.refresh_from_db()
+        self.assertEqual((self.paciente.total_visitas, otro.total_visitas), (1, 1))
+        self.assertEqual(self.paciente.ultima_visita, self.ahora - timedelta(days=1))
+        self.assertEqual(otro.ultima_visita, self.ahora)
+        self.assertEqual(movido.paciente_nombre, 'Rosa Flores')
@@ -0,0 +1,260 @@
+"""
+Database-backed background jobs
+Cola de trabajos en la misma base de datos, sin broker: se encolan desde las
+vistas y los ejecuta el comando trabajador (o la ruta cron en serverless)
+"""
+
+import importlib
+import inspect
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Trabajo
+
+
+# Task name -> (function, whether the jobs API may enqueue it, whether it
+# is short enough for the cron route)
+TAREAS = {}
+
+
+def tarea(nombre, api=False, breve=False):
+    """
+    Register a function as a job task; it gets the job parametros as kwargs
+    `breve` marks tasks that finish well within a cron call (procesar)
+    """
+    def registrar(funcion):
+        TAREAS[nombre] = (funcion, api, breve)
+        return funcion
+    return registrar
+
+
+def tareas_breves():
+    return [nombre for nombre, (_, _, breve) in tareas().items() if breve]
+
+
+def tareas():
+    """The registry, with the task definitions (core/tareas.py) loaded"""
+    importlib.import_module('core.tareas')
+    return TAREAS
+
+
+def encolar(nombre, parametros=None, usuario=None, ejecutar_desde=None):
+    """
+    Queue a job; it runs once a worker is free
+    Unknown tasks and parameters the task does not take raise ValueError
+    """
+    if nombre not in tareas():
+        raise ValueError(f'Tarea desconocida: {nombre}')
+    parametros = parametros or {}
+    try:
+        inspect.signature(TAREAS[nombre][0]).bind(**parametros)
+    except TypeError as e:
+        raise ValueError(f'Parámetros inválidos para {nombre}: {e}')
+    return Trabajo.objects.create(
+        tarea=nombre,
+        parametros=parametros,
+        usuario=usuario,
+        max_intentos=settings.TRABAJOS_INTENTOS,
+        ejecutar_desde=ejecutar_desde or timezone.now(),
+    )
+
+
+def nombre_trabajador():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'[:100]
+
+
+def reclamar(cantidad, trabajador, nombres=None):
+    """
+    Claim up to `cantidad` due jobs for `trabajador` in one short
+    transaction; rows another worker is claiming are skipped, not waited for
+    With `nombres`, only jobs of those tasks
+    Returns the claimed job ids
+    """
+    ahora = timezone.now()
+    pendientes = Trabajo.objects.filter(estado='pendiente', ejecutar_desde__lte=ahora)
+    if nombres is not None:
+        pendientes = pendientes.filter(tarea__in=nombres)
+    with transaction.atomic():
+        ids = list(
+            pendientes
+            .order_by('ejecutar_desde', 'id')
+            .select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:cantidad]
+        )
+        Trabajo.objects.filter(id__in=ids).update(
+            estado='en_curso',
+            intentos=F('intentos') + 1,
+            trabajador=trabajador,
+            fecha_inicio=ahora,
+            vence=ahora + timedelta(seconds=settings.TRABAJOS_TIEMPO_MAXIMO),
+        )
+    return ids
+
+
+def renovar(trabajo_id, trabajador):
+    """Extend a running job's lease; False once it is no longer ours"""
+    return Trabajo.objects.filter(id=trabajo_id, estado='en_curso', trabajador=trabajador).update(
+        vence=timezone.now() + timedelta(seconds=settings.TRABAJOS_TIEMPO_MAXIMO),
+    ) == 1
+
+
+def _latido(trabajo_id, trabajador, detener):
+    """
+    Heartbeat of a running job: renews its lease every third of
+    TRABAJOS_TIEMPO_MAXIMO, so however long the task runs only a dead
+    worker's job expires and is claimed again
+    """
+    try:
+        while not detener.wait(settings.TRABAJOS_TIEMPO_MAXIMO / 3):
+            if not renovar(trabajo_id, trabajador):
+                break
+    finally:
+        connections.close_all()
+
+
+def liberar_vencidos():
+    """
+    Jobs whose worker died (lease expired) go back to 'pendiente', or to
+    'fallido' once out of attempts
+    Returns the number of jobs released
+    """
+    vencidos = Trabajo.objects.filter(estado='en_curso', vence__lt=timezone.now())
+    agotados = vencidos.filter(intentos__gte=F('max_intentos')).update(
+        estado='fallido', error='El trabajador no respondió', fecha_fin=timezone.now(),
+    )
+    return agotados + vencidos.update(estado='pendiente', trabajador='', vence=None)
+
+
+def ejecutar(trabajo_id):
+    """
+    Run a claimed job, renewing its lease meanwhile, and record the
+    outcome; a failure is retried with exponential backoff until max_intentos
+    Returns the new estado
+    """
+    trabajo = Trabajo.objects.get(id=trabajo_id)
+    detener = threading.Event()
+    latido = threading.Thread(target=_latido, args=(trabajo.id, trabajo.trabajador, detener), daemon=True)
+    latido.start()
+    try:
+        funcion = tareas()[trabajo.tarea][0]
+        resultado = funcion(**trabajo.parametros)
+    except Exception:
+        if trabajo.intentos < trabajo.max_intentos:
+            espera = settings.TRABAJOS_REINTENTO * 2 ** (trabajo.intentos - 1)
+            cambios = {'estado': 'pendiente', 'ejecutar_desde': timezone.now() + timedelta(seconds=espera)}
+        else:
+            cambios = {'estado': 'fallido', 'fecha_fin': timezone.now()}
+        cambios['error'] = traceback.format_exc(limit=20)
+    else:
+        cambios = {'estado': 'completado', 'resultado': resultado, 'error': '', 'fecha_fin': timezone.now()}
+    finally:
+        detener.set()
+        latido.join()
+    # Only while still ours: an expired lease may have been re-claimed
+    Trabajo.objects.filter(id=trabajo_id, estado='en_curso', trabajador=trabajo.trabajador).update(
+        vence=None, **cambios,
+    )
+    return cambios['estado']
+
+
+def _ejecutar_en_pool(trabajo_id):
+    """
+    Pool entry point: each thread or process uses its own DB connection,
+    and errors outside the task (e.g. the database going away) never stop
+    the worker loop; the job's lease expiry puts it back in the queue
+    """
+    close_old_connections()
+    try:
+        return trabajo_id, ejecutar(trabajo_id)
+    except Exception:
+        return trabajo_id, 'error'
+    finally:
+        connections.close_all()
+
+
+def procesar(segundos, trabajador=None):
+    """
+    Run due jobs one after another for about `segundos`, for hosts without
+    a long-running worker (the cron route)
+    Only `breve` tasks are claimed: a job started near the deadline must
+    still end before the host stops the call; the others wait for the
+    trabajador command
+    Returns the number of jobs run
+    """
+    trabajador = trabajador or nombre_trabajador()
+    liberar_vencidos()
+    breves = tareas_breves()
+    limite = time.monotonic() + segundos
+    ejecutados = 0
+    while time.monotonic() < limite:
+        ids = reclamar(1, trabajador, breves)
+        if not ids:
+            break
+        ejecutar(ids[0])
+        ejecutados += 1
+    return ejecutados
+
+
+def trabajar(hilos=None, procesos=False, intervalo=None, una_vez=False, detener=None, progreso=None):
+    """
+    Worker loop: claim due jobs while the pool has free slots and run them
+    in `hilos` threads, or processes with `procesos`
+    With `una_vez` it returns once the queue is empty; otherwise until the
+    `detener` event is set
+    """
+    hilos = hilos or settings.TRABAJOS_HILOS
+    intervalo = settings.TRABAJOS_INTERVALO if intervalo is None else intervalo
+    detener = detener or threading.Event()
+    trabajador = nombre_trabajador()
+    if procesos:
+        # Forked processes must not share the parent's connection; spawned
+        # ones start without Django loaded
+        connections.close_all()
+        pool = ProcessPoolExecutor(max_workers=hilos, initializer=django.setup)
+    else:
+        pool = ThreadPoolExecutor(max_workers=hilos)
+    ultima_limpieza = float('-inf')
+    with pool:
+        en_curso = set()
+        while not detener.is_set():
+            if time.monotonic() - ultima_limpieza > settings.TRABAJOS_TIEMPO_MAXIMO / 10:
+                liberar_vencidos()
+                ultima_limpieza = time.monotonic()
+            for futuro in [f for f in en_curso if f.done()]:
+                en_curso.discard(futuro)
+                if progreso:
+                    progreso(*futuro.result())
+            ids = reclamar(hilos - len(en_curso), trabajador) if len(en_curso) < hilos else []
+            en_curso.update(pool.submit(_ejecutar_en_pool, trabajo_id) for trabajo_id in ids)
+            if una_vez and not ids and not en_curso:
+                break
+            if not ids:
+                detener.wait(intervalo)
+
+
+def como_json(trabajo):
+    """Status payload of a job for the jobs API"""
+    return {
+        'id': trabajo.id,
+        'tarea': trabajo.tarea,
+        'estado': trabajo.estado,
+        'intentos': trabajo.intentos,
+        'max_intentos': trabajo.max_intentos,
+        'fecha_creacion': trabajo.fecha_creacion,
+        'fecha_inicio': trabajo.fecha_inicio,
+        'fecha_fin': trabajo.fecha_fin,
+        'resultado': trabajo.resultado,
+        # Last line of the traceback: the exception, without server paths
+        'error': trabajo.error.strip().splitlines()[-1] if trabajo.error else '',
+    }
@@ -18,6 +18,7 @@ urlpatterns = [
     # Patient Registration (RF-03)
     path('registrar/', views.registrar_paciente_view, name='registrar_paciente'),
     path('registrar/cancelar/', views.cancelar_registro, name='cancelar_registro'),
+    path('api/registros/sincronizar/', views.api_sincronizar_registros, name='api_sincronizar_registros'),
     
     # Patient Care (RF-04)
     path('atencion/<int:triaje_id>/', views.atencion_view, name='atencion'),
@@ -26,10 +27,20 @@ urlpatterns = [
     # Patient History (RF-05)
     path('historial/', views.historial_view, name='historial'),
     path('paciente/<int:triaje_id>/', views.detalle_paciente_view, name='detalle_paciente'),
+    path('api/paciente/<int:paciente_id>/signos/', views.api_signos_paciente, name='api_signos_paciente'),
     
     # Reports (RF-06)
     path('reportes/', views.reportes_view, name='reportes'),
     path('api/reportes/', views.api_reportes_data, name='api_reportes'),
+    path('api/reportes/cubo/', views.api_reportes_cubo, name='api_reportes_cubo'),
+    path('api/reportes/pronostico/', views.api_reportes_pronostico, name='api_reportes_pronostico'),
+    path('cron/pronostico/', views.cron_pronostico, name='cron_pronostico'),
+    path('cron/instantaneas/', views.cron_instantaneas, name='cron_instantaneas'),
+    
+    # Background jobs
+    path('api/trabajos/', views.api_trabajos, name='api_trabajos'),
+    path('api/trabajos/<int:trabajo_id>/', views.api_trabajo, name='api_trabajo'),
+    path('cron/trabajos/', views.cron_trabajos, name='cron_trabajos'),
     
     # User Management (RF-07 - Admin only)
     path('usuarios/', views.gestion_usuarios_view, name='gestion_usuarios'),
@@ -3,26 +3,49 @@ Views for Clinical Triage System
 Vistas para todos los módulos del sistema
 """
 
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse, HttpResponseRedirect
+from django.http import Http404, JsonResponse, HttpResponse, HttpResponseRedirect
 from django.urls import reverse
-from django.db.models import Count, Q, Avg
-from django.db.models.functions import TruncDate
+from django.db import IntegrityError, NotSupportedError, transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.core.paginator import Paginator
-from datetime import timedelta
+from django.utils.functional import SimpleLazyObject
+import hmac
 import json
+import uuid
 
-from .models import Usuario, Paciente, Triaje, Atencion, RegistroAuditoria
+from .models import (
+    Usuario, Paciente, Triaje, TriajeArchivado, Atencion, AtencionArchivada, NotaClinica, Trabajo,
+)
 from .forms import (
     LoginForm, PacienteForm, TriajeAntecedentesForm, 
     TriajeSignosVitalesForm, TriajeDiagnosticoForm, 
     AtencionForm, BusquedaPacienteForm
 )
-from .decorators import role_required, registrar_auditoria
+from .decorators import role_required, registrar_auditoria, get_client_ip
+from .queue import cola_en_espera, conteo_por_prioridad, get_queue_version
+from .ratelimit import login_bloqueado, registrar_intento_fallido, limpiar_intentos
+from .reports import MotorReportes, rango_fechas
+from .cube import Cubo, DIMENSIONES, CUBO_LIMITE_FILAS
+from .estimacion import estimar_esperas
+from .tendencias import serie_signos
+from .demanda import get_pronostico, actualizar_pronostico, filas_mapa_calor
+from .duplicados import candidatos_duplicado
+from .archivo import buscar_triaje, con_archivo, historial_combinado
+from .trabajos import como_json, encolar, procesar, tareas
+from .instantaneas import generar_instantaneas, rangos_estandar
+from .sincronizacion import sincronizar
+
+
+# Cached queue fragments expire after a minute so "Tiempo Espera" stays current;
+# not cached at all when instances do not share the cache, since a triage
+# created on one instance would not invalidate the others' copies
+QUEUE_FRAGMENT_TIMEOUT = 60 if settings.CACHE_COMPARTIDA else 0
 
 
 # ============================================================
@@ -37,36 +60,28 @@ def login_view(request):
     if request.method == 'POST':
         form = LoginForm(request, data=request.POST)
         username = request.POST.get('username', '')
+        ip_address = get_client_ip(request)
         
-        try:
-            user = Usuario.objects.get(username=username)
-            
-            # Check if account is locked
-            if user.bloqueado_hasta and user.bloqueado_hasta > timezone.now():
-                messages.error(request, 'Cuenta bloqueada temporalmente. Intente más tarde.')
-                return render(request, 'login.html', {'form': form})
+        # Locked usernames/IPs are rejected with one query, before the
+        # password is hashed (core/ratelimit.py)
+        if login_bloqueado(username, ip_address):
+            messages.error(request, 'Cuenta bloqueada temporalmente. Intente más tarde.')
+            return render(request, 'login.html', {'form': form})
+        
+        if form.is_valid():
+            user = form.get_user()
+            limpiar_intentos(username)
             
-            if form.is_valid():
-                # Reset failed attempts on successful login
-                user.intentos_fallidos = 0
-                user.bloqueado_hasta = None
-                user.save()
-                
-                login(request, user)
-                registrar_auditoria(request, user, 'login', 'Inicio de sesión exitoso')
-                return redirect('dashboard')
-            else:
-                # Increment failed attempts
-                user.intentos_fallidos += 1
-                if user.intentos_fallidos >= 3:
-                    user.bloqueado_hasta = timezone.now() + timedelta(minutes=15)
-                    messages.error(request, 'Cuenta bloqueada por 15 minutos debido a múltiples intentos fallidos.')
-                else:
-                    remaining = 3 - user.intentos_fallidos
-                    messages.error(request, f'Credenciales inválidas. Intentos restantes: {remaining}')
-                user.save()
-        except Usuario.DoesNotExist:
-            messages.error(request, 'Usuario no existe.')
+            login(request, user)
+            registrar_auditoria(request, user, 'login', 'Inicio de sesión exitoso')
+            return redirect('dashboard')
+        
+        remaining = registrar_intento_fallido(username, ip_address)
+        if remaining == 0:
+            minutos = settings.LOGIN_BLOQUEO_MINUTOS
+            messages.error(request, f'Cuenta bloqueada por {minutos} minutos debido a múltiples intentos fallidos.')
+        else:
+            messages.error(request, f'Credenciales inválidas. Intentos restantes: {remaining}')
     else:
         form = LoginForm()
     
@@ -89,18 +104,10 @@ def logout_view(request):
 @login_required
 def dashboard_view(request):
     """Main dashboard with triage queue and statistics"""
-    # Get patients in queue ordered by priority
-    triajes_en_espera = Triaje.objects.filter(
-        estado='en_espera'
-    ).select_related('paciente').order_by(
-        # Custom ordering: alta=0, media=1, baja=2
-        'nivel_prioridad',
-        'fecha_hora_consulta'
-    )
-    
-    # Reorder by priority properly
-    priority_order = {'alta': 0, 'media': 1, 'baja': 2}
-    triajes_en_espera = sorted(triajes_en_espera, key=lambda x: (priority_order.get(x.nivel_prioridad, 3), x.fecha_hora_consulta))
+    # Queue table and priority counters are rendered inside a cached fragment
+    # keyed by queue version; these lazy objects only hit the DB on a miss
+    triajes_en_espera = cola_en_espera()
+    conteo = SimpleLazyObject(conteo_por_prioridad)
     
     # Statistics
     hoy = timezone.now().date()
@@ -115,21 +122,19 @@ def dashboard_view(request):
         ).count()
     
     stats = {
-        'total_espera': len(triajes_en_espera),
-        'prioridad_alta': sum(1 for t in triajes_en_espera if t.nivel_prioridad == 'alta'),
-        'prioridad_media': sum(1 for t in triajes_en_espera if t.nivel_prioridad == 'media'),
-        'prioridad_baja': sum(1 for t in triajes_en_espera if t.nivel_prioridad == 'baja'),
         'atendidos_hoy': atendidos_hoy,
-        'total_pacientes': Paciente.objects.count(),
     }
     
     # En atención actualmente
-    en_atencion = Triaje.objects.filter(estado='en_atencion').select_related('paciente')
+    en_atencion = Triaje.objects.filter(estado='en_atencion').listado()
     
     context = {
         'triajes': triajes_en_espera,
         'en_atencion': en_atencion,
+        'conteo': conteo,
         'stats': stats,
+        'queue_version': get_queue_version(),
+        'queue_cache_timeout': QUEUE_FRAGMENT_TIMEOUT,
         'page_title': 'Panel Principal - Triaje'
     }
     
@@ -139,19 +144,20 @@ def dashboard_view(request):
 @login_required
 def api_queue_update(request):
     """API endpoint for real-time queue updates"""
-    triajes = Triaje.objects.filter(estado='en_espera').select_related('paciente')
-    priority_order = {'alta': 0, 'media': 1, 'baja': 2}
-    triajes = sorted(triajes, key=lambda x: (priority_order.get(x.nivel_prioridad, 3), x.fecha_hora_consulta))
+    triajes = list(cola_en_espera())
+    esperas = estimar_esperas(triajes)
     
     data = [{
         'id': t.id,
-        'paciente': t.paciente.nombre_completo,
-        'ci': t.paciente.ci,
+        'paciente': t.paciente_nombre,
+        'ci': t.paciente_ci,
         'prioridad': t.nivel_prioridad,
         'prioridad_display': t.get_nivel_prioridad_display(),
         'prioridad_color': t.prioridad_color,
+        'puntaje_alerta': t.puntaje_alerta,
         'hora_ingreso': t.fecha_hora_consulta.strftime('%H:%M'),
         'tiempo_espera': t.tiempo_espera,
+        'espera_estimada_minutos': esperas[t.id],
         'especialidad': t.get_especialidad_display(),
     } for t in triajes]
     
@@ -177,8 +183,18 @@ def registrar_paciente_view(request):
         if step == 1:
             form = PacienteForm(request.POST)
             if form.is_valid():
+                datos = form.cleaned_data
+                # Warn about look-alike records (typo in CI, name or birth date)
+                parecidos = candidatos_duplicado(
+                    datos['nombre_completo'], datos['fecha_nacimiento'], datos['ci'], datos['sexo'],
+                )
+                if parecidos:
+                    listado = '; '.join(f'{p.nombre_completo} (CI: {p.ci})' for p, _ in parecidos[:3])
+                    messages.warning(request, f'Posible paciente ya registrado: {listado}. Verifique los datos antes de continuar.')
                 session_data['paciente'] = form.cleaned_data
                 session_data['paciente']['fecha_nacimiento'] = str(form.cleaned_data['fecha_nacimiento'])
+                # Identifies this registration when it is sent (or re-sent)
+                session_data.setdefault('uuid', str(uuid.uuid4()))
                 request.session['registro_paciente'] = session_data
                 return HttpResponseRedirect(reverse('registrar_paciente') + '?step=2')
         
@@ -206,44 +222,62 @@ def registrar_paciente_view(request):
                 
                 # Create patient and triage records
                 try:
-                    # Create or get patient
-                    paciente_data = session_data['paciente']
+                    # A copy: the session keeps the JSON-friendly string date
+                    # if this attempt fails and the form is sent again
+                    paciente_data = dict(session_data['paciente'])
                     from datetime import datetime
                     paciente_data['fecha_nacimiento'] = datetime.strptime(
                         paciente_data['fecha_nacimiento'], '%Y-%m-%d'
                     ).date()
                     
-                    paciente, created = Paciente.objects.get_or_create(
-                        ci=paciente_data['ci'],
-                        defaults=paciente_data
-                    )
+                    # Already stored (form sent twice or synced from the
+                    # station's offline queue)
+                    existente = session_data.get('uuid') and Triaje.objects.filter(
+                        uuid_cliente=session_data['uuid'],
+                    ).first()
+                    if existente:
+                        del request.session['registro_paciente']
+                        messages.info(request, f'El registro de {existente.paciente_nombre} ya estaba guardado.')
+                        return redirect('dashboard')
                     
-                    if not created:
-                        # Update existing patient type
-                        paciente.tipo_paciente = 'antiguo'
-                        paciente.save()
+                    # Patient, triage and note are stored together or not at all
+                    with transaction.atomic():
+                        # A returning patient becomes 'antiguo' in the visit
+                        # counter UPDATE run when the triage is created
+                        paciente, created = Paciente.objects.get_or_create(
+                            ci=paciente_data['ci'],
+                            defaults=paciente_data
+                        )
                     
-                    # Create triage record
-                    triaje = Triaje.objects.create(
-                        paciente=paciente,
-                        especialidad=session_data['antecedentes']['especialidad'],
-                        medico=session_data['antecedentes']['medico'],
-                        enfermeria=session_data['antecedentes']['enfermeria'],
-                        tipo_servicio=session_data['antecedentes']['tipo_servicio'],
-                        talla=session_data['signos_vitales']['talla'],
-                        peso=session_data['signos_vitales']['peso'],
-                        temperatura=session_data['signos_vitales']['temperatura'],
-                        presion_arterial=session_data['signos_vitales']['presion_arterial'],
-                        pulsacion=session_data['signos_vitales']['pulsacion'],
-                        nivel_prioridad=session_data['signos_vitales']['nivel_prioridad'],
-                        sintomatologia=form.cleaned_data.get('sintomatologia'),
-                        tratamiento=form.cleaned_data.get('tratamiento'),
-                        estudios_complementarios=form.cleaned_data.get('estudios_complementarios'),
-                    )
+                        # Create triage record
+                        triaje = Triaje.objects.create(
+                            paciente=paciente,
+                            especialidad=session_data['antecedentes']['especialidad'],
+                            medico=session_data['antecedentes']['medico'],
+                            enfermeria=session_data['antecedentes']['enfermeria'],
+                            tipo_servicio=session_data['antecedentes']['tipo_servicio'],
+                            talla=session_data['signos_vitales']['talla'],
+                            peso=session_data['signos_vitales']['peso'],
+                            temperatura=session_data['signos_vitales']['temperatura'],
+                            presion_arterial=session_data['signos_vitales']['presion_arterial'],
+                            pulsacion=session_data['signos_vitales']['pulsacion'],
+                            nivel_prioridad=session_data['signos_vitales']['nivel_prioridad'],
+                            uuid_cliente=session_data.get('uuid'),
+                        )
+                    
+                        # Diagnosis text goes to the notes table, only when given
+                        notas = {
+                            campo: form.cleaned_data.get(campo)
+                            for campo in ('sintomatologia', 'tratamiento', 'estudios_complementarios')
+                        }
+                        if any(notas.values()):
+                            NotaClinica.objects.create(triaje=triaje, **notas)
                     
                     # Clear session data
                     del request.session['registro_paciente']
                     
+                    # Outside the transaction: a failed audit insert is
+                    # swallowed and must not abort the registration
                     registrar_auditoria(request, request.user, 'crear_triaje', 
                                        f'Triaje creado para {paciente.nombre_completo}')
                     
@@ -277,12 +311,41 @@ def registrar_paciente_view(request):
         'step': step,
         'step_title': step_titles.get(step, ''),
         'total_steps': 4,
+        # Steps 1-3 for the last step's offline queue (static/js/main.js)
+        'borrador': session_data if step == 4 else None,
         'page_title': 'Registrar Paciente'
     }
     
     return render(request, 'registrar.html', context)
 
 
+@login_required
+@role_required(['admin', 'farmacia', 'enfermeria', 'doctor'])
+def api_sincronizar_registros(request):
+    """
+    POST {"registros": [{"uuid", "registrado", "paciente", "antecedentes",
+    "signos_vitales", "diagnostico"}]} from the station's offline queue
+    (static/js/main.js); answers one result per record, in order
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    
+    try:
+        registros = json.loads(request.body or b'{}').get('registros')
+        resultados = sincronizar(registros, request.user, get_client_ip(request))
+    except (ValueError, AttributeError) as e:
+        return JsonResponse({'error': str(e) or 'JSON inválido'}, status=400)
+    except IntegrityError:
+        return JsonResponse({'error': 'Otro registro del mismo paciente se guardó a la vez; reintente'}, status=409)
+    
+    # The wizard's pending registration was among those sent
+    borrador = request.session.get('registro_paciente', {})
+    if borrador.get('uuid') and any(r['uuid'] == borrador['uuid'] and r['estado'] != 'error' for r in resultados):
+        del request.session['registro_paciente']
+        messages.success(request, f"Paciente {borrador['paciente']['nombre_completo']} registrado exitosamente.")
+    return JsonResponse({'resultados': resultados})
+
+
 @login_required
 def cancelar_registro(request):
     """Cancel patient registration and clear session"""
@@ -322,10 +385,13 @@ def atencion_view(request, triaje_id):
     else:
         atencion = triaje.atencion
     
+    nota = getattr(triaje, 'nota', None) or NotaClinica(triaje=triaje)
+    
     if request.method == 'POST':
-        form = AtencionForm(request.POST, instance=atencion)
+        form = AtencionForm(request.POST, instance=nota)
         if form.is_valid():
-            atencion = form.save(commit=False)
+            if form.has_changed():
+                form.save()
             atencion.fecha_fin = timezone.now()
             atencion.save()
             
@@ -339,12 +405,13 @@ def atencion_view(request, triaje_id):
             messages.success(request, f'Atención de {triaje.paciente.nombre_completo} finalizada correctamente.')
             return redirect('dashboard')
     else:
-        form = AtencionForm(instance=atencion)
+        form = AtencionForm(instance=nota)
     
     context = {
         'triaje': triaje,
         'paciente': triaje.paciente,
         'atencion': atencion,
+        'nota': nota,
         'form': form,
         'page_title': f'Atención - {triaje.paciente.nombre_completo}'
     }
@@ -373,37 +440,46 @@ def historial_view(request):
     """View patient history with filters and search"""
     form = BusquedaPacienteForm(request.GET)
     
-    # Base query - filter by role
-    if request.user.rol == 'admin':
-        # Admin sees all triage records
-        triajes = Triaje.objects.select_related('paciente').order_by('-fecha_hora_consulta')
-    else:
-        # Personal común only sees patients they attended
-        triajes = Triaje.objects.filter(
-            atencion__usuario=request.user
-        ).select_related('paciente').order_by('-fecha_hora_consulta')
-    
-    # Apply filters
-    if form.is_valid():
-        busqueda = form.cleaned_data.get('busqueda')
-        estado = form.cleaned_data.get('estado')
-        fecha_desde = form.cleaned_data.get('fecha_desde')
-        fecha_hasta = form.cleaned_data.get('fecha_hasta')
-        
-        if busqueda:
-            triajes = triajes.filter(
-                Q(paciente__nombre_completo__icontains=busqueda) |
-                Q(paciente__ci__icontains=busqueda)
-            )
-        
-        if estado:
-            triajes = triajes.filter(estado=estado)
+    def filtrar(triajes):
+        # Base query - filter by role
+        if request.user.rol != 'admin':
+            # Personal común only sees patients they attended
+            triajes = triajes.filter(atencion__usuario=request.user)
+        triajes = triajes.listado()
         
-        if fecha_desde:
-            triajes = triajes.filter(fecha_hora_consulta__date__gte=fecha_desde)
-        
-        if fecha_hasta:
-            triajes = triajes.filter(fecha_hora_consulta__date__lte=fecha_hasta)
+        # Apply filters
+        if form.is_valid():
+            busqueda = form.cleaned_data.get('busqueda')
+            estado = form.cleaned_data.get('estado')
+            fecha_desde = form.cleaned_data.get('fecha_desde')
+            fecha_hasta = form.cleaned_data.get('fecha_hasta')
+            presion = form.cleaned_data.get('presion')
+            
+            if busqueda:
+                triajes = triajes.filter(
+                    Q(paciente_nombre__icontains=busqueda) |
+                    Q(paciente_ci__icontains=busqueda)
+                )
+            
+            if estado:
+                triajes = triajes.filter(estado=estado)
+            
+            if fecha_desde:
+                triajes = triajes.filter(fecha_hora_consulta__date__gte=fecha_desde)
+            
+            if fecha_hasta:
+                triajes = triajes.filter(fecha_hora_consulta__date__lte=fecha_hasta)
+            
+            if presion:
+                triajes = triajes.con_presion(presion)
+        return triajes
+    
+    # Same filters on the live and archived triages; the archive is only
+    # queried when the date range reaches it
+    fecha_desde = form.cleaned_data.get('fecha_desde') if form.is_valid() else None
+    triajes = historial_combinado(
+        filtrar(Triaje.objects.all()), filtrar(TriajeArchivado.objects.all()), fecha_desde,
+    ).order_by('-fecha_hora_consulta')
     
     registrar_auditoria(request, request.user, 'ver_historial', 'Consulta de historial')
     
@@ -424,8 +500,12 @@ def historial_view(request):
 @login_required
 def detalle_paciente_view(request, triaje_id):
     """View detailed patient record"""
-    triaje = get_object_or_404(Triaje.objects.select_related('paciente'), id=triaje_id)
+    # Archived triages keep their id, so old links still resolve
+    triaje = buscar_triaje(triaje_id, 'paciente', 'nota', 'atencion')
+    if triaje is None:
+        raise Http404('Triaje no encontrado')
     atencion = getattr(triaje, 'atencion', None)
+    nota = getattr(triaje, 'nota', None)
     
     # Check access for personal común - only if they attended this patient
     if request.user.rol != 'admin':
@@ -433,13 +513,18 @@ def detalle_paciente_view(request, triaje_id):
             messages.error(request, 'No tiene permiso para ver este paciente.')
             return redirect('historial')
     
-    # Get patient history (all triages)
-    historial = Triaje.objects.filter(paciente=triaje.paciente).order_by('-fecha_hora_consulta')
+    # Get patient history (all triages, live and archived)
+    columnas = ['fecha_hora_consulta', 'especialidad', 'nivel_prioridad', 'estado']
+    historial = con_archivo(
+        Triaje.objects.filter(paciente=triaje.paciente).only(*columnas),
+        TriajeArchivado.objects.filter(paciente=triaje.paciente).only(*columnas),
+    ).order_by('-fecha_hora_consulta')
     
     context = {
         'triaje': triaje,
         'paciente': triaje.paciente,
         'atencion': atencion,
+        'nota': nota,
         'historial': historial,
         'page_title': f'Detalle - {triaje.paciente.nombre_completo}'
     }
@@ -447,95 +532,79 @@ def detalle_paciente_view(request, triaje_id):
     return render(request, 'detalle_paciente.html', context)
 
 
+@login_required
+def api_signos_paciente(request, paciente_id):
+    """Vital-sign trend of a patient as columnar arrays (for charts)"""
+    paciente = get_object_or_404(Paciente, id=paciente_id)
+    
+    # Same access rule as the patient detail: personal común only sees
+    # patients they attended
+    if request.user.rol != 'admin':
+        atendio = (
+            Atencion.objects.filter(triaje__paciente=paciente, usuario=request.user).exists()
+            or AtencionArchivada.objects.filter(triaje__paciente=paciente, usuario=request.user).exists()
+        )
+        if not atendio:
+            return JsonResponse({'error': 'No tiene permiso para ver este paciente.'}, status=403)
+    
+    return JsonResponse(serie_signos(paciente.id))
+
+
 # ============================================================
 # RF-06: Reports Module
 # ============================================================
 
+# Labels of the precomputed ranges (core/instantaneas.py)
+RANGOS_REPORTE = {
+    'ultimos_7': 'Últimos 7 días',
+    'ultimos_30': 'Últimos 30 días',
+    'ultimos_90': 'Últimos 90 días',
+    'mes': 'Este mes',
+    'mes_anterior': 'Mes anterior',
+    'anio': 'Este año',
+}
+
+
 @login_required
 @role_required(['admin'])
 def reportes_view(request):
     """Reports dashboard with statistics and charts"""
-    # Date range filter
-    fecha_desde = request.GET.get('fecha_desde')
-    fecha_hasta = request.GET.get('fecha_hasta')
-    
-    # Default to last 30 days
-    if not fecha_hasta:
-        fecha_hasta = timezone.now().date()
-    else:
-        from datetime import datetime
-        fecha_hasta = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
-    
-    if not fecha_desde:
-        fecha_desde = fecha_hasta - timedelta(days=30)
-    else:
-        from datetime import datetime
-        fecha_desde = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
+    # Date range filter (defaults to last 30 days)
+    fecha_desde, fecha_hasta = rango_fechas(request.GET)
     
-    # Filter triajes by date range
-    triajes = Triaje.objects.filter(
-        fecha_hora_consulta__date__gte=fecha_desde,
-        fecha_hora_consulta__date__lte=fecha_hasta
-    )
-    
-    # Statistics
-    stats = {
-        'total_atendidos': triajes.filter(estado='atendido').count(),
-        'total_registrados': triajes.count(),
-    }
-    
-    # Priority distribution
-    prioridad_stats = triajes.values('nivel_prioridad').annotate(
-        total=Count('id')
-    ).order_by('nivel_prioridad')
-    
-    # Specialty distribution
-    especialidad_stats = triajes.values('especialidad').annotate(
-        total=Count('id')
-    ).order_by('-total')[:10]
-    
-    # Daily trend
-    tendencia_diaria = triajes.annotate(
-        fecha=TruncDate('fecha_hora_consulta')
-    ).values('fecha').annotate(
-        total=Count('id')
-    ).order_by('fecha')
-    
-    # Average attention time
-    atenciones_finalizadas = Atencion.objects.filter(
-        fecha_fin__isnull=False,
-        triaje__fecha_hora_consulta__date__gte=fecha_desde,
-        triaje__fecha_hora_consulta__date__lte=fecha_hasta
-    )
-    
-    # Statistics per user (for admin)
-    usuarios_stats = atenciones_finalizadas.values(
-        'usuario__id', 'usuario__nombre_completo'
-    ).annotate(
-        total_atendidos=Count('id')
-    ).order_by('-total_atendidos')
-    
-    # Calculate average attention time per user
-    for user_stat in usuarios_stats:
-        user_atenciones = atenciones_finalizadas.filter(usuario__id=user_stat['usuario__id'])
-        total_minutes = 0
-        count = 0
-        for atencion in user_atenciones:
-            if atencion.fecha_fin and atencion.fecha_inicio:
-                delta = atencion.fecha_fin - atencion.fecha_inicio
-                total_minutes += delta.seconds // 60
-                count += 1
-        user_stat['promedio_minutos'] = round(total_minutes / count) if count > 0 else 0
+    motor = MotorReportes(fecha_desde, fecha_hasta)
+    datos = motor.calcular()
     
     registrar_auditoria(request, request.user, 'generar_reporte', 
                        f'Reporte generado: {fecha_desde} a {fecha_hasta}')
     
+    pronostico = get_pronostico()
+    
+    prioridad_stats = [
+        {'nivel_prioridad': prioridad, 'total': total}
+        for prioridad, total in datos['prioridad'].items() if total
+    ]
+    
     context = {
-        'stats': stats,
-        'prioridad_stats': list(prioridad_stats),
-        'especialidad_stats': list(especialidad_stats),
-        'tendencia_diaria': list(tendencia_diaria),
-        'usuarios_stats': list(usuarios_stats),
+        'stats': datos['stats'],
+        'prioridad_stats': prioridad_stats,
+        'especialidad_stats': datos['especialidad_stats'],
+        'tendencia_diaria': datos['tendencia_diaria'],
+        'usuarios_stats': datos['usuarios_stats'],
+        'edad_especialidad': datos['edad_especialidad'],
+        'espera': datos['espera'],
+        'presion_stats': datos['presion_stats'],
+        # Heatmap/forecast are computed in the background (calcular_pronostico)
+        'pronostico': pronostico,
+        'mapa_calor': filas_mapa_calor(pronostico['mapa_calor']['total']) if pronostico else None,
+        # Chart data is embedded in the page instead of fetched from the API
+        'graficos': motor.datos_graficos(datos),
+        # Set when the range was served from a nightly snapshot
+        'instantanea': datos.get('instantanea'),
+        'rangos': [
+            {'nombre': RANGOS_REPORTE[nombre], 'fecha_desde': desde, 'fecha_hasta': hasta}
+            for nombre, (desde, hasta) in rangos_estandar().items()
+        ],
         'fecha_desde': fecha_desde,
         'fecha_hasta': fecha_hasta,
         'page_title': 'Reportes y Estadísticas'
@@ -547,53 +616,129 @@ def reportes_view(request):
 @login_required
 def api_reportes_data(request):
     """API endpoint for reports data (for charts)"""
-    fecha_desde = request.GET.get('fecha_desde')
-    fecha_hasta = request.GET.get('fecha_hasta')
+    fecha_desde, fecha_hasta = rango_fechas(request.GET)
     
-    if not fecha_hasta:
-        fecha_hasta = timezone.now().date()
-    else:
-        from datetime import datetime
-        fecha_hasta = datetime.strptime(fecha_hasta, '%Y-%m-%d').date()
+    motor = MotorReportes(fecha_desde, fecha_hasta)
+    datos = motor.calcular()
     
-    if not fecha_desde:
-        fecha_desde = fecha_hasta - timedelta(days=30)
-    else:
-        from datetime import datetime
-        fecha_desde = datetime.strptime(fecha_desde, '%Y-%m-%d').date()
-    
-    triajes = Triaje.objects.filter(
-        fecha_hora_consulta__date__gte=fecha_desde,
-        fecha_hora_consulta__date__lte=fecha_hasta
-    )
-    
-    # Priority data for pie chart
-    prioridad_data = {
-        'labels': ['Alta', 'Media', 'Baja'],
-        'data': [
-            triajes.filter(nivel_prioridad='alta').count(),
-            triajes.filter(nivel_prioridad='media').count(),
-            triajes.filter(nivel_prioridad='baja').count(),
-        ],
-        'colors': ['#DC3545', '#FFC107', '#28A745']
-    }
+    return JsonResponse({**motor.datos_graficos(datos), 'espera': datos['espera']})
+
+
+@login_required
+@role_required(['admin'])
+def api_reportes_cubo(request):
+    """
+    Ad-hoc report cube (admin only)
+    ?dimensiones=especialidad,hora&medidas=total,espera_p90&nivel_prioridad=alta
+    """
+    fecha_desde, fecha_hasta = rango_fechas(request.GET)
+    dimensiones = [d for d in request.GET.get('dimensiones', '').split(',') if d]
+    medidas = [m for m in request.GET.get('medidas', 'total').split(',') if m]
+    filtros = {k: v for k, v in request.GET.items() if k in DIMENSIONES}
+    
+    try:
+        cubo = Cubo(fecha_desde, fecha_hasta, dimensiones, medidas, filtros,
+                    limite=int(request.GET.get('limite', CUBO_LIMITE_FILAS)))
+        resultado = cubo.ejecutar()
+    except (ValueError, NotSupportedError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    return JsonResponse(resultado)
+
+
+@login_required
+@role_required(['admin'])
+def api_reportes_pronostico(request):
+    """Arrival heatmaps and 7-day staffing forecast (last background run)"""
+    pronostico = get_pronostico()
+    if pronostico is None:
+        return JsonResponse({'error': 'El pronóstico aún no fue calculado'}, status=503)
+    
+    return JsonResponse(pronostico)
+
+
+def cron_autorizado(request):
+    """Scheduled calls carry 'Authorization: Bearer <settings.CRON_SECRET>'"""
+    esperado = f'Bearer {settings.CRON_SECRET}'
+    recibido = request.headers.get('Authorization', '')
+    return bool(settings.CRON_SECRET) and hmac.compare_digest(recibido, esperado)
+
+
+def cron_pronostico(request):
+    """Scheduled forecast refresh, authorized with settings.CRON_SECRET"""
+    if not cron_autorizado(request):
+        return JsonResponse({'error': 'No autorizado'}, status=401)
     
-    # Daily trend for line chart
-    tendencia = triajes.annotate(
-        fecha=TruncDate('fecha_hora_consulta')
-    ).values('fecha').annotate(
-        total=Count('id')
-    ).order_by('fecha')
+    resultado = actualizar_pronostico()
+    return JsonResponse({'generado': resultado['generado']})
+
+
+def cron_instantaneas(request):
+    """Scheduled report snapshots, authorized with settings.CRON_SECRET"""
+    if not cron_autorizado(request):
+        return JsonResponse({'error': 'No autorizado'}, status=401)
     
-    tendencia_data = {
-        'labels': [str(t['fecha']) for t in tendencia],
-        'data': [t['total'] for t in tendencia]
-    }
+    return JsonResponse({'instantaneas': generar_instantaneas()})
+
+
+# ============================================================
+# Background jobs (core/trabajos.py)
+# ============================================================
+
+# Seconds of queued work a cron call runs, below the serverless timeout
+CRON_TRABAJOS_SEGUNDOS = 50
+
+
+@login_required
+@role_required(['admin'])
+def api_trabajos(request):
+    """
+    POST {"tarea": "generar_instantaneas", "parametros": {...}} queues a
+    job and answers 202 with its status URL; GET lists the latest jobs
+    Serverless hosts only run `breve` tasks (cron route), so only those
+    are queued there
+    """
+    if request.method != 'POST':
+        trabajos = Trabajo.objects.order_by('-fecha_creacion')[:20]
+        return JsonResponse({'trabajos': [como_json(t) for t in trabajos]})
+    
+    try:
+        datos = json.loads(request.body or b'{}')
+        nombre = datos.get('tarea', '')
+        parametros = datos.get('parametros') or {}
+    except (ValueError, AttributeError):
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    _, api, breve = tareas().get(nombre, (None, False, False))
+    if not api or (settings.SERVERLESS and not breve) or not isinstance(parametros, dict):
+        return JsonResponse({'error': f'Tarea no disponible: {nombre}'}, status=400)
+    
+    try:
+        trabajo = encolar(nombre, parametros, usuario=request.user)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    respuesta = JsonResponse(como_json(trabajo), status=202)
+    respuesta['Location'] = reverse('api_trabajo', args=[trabajo.id])
+    return respuesta
+
+
+@login_required
+def api_trabajo(request, trabajo_id):
+    """Status of a job, for the admin or the user who queued it"""
+    trabajo = get_object_or_404(Trabajo, id=trabajo_id)
+    if request.user.rol != 'admin' and trabajo.usuario_id != request.user.id:
+        return JsonResponse({'error': 'No tiene permiso para ver este trabajo.'}, status=403)
+    return JsonResponse(como_json(trabajo))
+
+
+def cron_trabajos(request):
+    """
+    Run queued jobs for a while on hosts without a long-running worker
+    (serverless), authorized with settings.CRON_SECRET
+    """
+    if not cron_autorizado(request):
+        return JsonResponse({'error': 'No autorizado'}, status=401)
     
-    return JsonResponse({
-        'prioridad': prioridad_data,
-        'tendencia': tendencia_data
-    })
+    return JsonResponse({'ejecutados': procesar(CRON_TRABAJOS_SEGUNDOS)})
 
 
 # ============================================================
@@ -710,7 +855,9 @@ def eliminar_paciente_view(request, triaje_id):
         triaje.delete()
         
         # Check if patient has other triajes, if not delete patient too
-        if not Triaje.objects.filter(paciente=paciente).exists():
+        # (archived ones count: deleting the patient would cascade to them)
+        if not (Triaje.objects.filter(paciente=paciente).exists()
+                or TriajeArchivado.objects.filter(paciente=paciente).exists()):
             paciente.delete()
         
         registrar_auditoria(request, request.user, 'eliminar_paciente',
@@ -27,6 +27,10 @@ function initializeApp() {
     if (document.getElementById('queue-body')) {
         initQueueUpdates();
     }
+    
+    // Send registrations queued while offline
+    initRegistroOffline();
+    initColaRegistros();
 }
 
 /**
@@ -219,6 +223,282 @@ function hideLoading(element) {
     element.disabled = false;
 }
 
+/**
+ * Offline registration queue
+ * The last wizard step is sent through the batch sync API; records stay in
+ * localStorage until the server confirms them, and are sent again on every
+ * page load, when the browser is back online and once a minute
+ * Each record belongs to the user who captured it: only that user's session
+ * sends it, and logging out removes it from the device
+ * Steps 1-3 are still posted one by one to the server-side draft, so a
+ * registration can only be started online; the queue covers a connection
+ * lost at the last step
+ */
+const COLA_REGISTROS = 'triaje:registros-pendientes';
+const REGISTROS_RECHAZADOS = 'triaje:registros-rechazados';
+const URL_SINCRONIZAR = '/api/registros/sincronizar/';
+const MAX_REGISTROS_LOTE = 100;
+
+// Id of the logged-in user (base.html), '' on the login page
+function usuarioActual() {
+    return document.body.dataset.usuario || '';
+}
+
+function leerLista(clave) {
+    try {
+        return JSON.parse(localStorage.getItem(clave)) || [];
+    } catch (e) {
+        return [];
+    }
+}
+
+function propios(lista) {
+    const usuario = usuarioActual();
+    return lista.filter(r => usuario && r.usuario === usuario);
+}
+
+function guardarLista(clave, lista) {
+    localStorage.setItem(clave, JSON.stringify(lista));
+    mostrarPendientes();
+}
+
+function encolarRegistro(registro) {
+    const cola = leerLista(COLA_REGISTROS).filter(r => r.uuid !== registro.uuid);
+    cola.push({ ...registro, usuario: usuarioActual() });
+    guardarLista(COLA_REGISTROS, cola);
+}
+
+function getCookie(name) {
+    const match = document.cookie.match('(^|;)\\s*' + name + '=([^;]*)');
+    return match ? decodeURIComponent(match[2]) : '';
+}
+
+let sincronizacionEnCurso = null;
+
+/**
+ * Send the current user's queued records in one request; resolves with the
+ * per-record results, rejects when offline or logged out (the queue is kept)
+ */
+function sincronizarRegistros() {
+    const cola = propios(leerLista(COLA_REGISTROS));
+    if (!cola.length) {
+        return Promise.resolve([]);
+    }
+    if (sincronizacionEnCurso) {
+        return sincronizacionEnCurso;
+    }
+    
+    sincronizacionEnCurso = fetch(URL_SINCRONIZAR, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': getCookie('csrftoken')
+        },
+        // The server files them under the session user
+        body: JSON.stringify({
+            registros: cola.slice(0, MAX_REGISTROS_LOTE).map(({ usuario, ...registro }) => registro)
+        })
+    })
+        .then(response => {
+            // An expired session answers with the login page
+            const esJson = (response.headers.get('Content-Type') || '').includes('application/json');
+            if (!response.ok || !esJson) {
+                throw new Error('Sincronización no disponible (' + response.status + ')');
+            }
+            return response.json();
+        })
+        .then(data => {
+            const enviados = new Set(data.resultados.map(r => r.uuid));
+            const porUuid = new Map(cola.map(r => [r.uuid, r]));
+            // Invalid records are set aside with their errors, not lost
+            const rechazados = data.resultados
+                .filter(r => r.estado === 'error')
+                .map(r => ({ ...porUuid.get(r.uuid), errores: r.errores }));
+            if (rechazados.length) {
+                guardarLista(REGISTROS_RECHAZADOS, leerLista(REGISTROS_RECHAZADOS).concat(rechazados));
+            }
+            // Read again: records queued meanwhile stay
+            guardarLista(COLA_REGISTROS, leerLista(COLA_REGISTROS).filter(r => !enviados.has(r.uuid)));
+            return data.resultados;
+        })
+        .finally(() => {
+            sincronizacionEnCurso = null;
+        });
+    return sincronizacionEnCurso;
+}
+
+function enviarPendientes() {
+    sincronizarRegistros().catch(error => {
+        console.log('Registros pendientes sin enviar:', error);
+    });
+}
+
+function initColaRegistros() {
+    initCerrarSesion();
+    mostrarPendientes();
+    enviarPendientes();
+    window.addEventListener('online', enviarPendientes);
+    setInterval(() => {
+        if (navigator.onLine) {
+            enviarPendientes();
+        }
+    }, 60000);
+}
+
+/**
+ * Logout sends the user's pending records one last time and removes them
+ * (and the rejected ones) from the device; unsent ones need a confirmation
+ */
+function initCerrarSesion() {
+    const enlace = document.querySelector('a[data-cerrar-sesion]');
+    if (!enlace) {
+        return;
+    }
+    enlace.addEventListener('click', function(e) {
+        e.preventDefault();
+        sincronizarRegistros()
+            .catch(() => null)
+            .then(() => {
+                const pendientes = propios(leerLista(COLA_REGISTROS)).length;
+                if (pendientes && !confirm(pendientes + ' registro(s) sin enviar se eliminarán de este equipo al cerrar sesión. ¿Cerrar sesión de todos modos?')) {
+                    return;
+                }
+                const ajenos = lista => lista.filter(r => r.usuario !== usuarioActual());
+                guardarLista(COLA_REGISTROS, ajenos(leerLista(COLA_REGISTROS)));
+                guardarLista(REGISTROS_RECHAZADOS, ajenos(leerLista(REGISTROS_RECHAZADOS)));
+                window.location.href = enlace.href;
+            });
+    });
+}
+
+/**
+ * Banner with the current user's records waiting on this device
+ */
+function mostrarPendientes() {
+    const pendientes = propios(leerLista(COLA_REGISTROS)).length;
+    const rechazados = propios(leerLista(REGISTROS_RECHAZADOS)).length;
+    let aviso = document.getElementById('registros-pendientes');
+    
+    if (!pendientes && !rechazados) {
+        if (aviso) {
+            aviso.remove();
+        }
+        return;
+    }
+    if (!aviso) {
+        aviso = document.createElement('div');
+        aviso.id = 'registros-pendientes';
+        aviso.className = 'alert alert-warning';
+        aviso.setAttribute('role', 'status');
+        const main = document.querySelector('.main-content');
+        if (!main) {
+            return;
+        }
+        main.parentNode.insertBefore(aviso, main);
+    }
+    
+    const partes = [];
+    if (pendientes) {
+        partes.push(pendientes + ' registro(s) guardado(s) en este equipo, pendiente(s) de envío');
+    }
+    if (rechazados) {
+        partes.push(rechazados + ' registro(s) rechazado(s) por datos inválidos');
+    }
+    aviso.textContent = partes.join(' · ');
+}
+
+/**
+ * Last step of the registration wizard: queue the whole record (steps 1-3
+ * come from the server-side draft) and send it
+ */
+function initRegistroOffline() {
+    const form = document.querySelector('form[data-registro-offline]');
+    const borrador = document.getElementById('registro-borrador');
+    if (!form || !borrador) {
+        return;
+    }
+    const datos = JSON.parse(borrador.textContent);
+    // Drafts started before the sync API post the form as usual
+    if (!datos || !datos.uuid) {
+        return;
+    }
+    
+    form.addEventListener('submit', function(e) {
+        if (e.defaultPrevented) {
+            return;
+        }
+        e.preventDefault();
+        
+        const diagnostico = {};
+        ['sintomatologia', 'tratamiento', 'estudios_complementarios'].forEach(campo => {
+            diagnostico[campo] = form.elements[campo] ? form.elements[campo].value : '';
+        });
+        encolarRegistro({
+            uuid: datos.uuid,
+            registrado: new Date().toISOString(),
+            paciente: datos.paciente,
+            antecedentes: datos.antecedentes,
+            signos_vitales: datos.signos_vitales,
+            diagnostico: diagnostico
+        });
+        
+        const boton = form.querySelector('button[type="submit"]');
+        showLoading(boton);
+        sincronizarRegistros()
+            .then(resultados => {
+                const propio = resultados.find(r => r.uuid === datos.uuid);
+                if (propio && propio.estado === 'error') {
+                    hideLoading(boton);
+                    // Shown here, so not kept among the rejected ones
+                    guardarLista(REGISTROS_RECHAZADOS, leerLista(REGISTROS_RECHAZADOS).filter(r => r.uuid !== datos.uuid));
+                    mostrarErroresRegistro(form, propio.errores);
+                    return;
+                }
+                window.location.href = '/dashboard/';
+            })
+            .catch(() => {
+                hideLoading(boton);
+                avisoRegistro(form, 'Sin conexión: el registro quedó guardado en este equipo y se enviará automáticamente al recuperar la conexión.');
+                // Finish the wizard as soon as the connection is back
+                window.addEventListener('online', () => form.requestSubmit(), { once: true });
+            });
+    });
+}
+
+function avisoRegistro(form, mensaje) {
+    let aviso = form.querySelector('.registro-aviso');
+    if (!aviso) {
+        aviso = document.createElement('div');
+        aviso.className = 'alert alert-warning registro-aviso';
+        form.prepend(aviso);
+    }
+    aviso.textContent = mensaje;
+}
+
+/**
+ * Server validation errors: next to the field when it is on this step,
+ * otherwise in a notice
+ */
+function mostrarErroresRegistro(form, errores) {
+    const otros = [];
+    Object.values(errores).forEach(seccion => {
+        Object.entries(seccion).forEach(([campo, lista]) => {
+            const mensaje = lista.map(error => error.message).join(' ');
+            const field = form.elements[campo];
+            if (field) {
+                field.classList.add('error');
+                showFieldError(field, mensaje);
+            } else {
+                otros.push(mensaje);
+            }
+        });
+    });
+    if (otros.length) {
+        avisoRegistro(form, 'Revise los pasos anteriores: ' + otros.join(' '));
+    }
+}
+
 // Utility functions
 const utils = {
     debounce: function(func, wait) {
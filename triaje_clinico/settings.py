@@ -5,13 +5,15 @@ Sistema de Triaje Clínico - Configuración
 
 from pathlib import Path
 import os
-from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-# Load environment variables from .env file
-load_dotenv(BASE_DIR / '.env')
+# Load environment variables from .env file (local development only;
+# deployments set real env vars, so skip importing dotenv on cold start)
+if (BASE_DIR / '.env').exists():
+    from dotenv import load_dotenv
+    load_dotenv(BASE_DIR / '.env')
 
 
 # Quick-start development settings - unsuitable for production
@@ -21,10 +23,15 @@ DEBUG = os.getenv('DEBUG', 'True').lower() in ('true', '1', 'yes')
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1', '.vercel.app']
 
+# Serverless startup profile (Vercel sets VERCEL=1 at runtime): the platform
+# serves /static/ from the build output and the admin runs in its own
+# function (triaje_clinico/wsgi_admin.py), so neither loads on a cold start
+SERVERLESS = os.getenv('VERCEL', '') == '1'
+ADMIN_ENABLED = os.getenv('ADMIN_ENABLED', str(not SERVERLESS)).lower() in ('true', '1', 'yes')
+
 
 # Application definition
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -32,6 +39,8 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'core',  # Our main application
 ]
+if ADMIN_ENABLED:
+    INSTALLED_APPS.insert(0, 'django.contrib.admin')
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
@@ -43,6 +52,8 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+if SERVERLESS:
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
 
 ROOT_URLCONF = 'triaje_clinico.urls'
 
@@ -50,13 +61,19 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Compile each template once per process instead of on every render
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -76,10 +93,31 @@ DATABASES = {
         'OPTIONS': {
             'sslmode': 'require',
         },
+        # Reuse the TLS connection across requests on a warm instance
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
 
+# Cache - queue fragments on the dashboard
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) to share it
+# between serverless instances
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'triaje-clinico'),
+    }
+}
+# Whether every instance serving requests sees the same cache: local memory
+# is per process, so on serverless each instance would keep its own copy
+# and miss the invalidations made on the others
+CACHE_COMPARTIDA = not (
+    SERVERLESS and CACHES['default']['BACKEND'].endswith(('LocMemCache', 'DummyCache'))
+)
+
+
 # Custom User Model
 AUTH_USER_MODEL = 'core.Usuario'
 
@@ -104,6 +142,32 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing profile (core/hashers.py, tune with `manage.py benchmark_hashers`)
+# scrypt is memory-hard, so it reaches OWASP-level cost with far less CPU
+# than PBKDF2 on small serverless instances. Hashes made with a different
+# profile are upgraded transparently on the next successful login.
+PASSWORD_HASH_PROFILE = os.getenv('PASSWORD_HASH_PROFILE', 'scrypt')
+PASSWORD_SCRYPT = {
+    'N': int(os.getenv('PASSWORD_SCRYPT_N', 2**14)),
+    'r': int(os.getenv('PASSWORD_SCRYPT_R', 8)),
+    'p': int(os.getenv('PASSWORD_SCRYPT_P', 5)),
+}
+
+# The first hasher is used for new passwords; the rest can still verify
+if PASSWORD_HASH_PROFILE == 'pbkdf2':
+    PASSWORD_HASHERS = [
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'core.hashers.PerfilScryptPasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ]
+else:
+    PASSWORD_HASHERS = [
+        'core.hashers.PerfilScryptPasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ]
+
+
 # Internationalization
 LANGUAGE_CODE = 'es-bo'
 TIME_ZONE = 'America/La_Paz'
@@ -117,10 +181,46 @@ STATICFILES_DIRS = [
     BASE_DIR / 'static',
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles_build' / 'static'
+STATIC_MANIFEST = STATIC_ROOT / 'staticfiles.json'
+
+# Production: build_files.sh runs collectstatic with STATIC_BUILD=1, which
+# minifies CSS/JS, optimizes images, writes content-hashed copies with a
+# manifest and precompresses them with gzip/brotli (core/storage.py).
+# WhiteNoise indexes the manifest once at startup and serves hashed files
+# with far-future cache headers. On Vercel the manifest is bundled with the
+# functions (vercel.json includeFiles) and the environment, not the file's
+# presence, selects it: a missing manifest fails loudly instead of silently
+# serving unhashed names. Without a build (local development) fall back to
+# finder-based serving with autorefresh.
+USE_STATIC_MANIFEST = not DEBUG and (
+    SERVERLESS or STATIC_MANIFEST.exists() or os.getenv('STATIC_BUILD', '') == '1'
+)
+if USE_STATIC_MANIFEST:
+    STORAGES = {
+        'default': {
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        },
+        'staticfiles': {
+            'BACKEND': 'core.storage.OptimizedStaticFilesStorage',
+        },
+    }
+    WHITENOISE_USE_FINDERS = False
+    WHITENOISE_AUTOREFRESH = False
+else:
+    WHITENOISE_USE_FINDERS = True
+    WHITENOISE_AUTOREFRESH = True
+
+# Largest box each image is shown at (2x for HiDPI); downscaled at build time
+STATIC_IMAGE_SIZES = {
+    'images/logo.png': (160, 160),  # 80px on the login page, 32px in the navbar
+}
 
-# WhiteNoise: serve static files without collectstatic in serverless
-WHITENOISE_USE_FINDERS = True
-WHITENOISE_AUTOREFRESH = True
+# Shared secret for scheduled calls (Vercel Cron sends it as a Bearer token)
+CRON_SECRET = os.getenv('CRON_SECRET', '')
+
+# Compile templates and open the DB connection while the instance starts
+# (see core/startup.py)
+WARMUP_ON_START = os.getenv('WARMUP_ON_START', 'True').lower() in ('true', '1', 'yes')
 
 
 # CSRF trusted origins (Vercel domains)
@@ -134,6 +234,31 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 
+# Login attempt limiting (database counters, see core/ratelimit.py)
+LOGIN_MAX_INTENTOS = 3        # failures per username before lockout
+LOGIN_MAX_INTENTOS_IP = 20    # failures per client IP across usernames
+LOGIN_BLOQUEO_MINUTOS = 15    # counting window and lockout duration
+# Reverse proxies in front of the app that append the client address to
+# X-Forwarded-For (Vercel's edge: 1); 0 uses the socket address
+PROXIES_CONFIABLES = int(os.getenv('PROXIES_CONFIABLES', '1' if SERVERLESS else '0'))
+
+# Archive of closed triages (core/archivo.py, archivar_triajes command)
+ARCHIVO_DIAS = 365     # 'atendido' triages older than this leave the live tables
+ARCHIVO_LOTE = 500     # triages moved per transaction
+ARCHIVO_PAUSA = 0.5    # seconds between batches, to leave room for live traffic
+
+# Patient data retention (core/retencion.py, depurar_pacientes command)
+RETENCION_DIAS = 3650  # patients not seen for this long are anonymized or purged
+RETENCION_LOTE = 200   # patients per transaction
+RETENCION_PAUSA = 0.5  # seconds between batches
+
+# Background jobs (core/trabajos.py, trabajador command)
+TRABAJOS_HILOS = 2             # jobs a worker runs at the same time
+TRABAJOS_INTERVALO = 1.0       # seconds between polls of an empty queue
+TRABAJOS_INTENTOS = 3          # attempts before a job is marked 'fallido'
+TRABAJOS_REINTENTO = 30        # seconds before the first retry, doubled each time
+TRABAJOS_TIEMPO_MAXIMO = 300   # lease, renewed while the job runs: one not renewed is assumed dead
+
 
 # Session settings (30 min timeout as per SRS)
 SESSION_COOKIE_AGE = 1800  # 30 minutes
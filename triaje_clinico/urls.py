@@ -2,10 +2,14 @@
 URL configuration for triaje_clinico project.
 """
 
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('', include('core.urls')),
 ]
+
+# In the serverless profile the admin is served by wsgi_admin.py only
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
@@ -15,5 +15,12 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'triaje_clinico.settings')
 
 application = get_wsgi_application()
 
+# Warm-up hook: do first-request work while the instance boots
+from django.conf import settings  # noqa: E402
+
+if settings.WARMUP_ON_START:
+    from core.startup import warm_up
+    warm_up()
+
 # Vercel expects the handler to be named 'app'
 app = application
@@ -0,0 +1,15 @@
+"""
+WSGI entry point for the Django admin in the serverless profile.
+
+vercel.json routes /admin/ here so the admin app, its ModelAdmins and
+forms are only imported by this function, never on the main cold start.
+"""
+
+import os
+
+os.environ['ADMIN_ENABLED'] = 'True'
+
+from triaje_clinico.wsgi import application  # noqa: E402
+
+# Vercel expects the handler to be named 'app'
+app = application